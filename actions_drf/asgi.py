@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'actions_drf.settings')
+# sync views run in a new thread per request here, share the database
+# connections through the in-process pool instead of one per thread
+os.environ.setdefault('DB_POOL', '1')
 
 application = get_asgi_application()
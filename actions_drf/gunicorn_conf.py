@@ -0,0 +1,17 @@
+"""
+gunicorn hooks for ``python manage.py serve``.
+
+The command passes every setting on the command line, this module only
+holds the hooks that cannot be given there.
+"""
+
+
+def post_fork(server, worker):
+    # with --preload the app is imported in the master before the fork, a
+    # connection it may have opened must not be shared with the workers
+    from django.db import connections
+    from core.db.backends.postgresql.base import forget_pools
+
+    for connection in connections.all(initialized_only=True):
+        connection.connection = None
+    forget_pools()
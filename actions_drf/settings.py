@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 import os
+import tempfile
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -22,9 +24,13 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-j7&mr8!z)q@a5w#*0k9uf54@0ux--ur9&+xz7%0hm81nqc%_qf'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# on for runserver, `manage.py serve` refuses to start with it
+DEBUG = os.environ.get('DJANGO_DEBUG', '1') == '1'
 
-ALLOWED_HOSTS = []
+# comma separated, e.g. api.example.com,.example.org
+ALLOWED_HOSTS = [
+    host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',')
+    if host]
 
 # Application definition
 
@@ -35,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # 
     'rest_framework',
     'rest_framework.authtoken',
@@ -46,6 +53,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so its total covers the other middleware too
+    'core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -79,17 +88,48 @@ WSGI_APPLICATION = 'actions_drf.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# WSGI workers keep their connection for DB_CONN_MAX_AGE seconds. Under
+# ASGI (see asgi.py) every request runs in a fresh thread and would never
+# reuse it, so connections are handed back to an in-process pool instead.
+# core.db.pool.stats records the connection setup time either way.
+DB_POOL = os.environ.get('DB_POOL') == '1'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db.backends.postgresql',
         'NAME': os.environ.get('POSTGRES_DB'),
         'USER': os.environ.get('POSTGRES_USER'),
         'PASSWORD': os.environ.get('POSTGRES_PASSWORD'),
-        'HOST': 'db',
-        'port': 5432
+        'HOST': os.environ.get('POSTGRES_HOST', 'db'),
+        'PORT': 5432,
+        'CONN_MAX_AGE': 0 if DB_POOL else int(
+            os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'POOL': {
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'TIMEOUT': 10,
+        } if DB_POOL else None,
+    }
+}
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
+# per-user list response cache, see recipe.cache
+RESPONSE_CACHE = {
+    'ALIAS': 'default',
+    'TTL': int(os.environ.get('RESPONSE_CACHE_TTL', 300)),
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -128,6 +168,25 @@ MEDIA_URL = '/static/media/'
 STATIC_ROOT = '/vol/web/static'
 MEDIA_ROOT = '/vol/web/media'
 
+# uploads above this size are streamed to a temporary file in chunks
+# instead of being held in memory
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+
+# checked by RecipeImageSerializer from the leading bytes of an upload
+IMAGE_UPLOAD = {
+    'MAX_BYTES': 10 * 1024 * 1024,
+    'MAX_PIXELS': 40_000_000,
+}
+
+# recipe image thumbnails, generated off-request by core.images
+IMAGE_PIPELINE = {
+    'BACKEND': os.environ.get(
+        'IMAGE_PIPELINE_BACKEND', 'core.images.ThreadPoolBackend'),
+    'WORKERS': int(os.environ.get('IMAGE_PIPELINE_WORKERS', 2)),
+    'SIZES': [320, 960],
+    'FORMATS': ['WEBP', 'JPEG'],
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -146,7 +205,61 @@ EMAIL_PORT = 587
 
 # drf
 REST_FRAMEWORK = {
-    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema'
+    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'core.authentication.CachedTokenAuthentication',
+    ],
+    # orjson when it is installed, the stdlib json otherwise
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# per request query count and timings as Server-Timing headers and JSON
+# logs of the core.metrics logger, see core.middleware
+REQUEST_METRICS = {
+    'N_PLUS_ONE_THRESHOLD': int(
+        os.environ.get('REQUEST_METRICS_N_PLUS_ONE', 5)),
+    'SERVER_TIMING': os.environ.get('REQUEST_METRICS_HEADER', '1') == '1',
+    'LOG': True,
+}
+
+# token authentication cache, set CACHE_ALIAS to a shared backend (redis,
+# memcached) so invalidation reaches every worker immediately
+TOKEN_AUTH_CACHE = {
+    'TTL': int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 60)),
+    'MAX_SIZE': 10000,
+    'CACHE_ALIAS': os.environ.get('TOKEN_AUTH_CACHE_ALIAS') or None,
+}
+
+# Argon2id when argon2-cffi is installed, PBKDF2 otherwise; stored hashes
+# of the other hashers (or of other Argon2 costs) are replaced on login
+PASSWORD_HASHERS = [
+    *(['core.hashers.Argon2PasswordHasher'] if find_spec('argon2') else []),
+    'core.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# the hashing slots core.hashers shares between the worker processes of
+# the host and the Argon2 costs, see core.hashers.DEFAULT_PASSWORD_HASHING
+PASSWORD_HASHING = {
+    'WORKERS': int(os.environ.get(
+        'PASSWORD_HASHING_WORKERS', max(1, (os.cpu_count() or 1) // 2))),
+    'QUEUE': int(os.environ.get('PASSWORD_HASHING_QUEUE', 64)),
+    'TIMEOUT': float(os.environ.get('PASSWORD_HASHING_TIMEOUT', 5)),
+    'LOCK_DIR': os.environ.get('PASSWORD_HASHING_LOCK_DIR') or os.path.join(
+        tempfile.gettempdir(), 'password-hashing'),
+    'ARGON2_TIME_COST': int(os.environ.get('ARGON2_TIME_COST', 2)),
+    'ARGON2_MEMORY_COST': int(os.environ.get('ARGON2_MEMORY_COST', 65536)),
+    'ARGON2_PARALLELISM': int(os.environ.get('ARGON2_PARALLELISM', 1)),
 }
 
 # spectacular
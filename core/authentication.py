@@ -0,0 +1,173 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from copy import copy
+from time import monotonic
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    TokenAuthentication, get_authorization_header)
+
+DEFAULT_TOKEN_AUTH_CACHE = {
+    'TTL': 60,
+    'MAX_SIZE': 10000,
+    # a django cache alias to share entries between workers, None keeps a
+    # local LRU in every process
+    'CACHE_ALIAS': None,
+}
+
+
+class LocalTokenCache:
+    """thread safe in-process LRU whose entries expire after ttl seconds"""
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    async def aget(self, key):
+        return self.get(key)
+
+    async def aset(self, key, value):
+        self.set(key, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SharedTokenCache:
+    """token entries in a django cache backend, so deleting a token or
+    deactivating a user invalidates it for every worker at once"""
+
+    def __init__(self, ttl, alias):
+        self.ttl = ttl
+        self.cache = caches[alias]
+
+    def _key(self, key):
+        return f'token-auth:{hashlib.sha256(key.encode()).hexdigest()}'
+
+    def get(self, key):
+        return self.cache.get(self._key(key))
+
+    def set(self, key, value):
+        self.cache.set(self._key(key), value, self.ttl)
+
+    async def aget(self, key):
+        return await self.cache.aget(self._key(key))
+
+    async def aset(self, key, value):
+        await self.cache.aset(self._key(key), value, self.ttl)
+
+    def delete(self, key):
+        self.cache.delete(self._key(key))
+
+
+_token_cache = None
+
+
+def get_token_cache():
+    global _token_cache
+    if _token_cache is None:
+        options = {
+            **DEFAULT_TOKEN_AUTH_CACHE,
+            **getattr(settings, 'TOKEN_AUTH_CACHE', {})}
+        if options['CACHE_ALIAS']:
+            _token_cache = SharedTokenCache(
+                options['TTL'], options['CACHE_ALIAS'])
+        else:
+            _token_cache = LocalTokenCache(
+                options['TTL'], options['MAX_SIZE'])
+    return _token_cache
+
+
+@receiver(setting_changed)
+def reset_token_cache(*, setting, **kwargs):
+    global _token_cache
+    if setting in ('TOKEN_AUTH_CACHE', 'CACHES'):
+        _token_cache = None
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that keeps validated (user, token) pairs in
+    get_token_cache() instead of querying the token table on every request,
+    core.signals drops the entries when a token or its user changes"""
+
+    def authenticate_credentials(self, key):
+        token_cache = get_token_cache()
+        credentials = token_cache.get(key)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            token_cache.set(key, credentials)
+
+        user, token = credentials
+        # views may modify request.user, never hand out the cached instance
+        return copy(user), token
+
+    async def aauthenticate(self, request):
+        """authenticate() for async views on a plain django request, the
+        token is looked up with the async ORM on a cache miss"""
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) == 1:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. No credentials provided.'))
+        elif len(auth) > 2:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. '
+                  'Token string should not contain spaces.'))
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. '
+                  'Token string should not contain invalid characters.'))
+        return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        token_cache = get_token_cache()
+        credentials = await token_cache.aget(key)
+        if credentials is None:
+            try:
+                token = await self.get_model().objects.select_related(
+                    'user').aget(key=key)
+            except self.get_model().DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed(
+                    _('User inactive or deleted.'))
+            credentials = (token.user, token)
+            await token_cache.aset(key, credentials)
+
+        user, token = credentials
+        return copy(user), token
@@ -0,0 +1,139 @@
+import http.client
+import itertools
+import re
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic, perf_counter, sleep
+from urllib.parse import urlsplit
+
+
+# the db entry of core.middleware.RequestMetricsMiddleware
+_TIMING_QUERIES = re.compile(r'(?:^|,)\s*db;[^,]*desc="(\d+) queries"')
+
+
+def percentile(values, fraction):
+    """nearest-rank percentile of values, None when there are none"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def _connection(url, timeout):
+    parts = urlsplit(url)
+    cls = http.client.HTTPSConnection if parts.scheme == 'https' \
+        else http.client.HTTPConnection
+    return cls(parts.hostname, parts.port, timeout=timeout)
+
+
+def wait_until_up(url, headers=None, timeout=30):
+    """poll url until it answers at all, raise TimeoutError otherwise"""
+    deadline = monotonic() + timeout
+    while True:
+        conn = _connection(url, timeout=1)
+        try:
+            conn.request('GET', urlsplit(url).path or '/',
+                         headers=headers or {})
+            conn.getresponse().read()
+            return
+        except OSError:
+            if monotonic() > deadline:
+                raise TimeoutError(f'{url} did not come up in {timeout}s')
+            sleep(0.2)
+        finally:
+            conn.close()
+
+
+def queries_from_timing(header):
+    """query count of the db entry core.middleware puts in Server-Timing"""
+    match = _TIMING_QUERIES.search(header or '')
+    return int(match.group(1)) if match else None
+
+
+def _body(body, ticket):
+    return body(ticket) if callable(body) else body
+
+
+def _summary(results, requests, seconds):
+    """results: (latencies, errors, query counts) of every client"""
+    latencies = [ms for result, _, _ in results for ms in result]
+    queries = [count for _, _, counts in results for count in counts]
+    return {
+        'requests': requests,
+        'errors': sum(errors for _, errors, _ in results),
+        'seconds': seconds,
+        'rps': len(latencies) / seconds if seconds else 0.0,
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'queries': sum(queries) / len(queries) if queries else None,
+    }
+
+
+def run_load(url, headers=None, concurrency=10, requests=1000, timeout=10,
+             method='GET', body=None):
+    """send requests requests to url from concurrency keep-alive
+    connections, a closed loop: every client sends its next request once
+    the previous answer is read. body is bytes or a function of the
+    request number. Latencies are in milliseconds, non-2xx answers and
+    socket errors count as errors and are left out of them; queries is the
+    mean of what the Server-Timing headers report"""
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    tickets = itertools.count()
+
+    def client():
+        latencies, errors, queries = [], 0, []
+        conn = _connection(url, timeout)
+        try:
+            while (ticket := next(tickets)) < requests:
+                start = perf_counter()
+                try:
+                    conn.request(method, path, body=_body(body, ticket),
+                                 headers=headers or {})
+                    response = conn.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException):
+                    errors += 1
+                    conn.close()
+                    conn = _connection(url, timeout)
+                    continue
+                if 200 <= response.status < 300:
+                    latencies.append((perf_counter() - start) * 1000)
+                    count = queries_from_timing(
+                        response.getheader('Server-Timing'))
+                    if count is not None:
+                        queries.append(count)
+                else:
+                    errors += 1
+        finally:
+            conn.close()
+        return latencies, errors, queries
+
+    start = perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(
+            lambda _: client(), range(concurrency)))
+    return _summary(results, requests, perf_counter() - start)
+
+
+def run_client(client, path, headers=None, requests=100, method='GET',
+               body=None, content_type='application/json'):
+    """run_load() through a django.test.Client, one request at a time in
+    this process: no server needed and the numbers are deterministic
+    enough to compare query counts"""
+    latencies, errors, queries = [], 0, []
+    start = perf_counter()
+    for ticket in range(requests):
+        started = perf_counter()
+        response = client.generic(
+            method, path, _body(body, ticket) or b'',
+            content_type=content_type, headers=headers)
+        if 200 <= response.status_code < 300:
+            latencies.append((perf_counter() - started) * 1000)
+            count = queries_from_timing(response.get('Server-Timing'))
+            if count is not None:
+                queries.append(count)
+        else:
+            errors += 1
+    return _summary([(latencies, errors, queries)], requests,
+                    perf_counter() - start)
@@ -0,0 +1,85 @@
+import threading
+from functools import partial
+from time import perf_counter
+from django.db.backends.postgresql.base import (
+    DatabaseWrapper as PostgresDatabaseWrapper)
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from core.db.pool import ConnectionPool, PoolTimeout, stats
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _reset(conn):
+    """roll back whatever the request left open, False if the connection
+    cannot be reused"""
+    if conn.closed:
+        return False
+    if conn.info.transaction_status == TRANSACTION_STATUS_IDLE:
+        return True
+    try:
+        conn.rollback()
+    except Exception:
+        return False
+    return not conn.closed
+
+
+def forget_pools():
+    """in a forked child, drop the pools copied from the parent without
+    closing their connections, the parent still owns those sockets"""
+    global _pools_lock
+    _pools.clear()
+    _pools_lock = threading.Lock()
+
+
+class DatabaseWrapper(PostgresDatabaseWrapper):
+    """the postgresql backend timing every connection setup into
+    core.db.pool.stats, with settings_dict['POOL'] set connections are
+    borrowed from a process wide ConnectionPool and given back on close()
+    instead of being closed"""
+
+    def _pool(self, conn_params):
+        options = self.settings_dict.get('POOL')
+        if not options:
+            return None
+        with _pools_lock:
+            if self.alias not in _pools:
+                _pools[self.alias] = ConnectionPool(
+                    partial(super().get_new_connection, conn_params),
+                    reset=_reset,
+                    is_usable=self._is_usable,
+                    max_size=options.get('MAX_SIZE', 10),
+                    timeout=options.get('TIMEOUT', 10),
+                    check_after=options.get('CHECK_AFTER', 30),
+                    max_lifetime=options.get('MAX_LIFETIME', 1800))
+            return _pools[self.alias]
+
+    @staticmethod
+    def _is_usable(conn):
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except Exception:
+            return False
+        return True
+
+    def get_new_connection(self, conn_params):
+        started = perf_counter()
+        pool = self._pool(conn_params)
+        if pool is None:
+            connection, reused = super().get_new_connection(conn_params), False
+        else:
+            try:
+                connection, reused = pool.get()
+            except PoolTimeout as exc:
+                raise self.Database.OperationalError(str(exc)) from exc
+        self.connect_seconds = perf_counter() - started
+        stats.record(self.alias, self.connect_seconds, reused)
+        return connection
+
+    def _close(self):
+        pool = _pools.get(self.alias)
+        if pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            pool.put(self.connection)
@@ -0,0 +1,115 @@
+import logging
+import threading
+from collections import defaultdict
+from queue import Empty, LifoQueue
+from time import monotonic
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """a bounded pool of DB-API connections shared by the threads of one
+    process. Idle connections are handed out most recently used first,
+    checked with is_usable() when they sat idle for more than check_after
+    seconds and replaced once they are older than max_lifetime"""
+
+    def __init__(self, connect, reset, is_usable, max_size=10, timeout=10,
+                 check_after=30, max_lifetime=1800):
+        self._connect = connect
+        self._reset = reset
+        self._is_usable = is_usable
+        self.timeout = timeout
+        self.check_after = check_after
+        self.max_lifetime = max_lifetime
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._idle = LifoQueue()
+        self._born = {}
+
+    def _discard(self, conn):
+        self._born.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            logger.debug('closing a discarded connection failed',
+                         exc_info=True)
+
+    def get(self):
+        """(connection, reused), waits up to timeout for a free slot"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(
+                f'no connection available within {self.timeout}s')
+        try:
+            while True:
+                try:
+                    conn, returned = self._idle.get_nowait()
+                except Empty:
+                    break
+                now = monotonic()
+                if now - self._born.get(id(conn), now) > self.max_lifetime \
+                        or now - returned > self.check_after \
+                        and not self._is_usable(conn):
+                    self._discard(conn)
+                    continue
+                return conn, True
+
+            conn = self._connect()
+            self._born[id(conn)] = monotonic()
+            return conn, False
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def put(self, conn):
+        """take a connection back, it is closed instead if reset() cannot
+        bring it back to an idle state"""
+        try:
+            if self._reset(conn):
+                self._idle.put((conn, monotonic()))
+            else:
+                self._discard(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except Empty:
+                return
+            self._discard(conn)
+
+
+class ConnectionStats:
+    """connection setup time per database alias, split into connections
+    opened and connections taken from a pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = defaultdict(
+            lambda: {'opened': 0, 'reused': 0,
+                     'opened_seconds': 0.0, 'reused_seconds': 0.0})
+
+    def record(self, alias, seconds, reused):
+        kind = 'reused' if reused else 'opened'
+        with self._lock:
+            stats = self._stats[alias]
+            stats[kind] += 1
+            stats[f'{kind}_seconds'] += seconds
+        logger.debug('%s connection %s in %.2fms', alias, kind,
+                     seconds * 1000)
+
+    def snapshot(self):
+        with self._lock:
+            return {alias: dict(stats)
+                    for alias, stats in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+stats = ConnectionStats()
@@ -0,0 +1,201 @@
+import fcntl
+import os
+import random
+import tempfile
+import threading
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework import exceptions
+
+DEFAULT_PASSWORD_HASHING = {
+    # hashes running at once on the host, across every worker process;
+    # the rest of the cores stay free for the API while a login storm
+    # waits, and Argon2 takes at most WORKERS * ARGON2_MEMORY_COST
+    'WORKERS': max(1, (os.cpu_count() or 1) // 2),
+    # hashes on the host that may wait for a slot, beyond that logins get
+    # a 503 at once
+    'QUEUE': 64,
+    # seconds a hash waits for a slot
+    'TIMEOUT': 5.0,
+    # the processes share the slots and the queue through lock files in
+    # here; containers on one host have their own /tmp, mount a shared
+    # volume there to limit them together
+    'LOCK_DIR': os.path.join(tempfile.gettempdir(), 'password-hashing'),
+    # Argon2id costs; one lane keeps a hash on one core so WORKERS bounds
+    # the CPU, memory_cost (KiB) is what makes it expensive to attack
+    'ARGON2_TIME_COST': 2,
+    'ARGON2_MEMORY_COST': 65536,
+    'ARGON2_PARALLELISM': 1,
+}
+
+
+def options():
+    return {**DEFAULT_PASSWORD_HASHING,
+            **getattr(settings, 'PASSWORD_HASHING', {})}
+
+
+class HashingBusy(exceptions.APIException):
+    status_code = 503
+    default_detail = 'Too many logins at once, try again shortly.'
+    default_code = 'hashing_busy'
+    # seconds, sent as Retry-After by DRF's exception handler
+    wait = 1
+
+
+# set while a thread holds a slot, where hashers calling each other
+# (PBKDF2's verify() encodes) must not wait for a second one
+_holding = threading.local()
+
+
+def _lock(path, blocking=False):
+    """the descriptor of path flock()ed, None if it is taken"""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        return fd
+    except BlockingIOError:
+        os.close(fd)
+        return None
+
+
+class HashingSlots:
+    """workers slots for password hashes and a line of queue places to
+    wait for them, shared by every process on the host: each one an
+    flock()ed file in directory. A per-process limit would not hold:
+    every sync gunicorn worker is a process of its own, so all of them
+    could hash at once. The kernel releases the locks of a process that
+    dies.
+
+    A hash takes a place, or gets HashingBusy at once when the line is
+    full, then a free slot or, sleeping in flock(), the slot its place
+    waits on. The hash runs on the calling thread, argon2 and hashlib
+    release the GIL"""
+
+    def __init__(self, workers, queue, timeout, directory):
+        self.timeout = timeout
+        os.makedirs(directory, exist_ok=True)
+        self._slots = [
+            os.path.join(directory, f'slot-{i}') for i in range(workers)]
+        self._places = [
+            os.path.join(directory, f'place-{i}')
+            for i in range(workers + queue)]
+
+    def _first_free(self, paths):
+        start = random.randrange(len(paths))
+        for index in range(start, start + len(paths)):
+            fd = _lock(paths[index % len(paths)])
+            if fd is not None:
+                return index % len(paths), fd
+        return None, None
+
+    def _wait(self, place, place_fd):
+        """the descriptor of the slot of place, None after timeout. The
+        flock() blocks in a thread of its own which, if the caller gave
+        up, releases the slot and the place once it gets it, so the
+        place stays taken while someone waits for the slot"""
+        locked, lock = threading.Event(), threading.Lock()
+        waiting = {'fd': None, 'abandoned': False}
+
+        def wait():
+            fd = _lock(self._slots[place % len(self._slots)], blocking=True)
+            with lock:
+                if waiting['abandoned']:
+                    os.close(fd)
+                    os.close(place_fd)
+                    return
+                waiting['fd'] = fd
+                locked.set()
+
+        threading.Thread(target=wait, daemon=True).start()
+        locked.wait(self.timeout)
+        with lock:
+            waiting['abandoned'] = waiting['fd'] is None
+            return waiting['fd']
+
+    def run(self, fn, *args):
+        if getattr(_holding, 'slot', False):
+            return fn(*args)
+        place, place_fd = self._first_free(self._places)
+        if place_fd is None:
+            raise HashingBusy()
+        _, fd = self._first_free(self._slots)
+        if fd is None and self.timeout <= 0:
+            os.close(place_fd)
+            raise HashingBusy()
+        if fd is None:
+            fd = self._wait(place, place_fd)
+            if fd is None:
+                # the waiting thread closes the place
+                raise HashingBusy()
+        _holding.slot = True
+        try:
+            return fn(*args)
+        finally:
+            _holding.slot = False
+            os.close(fd)
+            os.close(place_fd)
+
+
+_slots = None
+_slots_pid = None
+_slots_lock = threading.Lock()
+
+
+def get_slots():
+    """the process' HashingSlots, created on first use so forked workers
+    get their own"""
+    global _slots, _slots_pid
+    with _slots_lock:
+        if _slots is None or _slots_pid != os.getpid():
+            config = options()
+            _slots = HashingSlots(
+                config['WORKERS'], config['QUEUE'], config['TIMEOUT'],
+                config['LOCK_DIR'])
+            _slots_pid = os.getpid()
+        return _slots
+
+
+@receiver(setting_changed)
+def reset_slots(*, setting, **kwargs):
+    global _slots
+    if setting == 'PASSWORD_HASHING':
+        with _slots_lock:
+            _slots = None
+
+
+class SlottedHasherMixin:
+    """hash and verify in one of get_slots(), the algorithm and the stored
+    format are the ones of the hasher mixed into"""
+
+    def encode(self, password, salt, *args, **kwargs):
+        return get_slots().run(
+            lambda: super(SlottedHasherMixin, self).encode(
+                password, salt, *args, **kwargs))
+
+    def verify(self, password, encoded):
+        return get_slots().run(
+            lambda: super(SlottedHasherMixin, self).verify(password, encoded))
+
+
+class Argon2PasswordHasher(SlottedHasherMixin, hashers.Argon2PasswordHasher):
+    """Argon2id with the costs of PASSWORD_HASHING; hashes made with other
+    costs are updated on the next login like those of other hashers"""
+
+    @property
+    def time_cost(self):
+        return options()['ARGON2_TIME_COST']
+
+    @property
+    def memory_cost(self):
+        return options()['ARGON2_MEMORY_COST']
+
+    @property
+    def parallelism(self):
+        return options()['ARGON2_PARALLELISM']
+
+
+class PBKDF2PasswordHasher(SlottedHasherMixin, hashers.PBKDF2PasswordHasher):
+    """verifies the PBKDF2 hashes stored before Argon2 until their users
+    log in again"""
@@ -0,0 +1,169 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+from multiprocessing import get_context
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.signals import setting_changed
+from django.db import connections, transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IMAGE_PIPELINE = {
+    # any class with submit(func, *args), e.g. an adapter for a task queue
+    'BACKEND': 'core.images.ThreadPoolBackend',
+    'WORKERS': 2,
+    'SIZES': [320, 960],
+    'FORMATS': ['WEBP', 'JPEG'],
+    'QUALITY': 80,
+}
+
+DEFAULT_IMAGE_UPLOAD = {
+    'MAX_BYTES': 10 * 1024 * 1024,
+    'MAX_PIXELS': 40_000_000,
+    # leading bytes handed to libmagic
+    'SNIFF_BYTES': 2048,
+    'ALLOWED_TYPES': ['image/jpeg', 'image/png', 'image/webp', 'image/gif'],
+}
+
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg', 'PNG': 'png'}
+
+
+def pipeline_options():
+    return {**DEFAULT_IMAGE_PIPELINE,
+            **getattr(settings, 'IMAGE_PIPELINE', {})}
+
+
+def upload_options():
+    return {**DEFAULT_IMAGE_UPLOAD,
+            **getattr(settings, 'IMAGE_UPLOAD', {})}
+
+
+class SyncBackend:
+    """runs the task inline, for tests and management commands"""
+
+    def __init__(self, options):
+        pass
+
+    def submit(self, func, *args):
+        func(*args)
+
+
+class ThreadPoolBackend:
+    def __init__(self, options):
+        self.executor = ThreadPoolExecutor(
+            max_workers=options['WORKERS'],
+            thread_name_prefix='image-pipeline')
+
+    def submit(self, func, *args):
+        self.executor.submit(self._run, func, *args)
+
+    @staticmethod
+    def _run(func, *args):
+        try:
+            func(*args)
+        finally:
+            # the worker threads must not keep connections open
+            connections.close_all()
+
+
+class ProcessPoolBackend:
+    """keeps image decoding off the web workers' CPU entirely"""
+
+    def __init__(self, options):
+        self.executor = ProcessPoolExecutor(
+            max_workers=options['WORKERS'],
+            mp_context=get_context('spawn'),
+            initializer=django.setup)
+
+    def submit(self, func, *args):
+        self.executor.submit(func, *args)
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        options = pipeline_options()
+        _backend = import_string(options['BACKEND'])(options)
+    return _backend
+
+
+@receiver(setting_changed)
+def reset_backend(*, setting, **kwargs):
+    global _backend
+    if setting == 'IMAGE_PIPELINE':
+        _backend = None
+
+
+def variant_name(image_name, size, image_format):
+    stem, _ = os.path.splitext(os.path.basename(image_name))
+    return os.path.join(
+        'uploads', 'recipe', 'variants',
+        f'{stem}_{size}.{EXTENSIONS[image_format]}')
+
+
+def render_variants(image_file, options):
+    """yield (size, format, ContentFile) for every configured variant, each
+    scaled down to fit in a size x size box"""
+    with Image.open(image_file) as image:
+        image = ImageOps.exif_transpose(image)
+        for size in options['SIZES']:
+            thumbnail = image.copy()
+            thumbnail.thumbnail((size, size))
+            for image_format in options['FORMATS']:
+                output = thumbnail
+                if image_format == 'JPEG' and output.mode not in ('RGB', 'L'):
+                    output = output.convert('RGB')
+                buffer = BytesIO()
+                output.save(
+                    buffer, format=image_format, quality=options['QUALITY'])
+                yield size, image_format, ContentFile(buffer.getvalue())
+
+
+def generate_variants(recipe_id, image_name, stale_names=()):
+    """worker entry point: store the variants of image_name and record them
+    on the recipe, unless the recipe got another image in the meantime"""
+    from .models import Recipe
+
+    storage = Recipe._meta.get_field('image').storage
+    stale_names = list(stale_names)
+    variants = {}
+    try:
+        with storage.open(image_name) as image_file:
+            for size, image_format, content in render_variants(
+                    image_file, pipeline_options()):
+                variants[f'{image_format.lower()}_{size}'] = storage.save(
+                    variant_name(image_name, size, image_format), content)
+
+        with transaction.atomic():
+            recipe = Recipe.objects.select_for_update().only(
+                'user_id', 'image', 'image_variants').get(pk=recipe_id)
+            if recipe.image.name != image_name:
+                stale_names += variants.values()
+            else:
+                recipe.image_variants = variants
+                recipe.save(update_fields=['image_variants', 'updated_at'])
+    except Recipe.DoesNotExist:
+        stale_names += variants.values()
+    except Exception:
+        logger.exception('image variants of recipe %s failed', recipe_id)
+        stale_names += variants.values()
+
+    for name in stale_names:
+        storage.delete(name)
+
+
+def schedule_variants(recipe, stale_names=()):
+    """generate the variants of recipe.image once the upload is committed,
+    stale_names are the previous variants to delete afterwards"""
+    args = (recipe.pk, recipe.image.name, list(stale_names))
+    transaction.on_commit(
+        lambda: get_backend().submit(generate_variants, *args))
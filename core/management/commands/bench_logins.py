@@ -0,0 +1,85 @@
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, process_time
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, get_hasher
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from core.bench import percentile, run_client
+from core.hashers import get_slots
+
+PASSWORD = 'bench123'
+
+
+class Command(BaseCommand):
+    help = ('Verify passwords with each hasher from --threads threads '
+            'in the hashing slots of core.hashers and report logins/sec '
+            'and logins per CPU second, i.e. per core, with p50/p95 '
+            'latency in ms; then time the token endpoint in process. The '
+            'bench user is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hashers', nargs='+',
+                            default=['argon2', 'pbkdf2_sha256'],
+                            help='algorithms of PASSWORD_HASHERS')
+        parser.add_argument('--logins', type=int, default=50)
+        parser.add_argument('--threads', type=int, default=4,
+                            help='concurrent logins')
+
+    def _verify(self, encoded, logins, threads):
+        tickets = itertools.count()
+
+        def client():
+            latencies = []
+            while next(tickets) < logins:
+                start = perf_counter()
+                if not check_password(PASSWORD, encoded):
+                    raise CommandError('the password did not verify')
+                latencies.append((perf_counter() - start) * 1000)
+            return latencies
+
+        get_slots()
+        started, cpu = perf_counter(), process_time()
+        with ThreadPoolExecutor(threads) as executor:
+            results = list(executor.map(lambda _: client(), range(threads)))
+        seconds, cpu = perf_counter() - started, process_time() - cpu
+        latencies = [ms for result in results for ms in result]
+        return {'rps': logins / seconds, 'per_core': logins / cpu,
+                'p50': percentile(latencies, 0.50),
+                'p95': percentile(latencies, 0.95)}
+
+    def handle(self, *args, **options):
+        reports = {}
+        for algorithm in options['hashers']:
+            try:
+                hasher = get_hasher(algorithm)
+            except ValueError as exc:
+                raise CommandError(exc)
+            reports[algorithm] = self._verify(
+                hasher.encode(PASSWORD, hasher.salt()), options['logins'],
+                options['threads'])
+
+        # the test client's host; a login per request, no rehash to skew it
+        with transaction.atomic(), override_settings(
+                ALLOWED_HOSTS=['testserver']):
+            user = get_user_model().objects.create_user(
+                email='bench-login@example.com', password=PASSWORD)
+            reports['token endpoint'] = run_client(
+                Client(), reverse('user:token'), method='POST',
+                requests=options['logins'],
+                body=f'{{"email": "{user.email}", '
+                     f'"password": "{PASSWORD}"}}'.encode())
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f'{"hasher":<16} {"logins/s":>9} {"per core":>9} {"p50":>7} '
+            f'{"p95":>7}')
+        for name, report in reports.items():
+            per_core = report.get('per_core')
+            self.stdout.write(
+                f'{name:<16} {report["rps"]:>9.1f} '
+                f'{"-" if per_core is None else f"{per_core:.1f}":>9} '
+                f'{report["p50"]:>7.1f} {report["p95"]:>7.1f}')
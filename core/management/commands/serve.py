@@ -0,0 +1,104 @@
+import os
+import sys
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+# any constant shared by every container, pg_advisory_lock takes a bigint
+MIGRATE_LOCK_ID = 0x6d696772617465
+
+WORKER_CLASSES = {
+    'wsgi': ('actions_drf.wsgi:application', 'sync'),
+    'asgi': ('actions_drf.asgi:application',
+             'uvicorn.workers.UvicornWorker'),
+}
+
+
+def default_workers(interface, cpus=None):
+    """2 * CPUs + 1 sync workers, which spend much of a request waiting on
+    the database; one event loop per CPU for asgi"""
+    cpus = cpus or os.cpu_count() or 1
+    return cpus if interface == 'asgi' else 2 * cpus + 1
+
+
+class Command(BaseCommand):
+    help = ('Run the production server: a gunicorn master with sync '
+            'workers (wsgi) or uvicorn workers (asgi). The app is preloaded '
+            'in the master and forked, so the workers share its memory '
+            'copy-on-write. SIGHUP restarts the workers gracefully, with '
+            '--no-preload they also pick up new code; SIGTERM finishes the '
+            'requests in flight before exiting.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interface', choices=WORKER_CLASSES,
+                            default=os.environ.get('SERVER_INTERFACE', 'wsgi'))
+        parser.add_argument('--bind', default='0.0.0.0:8000')
+        parser.add_argument(
+            '--workers', type=int,
+            default=int(os.environ.get('WEB_CONCURRENCY', 0)) or None,
+            help='defaults to $WEB_CONCURRENCY or one derived from the CPUs')
+        parser.add_argument('--timeout', type=int, default=30)
+        parser.add_argument('--graceful-timeout', type=int, default=30)
+        parser.add_argument('--max-requests', type=int, default=1000,
+                            help='recycle a worker after this many requests')
+        parser.add_argument('--no-preload', dest='preload',
+                            action='store_false')
+        parser.add_argument('--migrate', action='store_true',
+                            help='apply migrations first, containers that '
+                                 'start together run them one at a time')
+
+    def migrate(self):
+        """migrate under an advisory lock, whoever gets it second finds
+        nothing left to apply"""
+        if connection.vendor != 'postgresql':
+            call_command('migrate', interactive=False)
+            return
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_lock(%s)', [MIGRATE_LOCK_ID])
+            try:
+                call_command('migrate', interactive=False)
+            finally:
+                cursor.execute(
+                    'SELECT pg_advisory_unlock(%s)', [MIGRATE_LOCK_ID])
+
+    def gunicorn_args(self, options):
+        app, worker_class = WORKER_CLASSES[options['interface']]
+        workers = options['workers'] or default_workers(options['interface'])
+        args = [
+            sys.executable, '-m', 'gunicorn', app,
+            '--config', 'python:actions_drf.gunicorn_conf',
+            '--bind', options['bind'],
+            '--workers', str(workers),
+            '--worker-class', worker_class,
+            '--timeout', str(options['timeout']),
+            '--graceful-timeout', str(options['graceful_timeout']),
+            '--max-requests', str(options['max_requests']),
+            '--max-requests-jitter', str(options['max_requests'] // 10),
+            '--access-logfile', '-',
+        ]
+        if options['preload']:
+            args.append('--preload')
+        return args
+
+    def check_settings(self):
+        """DEBUG leaks settings and source in error pages and keeps every
+        query in memory; without ALLOWED_HOSTS every request is a 400"""
+        if settings.DEBUG:
+            raise CommandError(
+                'DEBUG is on, set DJANGO_DEBUG=0 to serve in production')
+        if not settings.ALLOWED_HOSTS:
+            raise CommandError(
+                'ALLOWED_HOSTS is empty, set DJANGO_ALLOWED_HOSTS to the '
+                'host names the server answers to')
+
+    def handle(self, *args, **options):
+        self.check_settings()
+        if options['migrate']:
+            self.migrate()
+        connection.close()
+        args = self.gunicorn_args(options)
+        self.stdout.write(' '.join(args[1:]))
+        self.stdout.flush()
+        # replace this process so the master gets the container's signals
+        os.execv(args[0], args)
@@ -0,0 +1,111 @@
+import re
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from django.conf import settings
+
+DEFAULT_REQUEST_METRICS = {
+    # a statement run this many times in one request flags it as N+1
+    'N_PLUS_ONE_THRESHOLD': 5,
+    'SERVER_TIMING': True,
+    'LOG': True,
+}
+
+# IN (%s, %s, ...) lists differ in length between otherwise equal queries
+_PLACEHOLDER_LIST = re.compile(r'\((?:%s, )*%s\)')
+
+_current = ContextVar('request_metrics', default=None)
+
+
+def options():
+    return {**DEFAULT_REQUEST_METRICS,
+            **getattr(settings, 'REQUEST_METRICS', {})}
+
+
+class RequestMetrics:
+    """what one request spent where; the context variable holding it is
+    copied into sync_to_async threads, so the queries of async views and
+    of sync views under ASGI are counted too"""
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.timings = defaultdict(float)
+        self.statements = Counter()
+        self._open = Counter()
+
+    def record_query(self, sql, seconds):
+        self.queries += 1
+        self.sql_seconds += seconds
+        self.statements[_PLACEHOLDER_LIST.sub('(%s...)', sql)] += 1
+
+    def repeated(self, threshold):
+        """(statement, times) run at least threshold times, most first"""
+        return [(sql, times) for sql, times in self.statements.most_common()
+                if times >= threshold]
+
+
+def current():
+    return _current.get()
+
+
+def start():
+    """begin collecting for a request, returns the token for finish()"""
+    return _current.set(RequestMetrics())
+
+
+def finish(token):
+    metrics = _current.get()
+    _current.reset(token)
+    return metrics
+
+
+@contextmanager
+def timed(name):
+    """add the time spent in the block to the current request's timing of
+    name; nested blocks of the same name count once"""
+    metrics = _current.get()
+    if metrics is None or metrics._open[name]:
+        yield
+        return
+    metrics._open[name] += 1
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timings[name] += perf_counter() - started
+        metrics._open[name] -= 1
+
+
+def record_query(execute, sql, params, many, context):
+    """database execute wrapper feeding the current request's metrics"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query(sql, perf_counter() - started)
+
+
+def install(sender, connection, **kwargs):
+    """connection_created receiver: wrap every connection's queries once
+    and count the setup time of connections a request had to open"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+    metrics = _current.get()
+    seconds = getattr(connection, 'connect_seconds', None)
+    if metrics is not None and seconds is not None:
+        metrics.timings['connect'] += seconds
+
+
+class TimedRepresentationMixin:
+    """serializer mixin adding to_representation() to the request's
+    'serialize' timing, nested serializers are not counted twice"""
+
+    def to_representation(self, instance):
+        with timed('serialize'):
+            return super().to_representation(instance)
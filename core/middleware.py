@@ -0,0 +1,74 @@
+import json
+import logging
+from time import perf_counter
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from . import metrics
+
+logger = logging.getLogger('core.metrics')
+
+
+class RequestMetricsMiddleware:
+    """per request query count, SQL time, serializer and render time as a
+    Server-Timing header and one JSON log line; a statement repeated
+    N_PLUS_ONE_THRESHOLD times flags the request as N+1 and logs it as a
+    warning. Runs natively on both sync and async stacks"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = metrics.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            collected = metrics.finish(token)
+        return self.report(request, response, collected)
+
+    async def __acall__(self, request):
+        token = metrics.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            collected = metrics.finish(token)
+        return self.report(request, response, collected)
+
+    def report(self, request, response, collected):
+        options = metrics.options()
+        total = perf_counter() - collected.started
+        repeated = collected.repeated(options['N_PLUS_ONE_THRESHOLD'])
+        match = getattr(request, 'resolver_match', None)
+
+        if options['SERVER_TIMING']:
+            entries = [f'db;dur={collected.sql_seconds * 1000:.2f};'
+                       f'desc="{collected.queries} queries"']
+            entries += [f'{name};dur={seconds * 1000:.2f}'
+                        for name, seconds in collected.timings.items()]
+            entries.append(f'total;dur={total * 1000:.2f}')
+            if repeated:
+                entries.append(
+                    f'n-plus-one;desc="{repeated[0][1]}x same query"')
+            response['Server-Timing'] = ', '.join(entries)
+
+        if options['LOG']:
+            record = {
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                'queries': collected.queries,
+                'sql_ms': round(collected.sql_seconds * 1000, 2),
+                **{f'{name}_ms': round(seconds * 1000, 2)
+                   for name, seconds in collected.timings.items()},
+                'total_ms': round(total * 1000, 2),
+                'n_plus_one': [{'sql': sql, 'times': times}
+                               for sql, times in repeated],
+            }
+            logger.log(logging.WARNING if repeated else logging.INFO,
+                       json.dumps(record), extra={'metrics': record})
+        return response
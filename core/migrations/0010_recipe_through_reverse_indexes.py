@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """composite (related_id, recipe_id) indexes on the auto-created M2M
+    tables; the implicit unique (recipe_id, related_id) only serves lookups
+    from the recipe side, these back the EXISTS probes from tag/ingredient"""
+
+    dependencies = [
+        ('core', '0009_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX core_recipe_tag_tag_recipe_idx '
+                'ON core_recipe_tag (tag_id, recipe_id)',
+            reverse_sql='DROP INDEX core_recipe_tag_tag_recipe_idx',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX core_recipe_ingr_ingr_recipe_idx '
+                'ON core_recipe_ingredient (ingredient_id, recipe_id)',
+            reverse_sql='DROP INDEX core_recipe_ingr_ingr_recipe_idx',
+        ),
+    ]
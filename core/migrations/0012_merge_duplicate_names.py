@@ -0,0 +1,40 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """keep the oldest row of every (user, name) group and move the recipe
+    links of the duplicates onto it before the unique constraint is added"""
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field in (('Tag', 'tag'), ('Ingredient', 'ingredient')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, field).through
+        groups = model.objects.values('user_id', 'name').annotate(
+            keep=Min('id'), total=Count('id')).filter(total__gt=1)
+        for group in groups:
+            duplicates = model.objects.filter(
+                user_id=group['user_id'], name=group['name'],
+            ).exclude(id=group['keep'])
+            linked = set(through.objects.filter(
+                **{f'{field}_id': group['keep']},
+            ).values_list('recipe_id', flat=True))
+            moved = set(through.objects.filter(
+                **{f'{field}__in': duplicates},
+            ).values_list('recipe_id', flat=True)) - linked
+            through.objects.bulk_create([
+                through(recipe_id=recipe_id, **{f'{field}_id': group['keep']})
+                for recipe_id in moved
+            ])
+            duplicates.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_user_id_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_names, migrations.RunPython.noop),
+    ]
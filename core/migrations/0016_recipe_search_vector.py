@@ -0,0 +1,55 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from core.operations import AddPostgresIndex
+
+
+def search_vector(Recipe):
+    """core.models.recipe_search_vector as of this migration, kept here so
+    later changes to it don't change what the migration fills"""
+    def names(field):
+        through = Recipe._meta.get_field(field).remote_field.through
+        return Coalesce(Subquery(
+            through.objects.filter(recipe_id=OuterRef('pk'))
+            .values('recipe_id')
+            .annotate(names=StringAgg(f'{field}__name', ' '))
+            .values('names')), Value(''), output_field=models.TextField())
+
+    return (
+        SearchVector('title', weight='A', config='english')
+        + SearchVector(names('tag'), weight='B', config='english')
+        + SearchVector(names('ingredient'), weight='B', config='english')
+        + SearchVector('description', weight='C', config='english'))
+
+
+def fill_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipe = apps.get_model('core', 'Recipe')
+    Recipe.objects.update(search_vector=search_vector(Recipe))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True),
+        ),
+        migrations.RunPython(fill_search_vector, migrations.RunPython.noop),
+        AddPostgresIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['search_vector'], name='core_recipe_search_gin'),
+        ),
+    ]
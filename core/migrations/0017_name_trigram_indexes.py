@@ -0,0 +1,33 @@
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+import django.db.models.functions.text
+from core.operations import AddPostgresIndex
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_recipe_search_vector'),
+    ]
+
+    operations = [
+        # a no-op on other databases
+        TrigramExtension(),
+        AddPostgresIndex(
+            model_name='ingredient',
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper('name'),
+                    name='gin_trgm_ops'),
+                name='core_ingredient_name_trgm'),
+        ),
+        AddPostgresIndex(
+            model_name='tag',
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper('name'),
+                    name='gin_trgm_ops'),
+                name='core_tag_name_trgm'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """replace the (user_id, id) indexes with covering ones so the tag and
+    ingredient lists and the recipe precondition checks are index-only
+    scans; the new indexes are built before the old ones are dropped"""
+
+    dependencies = [
+        ('core', '0017_name_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='ingredient',
+            options={'ordering': ['id']},
+        ),
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'ordering': ['id']},
+        ),
+        migrations.AlterModelOptions(
+            name='tag',
+            options={'ordering': ['id']},
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(
+                fields=['user', 'id'], include=('name',),
+                name='core_ingr_user_id_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['user', 'id'], include=('updated_at',),
+                name='core_recipe_user_id_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(
+                fields=['user', 'id'], include=('name',),
+                name='core_tag_user_id_name_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='core_ingredient_user_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='recipe',
+            name='core_recipe_user_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='tag',
+            name='core_tag_user_id_idx',
+        ),
+    ]
@@ -0,0 +1,88 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_recipe_counts(apps, schema_editor):
+    Recipe = apps.get_model('core', 'Recipe')
+    for name in ('tag', 'ingredient'):
+        model = apps.get_model('core', name)
+        through = Recipe._meta.get_field(name).remote_field.through
+        model.objects.update(recipe_count=Coalesce(Subquery(
+            through.objects.filter(**{f'{name}_id': OuterRef('pk')})
+            .values(f'{name}_id').annotate(count=Count('*'))
+            .values('count')), 0))
+
+
+class Migration(migrations.Migration):
+    """denormalized recipe counts on tags and ingredients, filled from the
+    through tables; the covering indexes of the lists take the count too
+    and a partial index serves the ones in use (?assign_only=1).
+
+    The columns are added with plain SQL: a constant default is a catalog
+    change on Postgres, and SQLite would otherwise rebuild the tables with
+    the Postgres-only trigram indexes of their state"""
+
+    dependencies = [
+        ('core', '0018_covering_indexes_ordering'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunSQL(
+                'ALTER TABLE core_ingredient ADD COLUMN recipe_count integer '
+                'NOT NULL DEFAULT 0',
+                'ALTER TABLE core_ingredient DROP COLUMN recipe_count')],
+            state_operations=[migrations.AddField(
+                model_name='ingredient',
+                name='recipe_count',
+                field=models.IntegerField(default=0, editable=False),
+            )],
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunSQL(
+                'ALTER TABLE core_tag ADD COLUMN recipe_count integer '
+                'NOT NULL DEFAULT 0',
+                'ALTER TABLE core_tag DROP COLUMN recipe_count')],
+            state_operations=[migrations.AddField(
+                model_name='tag',
+                name='recipe_count',
+                field=models.IntegerField(default=0, editable=False),
+            )],
+        ),
+        migrations.RunPython(fill_recipe_counts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(
+                fields=['user', 'id'], include=('name', 'recipe_count'),
+                name='core_ingr_user_id_cnt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(
+                condition=models.Q(('recipe_count__gt', 0)),
+                fields=['user', 'id'], include=('name', 'recipe_count'),
+                name='core_ingr_user_used_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(
+                fields=['user', 'id'], include=('name', 'recipe_count'),
+                name='core_tag_user_id_cnt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(
+                condition=models.Q(('recipe_count__gt', 0)),
+                fields=['user', 'id'], include=('name', 'recipe_count'),
+                name='core_tag_user_used_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='core_ingr_user_id_name_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='tag',
+            name='core_tag_user_id_name_idx',
+        ),
+    ]
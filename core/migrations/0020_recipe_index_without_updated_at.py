@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """drop updated_at from the recipe (user_id, id) index; it changes on
+    every save and on every tag or ingredient change, so holding it made
+    each recipe write an index write and ruled out HOT updates, to save
+    one heap fetch on the precondition checks"""
+
+    dependencies = [
+        ('core', '0019_recipe_counts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['user', 'id'], name='core_recipe_user_id_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='recipe',
+            name='core_recipe_user_id_upd_idx',
+        ),
+    ]
@@ -1,4 +1,10 @@
-from django.db import models
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, SearchVectorField)
+from django.db import connections, models, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Upper
 from django.contrib.auth.models import BaseUserManager, AbstractBaseUser, PermissionsMixin
 from django.utils.text import slugify
 from uuid import uuid4
@@ -40,22 +46,214 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
-class Tag(models.Model):
+class RecipeCountQuerySet(models.QuerySet):
+    """tags and ingredients, whose recipe_count is the number of recipes
+    linking them. recipe.signals keeps it with F() updates on every M2M
+    change and recipe delete, the paths writing through rows in bulk call
+    add_recipes()/remove_recipes() themselves"""
+
+    def _links(self, **filters):
+        """the rows of Recipe's through table to this model, and the name
+        of their foreign key to it"""
+        field = self.model.recipe_set.field
+        name = field.m2m_reverse_field_name()
+        return field.remote_field.through.objects.filter(**filters), name
+
+    def _counted(self, **filters):
+        """the number of links matching filters of the outer row"""
+        links, name = self._links(**filters)
+        return Coalesce(Subquery(
+            links.filter(**{f'{name}_id': OuterRef('pk')})
+            .values(f'{name}_id').annotate(count=Count('*'))
+            .values('count')), 0)
+
+    def _shift(self, recipes, sign):
+        links, name = self._links(recipe_id__in=recipes)
+        counted = self._counted(recipe_id__in=recipes)
+        return self.filter(pk__in=links.values(f'{name}_id')).update(
+            recipe_count=F('recipe_count') + counted if sign > 0
+            else F('recipe_count') - counted)
+
+    def add_recipes(self, recipes):
+        """count the links of recipes (pks or a queryset of them) in one
+        UPDATE, after they were inserted"""
+        return self._shift(recipes, 1)
+
+    def remove_recipes(self, recipes):
+        """the opposite of add_recipes(), before the links are deleted"""
+        return self._shift(recipes, -1)
+
+    def drifted(self):
+        """the rows whose recipe_count is not the number of links"""
+        return self.exclude(recipe_count=self._counted())
+
+    def recount_recipes(self):
+        """set the drifted counts from the through table, returns how
+        many were off"""
+        return self.model._default_manager.filter(
+            pk__in=self.drifted().values('pk'),
+        ).update(recipe_count=self._counted())
+
+
+class RecipeCountMixin:
+    """save() of a row that exists writes every field but recipe_count;
+    the copy loaded with the object is stale once a recipe links or
+    unlinks it, writing it back would undo those F() updates"""
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        if update_fields is None and not force_insert \
+                and not self._state.adding:
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'recipe_count']
+        super().save(force_insert, force_update, using, update_fields)
+
+
+class Tag(RecipeCountMixin, models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=50)
+    # a plain integer, a counter that drifted below zero under concurrent
+    # removes must not fail the write; reconcile_recipe_counts repairs it
+    recipe_count = models.IntegerField(default=0, editable=False)
+
+    objects = RecipeCountQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # covers the list projection, (user, name) lookups use the
+            # unique constraint's index
+            models.Index(fields=['user', 'id'],
+                         include=['name', 'recipe_count'],
+                         name='core_tag_user_id_cnt_idx'),
+            # the tags in use, ?assign_only=1
+            models.Index(fields=['user', 'id'],
+                         include=['name', 'recipe_count'],
+                         condition=Q(recipe_count__gt=0),
+                         name='core_tag_user_used_idx'),
+            # serves both the prefix LIKE and the similarity operators of
+            # recipe.suggest
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'),
+                     name='core_tag_name_trgm'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'], name='core_tag_user_name_uniq'),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class Ingredient(models.Model):
+class Ingredient(RecipeCountMixin, models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
+    recipe_count = models.IntegerField(default=0, editable=False)
+
+    objects = RecipeCountQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['user', 'id'],
+                         include=['name', 'recipe_count'],
+                         name='core_ingr_user_id_cnt_idx'),
+            models.Index(fields=['user', 'id'],
+                         include=['name', 'recipe_count'],
+                         condition=Q(recipe_count__gt=0),
+                         name='core_ingr_user_used_idx'),
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'),
+                     name='core_ingredient_name_trgm'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='core_ingredient_user_name_uniq'),
+        ]
 
     def __str__(self):
         return self.name
 
 
+SEARCH_CONFIG = 'english'
+
+
+def recipe_search_vector(model):
+    """the document stored in recipe.search_vector, the title ranks above
+    tag and ingredient names which rank above the description"""
+    def names(field):
+        through = model._meta.get_field(field).remote_field.through
+        return Coalesce(Subquery(
+            through.objects.filter(recipe_id=OuterRef('pk'))
+            .values('recipe_id')
+            .annotate(names=StringAgg(f'{field}__name', ' '))
+            .values('names')), Value(''), output_field=models.TextField())
+
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(names('tag'), weight='B', config=SEARCH_CONFIG)
+        + SearchVector(names('ingredient'), weight='B', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='C', config=SEARCH_CONFIG))
+
+
+class RecipeQuerySet(models.QuerySet):
+    def with_related(self, fields=('tag', 'ingredient')):
+        """prefetch tag and/or ingredient with only the columns the
+        serializers render, so listing costs a fixed number of queries"""
+        lookups = {
+            'tag': models.Prefetch(
+                'tag', queryset=Tag.objects.only('id', 'name')),
+            'ingredient': models.Prefetch(
+                'ingredient', queryset=Ingredient.objects.only('id', 'name')),
+        }
+        return self.prefetch_related(*(lookups[field] for field in fields))
+
+    def delete(self):
+        """take the recipes off the recipe_count of their tags and
+        ingredients with one UPDATE each; recipe.signals only does it for
+        deletes that start at a single recipe"""
+        with transaction.atomic(using=self.db):
+            for model in (Tag, Ingredient):
+                model.objects.remove_recipes(self.values('pk'))
+            return super().delete()
+
+    def _full_text(self):
+        return connections[self.db].vendor == 'postgresql'
+
+    def search_vector_update(self):
+        """update() kwargs that recompute search_vector, empty where there
+        is no full-text search"""
+        if not self._full_text():
+            return {}
+        return {'search_vector': recipe_search_vector(self.model)}
+
+    def search(self, text):
+        """recipes matching text, best ranked first; without Postgres every
+        word must be a substring of the title, description or a name and
+        title matches come first"""
+        if self._full_text():
+            query = SearchQuery(
+                text, config=SEARCH_CONFIG, search_type='websearch')
+            return self.filter(search_vector=query).annotate(
+                rank=SearchRank(F('search_vector'), query),
+            ).order_by('-rank', 'id')
+
+        queryset = self
+        for word in text.split():
+            queryset = queryset.filter(
+                Q(title__icontains=word) | Q(description__icontains=word)
+                | Exists(Tag.objects.filter(
+                    recipe=OuterRef('pk'), name__icontains=word))
+                | Exists(Ingredient.objects.filter(
+                    recipe=OuterRef('pk'), name__icontains=word)))
+        return queryset.annotate(
+            rank=models.Case(
+                models.When(title__icontains=text, then=Value(1.0)),
+                default=Value(0.0), output_field=models.FloatField()),
+        ).order_by('-rank', 'id')
+
+
 class Recipe(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     tag = models.ManyToManyField(Tag)
@@ -66,6 +264,27 @@ class Recipe(models.Model):
     description = models.TextField(max_length=500)
     link = models.URLField(max_length=200)
     image = models.ImageField(upload_to=recipe_image_file_path, null=True, blank=True)
+    # {'webp_320': storage name, ...} filled in by core.images in background
+    image_variants = models.JSONField(default=dict, blank=True)
+    # also touched by recipe.signals when tags/ingredients change, it is
+    # the validator of the recipe's ETag and Last-Modified headers
+    updated_at = models.DateTimeField(auto_now=True)
+    # maintained by recipe.signals, stays NULL on databases other than
+    # Postgres where RecipeQuerySet.search falls back to substring matches
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # no updated_at in it: every save and link change writes it,
+            # an index holding it would rule out HOT updates
+            models.Index(
+                fields=['user', 'id'], name='core_recipe_user_id_idx'),
+            GinIndex(
+                fields=['search_vector'], name='core_recipe_search_gin'),
+        ]
 
     def __str__(self):
         return self.title
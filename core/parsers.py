@@ -0,0 +1,29 @@
+from io import BytesIO
+from django.conf import settings
+from rest_framework import parsers
+from .renderers import FastJSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class FastJSONParser(parsers.JSONParser):
+    """JSONParser on orjson for utf-8 bodies; whatever orjson refuses is
+    parsed again by the stdlib, which reports the error or accepts what
+    orjson cannot represent (integers beyond 64 bits)"""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get(
+            'encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or \
+                encoding.lower().replace('-', '').replace('_', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(BytesIO(body), media_type, parser_context)
@@ -0,0 +1,128 @@
+import random
+from itertools import islice
+from decimal import Decimal
+from uuid import uuid4
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from recipe.cache import reset_generation
+from .models import Recipe, Tag, Ingredient
+
+WORDS = (
+    'tomato', 'basil', 'garlic', 'onion', 'lentil', 'curry', 'lemon',
+    'ginger', 'chili', 'rice', 'noodle', 'potato', 'mushroom', 'spinach',
+    'cheese', 'butter', 'honey', 'salmon', 'chicken', 'bean', 'pepper',
+    'coconut', 'mint', 'olive', 'almond', 'carrot', 'pumpkin', 'thyme',
+)
+
+
+def _phrase(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def distribution(spec):
+    """rng -> int sampler for a count: N is fixed, A-B uniform and
+    pareto:MEAN[:MAX] a long tail where most users have few rows and some
+    have many, capped at MAX (50 * MEAN by default)"""
+    if callable(spec):
+        return spec
+    if isinstance(spec, int):
+        return lambda rng: spec
+    try:
+        if spec.startswith('pareto:'):
+            mean, _, cap = spec[len('pareto:'):].partition(':')
+            mean = float(mean)
+            cap = int(cap) if cap else int(50 * mean)
+            # shape 2 has the mean at twice the scale
+            return lambda rng: min(cap, int(mean / 2 * rng.paretovariate(2)))
+        low, _, high = spec.partition('-')
+        if high:
+            low, high = int(low), int(high)
+            return lambda rng: rng.randint(low, high)
+        count = int(low)
+        return lambda rng: count
+    except ValueError:
+        raise ValueError(
+            f'{spec!r} is not N, A-B or pareto:MEAN[:MAX]') from None
+
+
+def _insert(model, objs, batch_size):
+    """bulk insert an iterable in batches without building it as a whole,
+    for rows whose pks are not needed afterwards"""
+    objs = iter(objs)
+    while True:
+        batch = list(islice(objs, batch_size))
+        if not batch:
+            return
+        model.objects.bulk_create(batch)
+
+
+def _per_user(objs, counts):
+    """split a flat list into consecutive runs of counts"""
+    objs = iter(objs)
+    return [list(islice(objs, count)) for count in counts]
+
+
+@transaction.atomic
+def seed(users=10, recipes=100, tags=20, ingredients=40, per_recipe=3,
+         random_seed=0, batch_size=1000, password=None):
+    """bulk insert users, each with its own tags, ingredients and recipes
+    linked to per_recipe random tags and ingredients; returns the users.
+    The counts are numbers or distribution() specs sampled per user (per
+    recipe for per_recipe). Every table is inserted for all users at once
+    in batches. Bulk inserts send no signals, so the search vectors, the
+    recipe counts and the response cache generations of the new users,
+    whose ids may have been rolled back and used before, are set here"""
+    rng = random.Random(random_seed)
+    recipes, tags, ingredients, per_recipe = map(
+        distribution, (recipes, tags, ingredients, per_recipe))
+    run = uuid4().hex[:8]
+    # one hash for everyone, hashing a password per user would dominate
+    password = make_password(password)
+    created = get_user_model().objects.bulk_create([
+        get_user_model()(email=f'seed-{run}-{i}@example.com',
+                         password=password)
+        for i in range(users)], batch_size=batch_size)
+    for user in created:
+        reset_generation(user.pk)
+    counts = [(tags(rng), ingredients(rng), recipes(rng)) for _ in created]
+
+    user_tags = _per_user(Tag.objects.bulk_create([
+        Tag(user=user, name=f'{_phrase(rng, 2)} {i}')
+        for user, (count, _, _) in zip(created, counts)
+        for i in range(count)], batch_size=batch_size),
+        [count for count, _, _ in counts])
+    user_ingredients = _per_user(Ingredient.objects.bulk_create([
+        Ingredient(user=user, name=f'{_phrase(rng, 1)} {i}')
+        for user, (_, count, _) in zip(created, counts)
+        for i in range(count)], batch_size=batch_size),
+        [count for _, count, _ in counts])
+    user_recipes = _per_user(Recipe.objects.bulk_create([
+        Recipe(
+            user=user, title=_phrase(rng, 3),
+            description=_phrase(rng, 12),
+            time_minute=rng.randint(5, 180),
+            price=Decimal(rng.randint(100, 9999)) / 100,
+            link=f'http://example.com/{run}/{user.pk}/{i}.pdf')
+        for user, (_, _, count) in zip(created, counts)
+        for i in range(count)], batch_size=batch_size),
+        [count for _, _, count in counts])
+
+    for field, related in (('tag', user_tags),
+                           ('ingredient', user_ingredients)):
+        through = getattr(Recipe, field).through
+        _insert(through, (
+            through(recipe_id=recipe.pk, **{f'{field}_id': obj.pk})
+            for objs, recipes_of_user in zip(related, user_recipes)
+            for recipe in recipes_of_user
+            for obj in rng.sample(objs, min(per_recipe(rng), len(objs)))),
+            batch_size)
+        # counted from the inserted links, no signal did it
+        model = Tag if field == 'tag' else Ingredient
+        model.objects.filter(user__in=created).recount_recipes()
+
+    queryset = Recipe.objects.filter(user__in=created)
+    fields = queryset.search_vector_update()
+    if fields:
+        queryset.update(**fields)
+    return created
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from . import metrics
+from .authentication import get_token_cache
+
+connection_created.connect(metrics.install)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    get_token_cache().delete(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """the cached user would be stale (new password, email, is_active...)"""
+    if created:
+        return
+    for key in Token.objects.filter(
+            user_id=instance.pk).values_list('key', flat=True):
+        get_token_cache().delete(key)
@@ -0,0 +1,23 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryCountMixin:
+    """assertions for tests that must not regress into N+1 queries"""
+
+    def assertConstantQueries(self, populate, request, sizes=(1, 6, 24)):
+        """call populate(size) then request() for every size and assert the
+        number of executed queries does not depend on the size; populate
+        runs its on_commit callbacks, as a committed write would"""
+        counts = {}
+        for size in sizes:
+            with self.captureOnCommitCallbacks(execute=True):
+                populate(size)
+            with CaptureQueriesContext(connection) as ctx:
+                request()
+            counts[size] = len(ctx.captured_queries)
+
+        self.assertEqual(
+            len(set(counts.values())), 1,
+            f'query count grows with result size: {counts}')
+        return counts[sizes[0]]
@@ -0,0 +1,99 @@
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from core.authentication import (
+    CachedTokenAuthentication, LocalTokenCache, get_token_cache)
+
+
+class LocalTokenCacheTest(TestCase):
+    def test_entries_expire(self):
+        cache = LocalTokenCache(ttl=10, max_size=10)
+        with patch('core.authentication.monotonic', return_value=100):
+            cache.set('key', 'value')
+        with patch('core.authentication.monotonic', return_value=105):
+            self.assertEqual(cache.get('key'), 'value')
+        with patch('core.authentication.monotonic', return_value=111):
+            self.assertIsNone(cache.get('key'))
+
+    def test_least_recently_used_evicted(self):
+        cache = LocalTokenCache(ttl=10, max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+
+class CachedTokenAuthenticationTest(TestCase):
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='test123')
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def test_second_authentication_is_cached(self):
+        self.auth.authenticate_credentials(self.token.key)
+
+        with self.assertNumQueries(0):
+            user, token = self.auth.authenticate_credentials(self.token.key)
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(token, self.token)
+
+    def test_cached_user_is_a_copy(self):
+        first, _ = self.auth.authenticate_credentials(self.token.key)
+        first.email = 'changed@example.com'
+
+        second, _ = self.auth.authenticate_credentials(self.token.key)
+
+        self.assertEqual(second.email, 'test@example.com')
+
+    def test_deleted_token_invalidated(self):
+        key = self.token.key
+        self.auth.authenticate_credentials(key)
+
+        self.token.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(key)
+
+    def test_saved_user_invalidated(self):
+        self.auth.authenticate_credentials(self.token.key)
+
+        self.user.email = 'changed@example.com'
+        self.user.save()
+
+        user, _ = self.auth.authenticate_credentials(self.token.key)
+        self.assertEqual(user.email, 'changed@example.com')
+
+    def test_deleted_user_invalidated(self):
+        key = self.token.key
+        self.auth.authenticate_credentials(key)
+
+        self.user.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(key)
+
+    @override_settings(
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'token-auth-test'}},
+        TOKEN_AUTH_CACHE={'CACHE_ALIAS': 'default'})
+    def test_shared_cache_backend(self):
+        key = self.token.key
+        self.auth.authenticate_credentials(key)
+
+        with self.assertNumQueries(0):
+            user, _ = self.auth.authenticate_credentials(key)
+        self.assertEqual(user, self.user)
+
+        self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(key)
@@ -0,0 +1,76 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from django.test import SimpleTestCase
+from core.bench import percentile, queries_from_timing, run_load
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        status = 200 if self.headers.get('Authorization') == 'ok' else 401
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.bodies.append(body)
+        self.send_response(201)
+        self.send_header('Server-Timing',
+                         'db;dur=1.00;desc="2 queries", total;dur=3.00')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class BenchTest(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.bodies = []
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/recipes/'
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+
+        self.assertEqual(percentile(values, 0.5), 51)
+        self.assertEqual(percentile(values, 0.99), 100)
+        self.assertIsNone(percentile([], 0.5))
+
+    def test_run_load(self):
+        result = run_load(
+            self.url, headers={'Authorization': 'ok'},
+            concurrency=4, requests=40)
+
+        self.assertEqual(result['errors'], 0)
+        self.assertGreater(result['rps'], 0)
+        self.assertLessEqual(result['p50'], result['p99'])
+
+    def test_error_answers_are_counted(self):
+        result = run_load(self.url, concurrency=2, requests=10)
+
+        self.assertEqual(result['errors'], 10)
+        self.assertIsNone(result['p50'])
+
+    def test_post_bodies_and_query_counts(self):
+        result = run_load(
+            self.url, concurrency=2, requests=6, method='POST',
+            body=lambda ticket: f'{{"n": {ticket}}}'.encode())
+
+        self.assertEqual(result['errors'], 0)
+        self.assertEqual(result['queries'], 2)
+        self.assertCountEqual(
+            self.server.bodies,
+            [f'{{"n": {i}}}'.encode() for i in range(6)])
+
+    def test_queries_from_timing(self):
+        self.assertEqual(queries_from_timing(
+            'render;dur=1.0, db;dur=2.50;desc="7 queries"'), 7)
+        self.assertIsNone(queries_from_timing('total;dur=1.0'))
+        self.assertIsNone(queries_from_timing(None))
@@ -1,6 +1,8 @@
-from django.test import SimpleTestCase
+from io import StringIO
+from django.test import SimpleTestCase, override_settings
 from unittest.mock import patch
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from psycopg2 import OperationalError as Psycopg2Error
 
@@ -19,3 +21,56 @@ class CommandTest(SimpleTestCase):
         call_command('wait_for_db')
         patched_check.assert_called_with(databases=['default'])
         self.assertEqual(patched_check.call_count, 6)
+
+
+@patch('core.management.commands.serve.os.execv')
+class ServeCommandTest(SimpleTestCase):
+    def options(self, patched_execv):
+        args = patched_execv.call_args[0][1]
+        return dict(zip(args, args[1:]))
+
+    @patch('core.management.commands.serve.os.cpu_count', return_value=4)
+    def test_sync_workers_from_cpus(self, patched_cpu_count, patched_execv):
+        call_command('serve', stdout=StringIO())
+
+        args = patched_execv.call_args[0][1]
+        options = self.options(patched_execv)
+        self.assertIn('actions_drf.wsgi:application', args)
+        self.assertIn('--preload', args)
+        self.assertEqual(options['--workers'], '9')
+        self.assertEqual(options['--worker-class'], 'sync')
+
+    @patch('core.management.commands.serve.os.cpu_count', return_value=4)
+    def test_asgi_workers(self, patched_cpu_count, patched_execv):
+        call_command('serve', '--interface', 'asgi', '--no-preload',
+                     stdout=StringIO())
+
+        args = patched_execv.call_args[0][1]
+        options = self.options(patched_execv)
+        self.assertIn('actions_drf.asgi:application', args)
+        self.assertNotIn('--preload', args)
+        self.assertEqual(options['--workers'], '4')
+        self.assertEqual(
+            options['--worker-class'], 'uvicorn.workers.UvicornWorker')
+
+    @patch('core.management.commands.serve.call_command')
+    def test_migrate_first(self, patched_call_command, patched_execv):
+        call_command('serve', '--workers', '2', stdout=StringIO())
+        patched_call_command.assert_not_called()
+
+        call_command('serve', '--migrate', stdout=StringIO())
+        patched_call_command.assert_called_once_with(
+            'migrate', interactive=False)
+        self.assertEqual(patched_execv.call_count, 2)
+
+    @override_settings(DEBUG=True)
+    def test_refuses_debug(self, patched_execv):
+        with self.assertRaisesMessage(CommandError, 'DJANGO_DEBUG=0'):
+            call_command('serve', stdout=StringIO())
+        patched_execv.assert_not_called()
+
+    @override_settings(ALLOWED_HOSTS=[])
+    def test_refuses_without_allowed_hosts(self, patched_execv):
+        with self.assertRaisesMessage(CommandError, 'DJANGO_ALLOWED_HOSTS'):
+            call_command('serve', stdout=StringIO())
+        patched_execv.assert_not_called()
@@ -0,0 +1,107 @@
+from unittest.mock import patch
+from django.test import SimpleTestCase
+from core.db.pool import ConnectionPool, ConnectionStats, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def make_pool(self, **kwargs):
+        self.opened = []
+
+        def connect():
+            self.opened.append(FakeConnection())
+            return self.opened[-1]
+
+        kwargs.setdefault('reset', lambda conn: not conn.closed)
+        kwargs.setdefault('is_usable', lambda conn: True)
+        return ConnectionPool(connect, **kwargs)
+
+    def test_returned_connection_is_reused(self):
+        pool = self.make_pool()
+        conn, reused = pool.get()
+        self.assertFalse(reused)
+        pool.put(conn)
+
+        again, reused = pool.get()
+
+        self.assertIs(again, conn)
+        self.assertTrue(reused)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_waits_for_a_free_slot(self):
+        pool = self.make_pool(max_size=1, timeout=0.01)
+        pool.get()
+
+        with self.assertRaises(PoolTimeout):
+            pool.get()
+
+    def test_slot_released_when_connect_fails(self):
+        pool = ConnectionPool(
+            lambda: 1 / 0, reset=None, is_usable=None,
+            max_size=1, timeout=0.01)
+        for _ in range(2):
+            with self.assertRaises(ZeroDivisionError):
+                pool.get()
+
+    def test_connection_that_cannot_be_reset_is_closed(self):
+        pool = self.make_pool(reset=lambda conn: False)
+        conn, _ = pool.get()
+        pool.put(conn)
+
+        again, reused = pool.get()
+
+        self.assertTrue(conn.closed)
+        self.assertIsNot(again, conn)
+        self.assertFalse(reused)
+
+    def test_long_idle_connection_is_checked(self):
+        checked = []
+        pool = self.make_pool(
+            check_after=30,
+            is_usable=lambda conn: checked.append(conn) or False)
+        with patch('core.db.pool.monotonic', return_value=100):
+            conn, _ = pool.get()
+            pool.put(conn)
+        with patch('core.db.pool.monotonic', return_value=110):
+            self.assertTrue(pool.get()[1])
+            pool.put(conn)
+        self.assertEqual(checked, [])
+
+        with patch('core.db.pool.monotonic', return_value=200):
+            again, reused = pool.get()
+
+        self.assertEqual(checked, [conn])
+        self.assertTrue(conn.closed)
+        self.assertFalse(reused)
+
+    def test_old_connection_is_replaced(self):
+        pool = self.make_pool(max_lifetime=60)
+        with patch('core.db.pool.monotonic', return_value=0):
+            conn, _ = pool.get()
+        with patch('core.db.pool.monotonic', return_value=70):
+            pool.put(conn)
+            again, reused = pool.get()
+
+        self.assertTrue(conn.closed)
+        self.assertFalse(reused)
+
+
+class ConnectionStatsTest(SimpleTestCase):
+    def test_record(self):
+        stats = ConnectionStats()
+        stats.record('default', 0.02, reused=False)
+        stats.record('default', 0.001, reused=True)
+        stats.record('default', 0.003, reused=True)
+
+        snapshot = stats.snapshot()['default']
+
+        self.assertEqual(snapshot['opened'], 1)
+        self.assertEqual(snapshot['reused'], 2)
+        self.assertAlmostEqual(snapshot['reused_seconds'], 0.004)
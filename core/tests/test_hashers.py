@@ -0,0 +1,162 @@
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from io import StringIO
+from time import monotonic
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.hashers import get_slots
+
+TOKEN_URL = reverse('user:token')
+# cheap costs, the tests are about which hash is stored
+CHEAP = {'ARGON2_TIME_COST': 1, 'ARGON2_MEMORY_COST': 256}
+
+
+# holds the lock files it is given until its stdin closes
+HOLD_LOCKS = """
+import fcntl, os, sys
+for path in sys.argv[1:]:
+    fcntl.flock(os.open(path, os.O_RDWR | os.O_CREAT, 0o600), fcntl.LOCK_EX)
+print('held', flush=True)
+sys.stdin.read()
+"""
+
+
+class PasswordHashingTest(TestCase):
+    def setUp(self):
+        lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(lock_dir.cleanup)
+        self.lock_dir = lock_dir.name
+        hashing = self.hashing()
+        hashing.enable()
+        self.addCleanup(hashing.disable)
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='test123')
+
+    def hashing(self, **config):
+        return override_settings(PASSWORD_HASHING={
+            **CHEAP, 'LOCK_DIR': self.lock_dir, **config})
+
+    def login(self):
+        return self.client.post(
+            TOKEN_URL, {'email': 'test@example.com', 'password': 'test123'})
+
+    def release(self, holder):
+        if holder.returncode is None:
+            holder.communicate('')
+
+    def hold(self, *names):
+        """another worker process holding the lock files names"""
+        holder = subprocess.Popen(
+            [sys.executable, '-c', HOLD_LOCKS,
+             *(os.path.join(self.lock_dir, name) for name in names)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        self.addCleanup(self.release, holder)
+        self.assertEqual(holder.stdout.readline().strip(), 'held')
+        return holder
+
+    def test_new_passwords_argon2(self):
+        self.assertTrue(self.user.password.startswith('argon2$argon2id$'))
+        self.assertIn('m=256,t=1,p=1', self.user.password)
+
+    def test_pbkdf2_rehashed_on_login(self):
+        self.user.password = make_password('test123', hasher='pbkdf2_sha256')
+        self.user.save()
+
+        res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('argon2$'))
+
+    def test_rehashed_on_new_costs(self):
+        with self.hashing(ARGON2_TIME_COST=2):
+            res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertIn('m=256,t=2,p=1', self.user.password)
+
+    def test_busy_queue_503(self):
+        release, held = threading.Event(), threading.Event()
+
+        def hold():
+            held.set()
+            release.wait()
+
+        with self.hashing(WORKERS=1, QUEUE=0, TIMEOUT=0):
+            holder = threading.Thread(target=get_slots().run, args=(hold,))
+            holder.start()
+            held.wait()
+            try:
+                res = self.login()
+            finally:
+                release.set()
+                holder.join()
+
+            self.assertEqual(
+                res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual(res['Retry-After'], '1')
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+    def test_slots_shared_between_processes(self):
+        """a slot held by another worker process is not free here, however
+        idle this process is"""
+        holder = self.hold('place-0', 'slot-0')
+        with self.hashing(WORKERS=1, QUEUE=1, TIMEOUT=0.05):
+            res = self.login()
+        self.release(holder)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        with self.hashing(WORKERS=1, QUEUE=1, TIMEOUT=5):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+    def test_queue_shared_between_processes(self):
+        """with every place of the line taken by other processes a login
+        gets its 503 at once, not after TIMEOUT"""
+        self.hold('place-0', 'place-1', 'slot-0')
+        with self.hashing(WORKERS=1, QUEUE=1, TIMEOUT=30):
+            started = monotonic()
+            res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertLess(monotonic() - started, 5)
+
+    def test_waiter_woken_by_release(self):
+        """a login waiting for the slot gets it once the holder lets go"""
+        holder = self.hold('place-0', 'slot-0')
+        with self.hashing(WORKERS=1, QUEUE=1, TIMEOUT=30):
+            releaser = threading.Timer(0.2, self.release, [holder])
+            releaser.start()
+            res = self.login()
+            releaser.join()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_nested_hash_inline(self):
+        """PBKDF2's verify() encodes, in the slot it already holds"""
+        encoded = make_password('test123', hasher='pbkdf2_sha256')
+
+        with self.hashing(WORKERS=1, QUEUE=0, TIMEOUT=0):
+            self.assertTrue(check_password('test123', encoded))
+
+    def test_bench_logins(self):
+        out = StringIO()
+
+        call_command('bench_logins', '--logins', '2', '--threads', '2',
+                     '--hashers', 'argon2', 'pbkdf2_sha256', stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(
+            [line.split()[0] for line in lines],
+            ['hasher', 'argon2', 'pbkdf2_sha256', 'token'])
+        self.assertFalse(get_user_model().objects.filter(
+            email='bench-login@example.com').exists())
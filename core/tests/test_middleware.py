@@ -0,0 +1,89 @@
+import json
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, TestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from core.middleware import RequestMetricsMiddleware
+from core.models import Recipe, Tag
+
+
+def server_timing(response):
+    """{metric: {param: value}} of the Server-Timing header"""
+    timing = {}
+    for entry in response['Server-Timing'].split(', '):
+        name, *params = entry.split(';')
+        timing[name] = dict(param.split('=', 1) for param in params)
+    return timing
+
+
+class RequestMetricsMiddlewareTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='test123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(6):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Recipe {i}', time_minute=5,
+                price=Decimal('5.00'))
+            recipe.tag.add(Tag.objects.create(user=self.user, name=f'{i}'))
+
+    def test_list_timings(self):
+        with self.assertLogs('core.metrics', 'INFO') as logs:
+            res = self.client.get(reverse('recipe:recipe-list'))
+
+        timing = server_timing(res)
+        self.assertEqual(timing['db']['desc'], '"3 queries"')
+        self.assertIn('serialize', timing)
+        self.assertIn('render', timing)
+        self.assertNotIn('n-plus-one', timing)
+        record = logs.records[0].metrics
+        self.assertEqual(record['view'], 'recipe:recipe-list')
+        self.assertEqual(record['queries'], 3)
+        self.assertEqual(record['n_plus_one'], [])
+        self.assertEqual(json.loads(logs.records[0].getMessage()), record)
+
+    def test_n_plus_one_flagged(self):
+        def view(request):
+            for recipe in Recipe.objects.all():
+                list(recipe.tag.all())
+            return HttpResponse()
+
+        middleware = RequestMetricsMiddleware(view)
+
+        with self.assertLogs('core.metrics', 'WARNING') as logs:
+            res = middleware(RequestFactory().get('/'))
+
+        self.assertEqual(
+            server_timing(res)['n-plus-one']['desc'], '"6x same query"')
+        [repeated] = logs.records[0].metrics['n_plus_one']
+        self.assertEqual(repeated['times'], 6)
+        self.assertIn('core_recipe_tag', repeated['sql'])
+
+    def test_in_lists_of_any_length_are_one_statement(self):
+        def view(request):
+            for size in range(1, 6):
+                list(Recipe.objects.filter(pk__in=range(size)))
+            return HttpResponse()
+
+        with self.assertLogs('core.metrics', 'WARNING'):
+            res = RequestMetricsMiddleware(view)(RequestFactory().get('/'))
+
+        self.assertIn('n-plus-one', server_timing(res))
+
+    async def test_async_view_queries_counted(self):
+        token = await Token.objects.acreate(user=self.user)
+
+        with self.assertLogs('core.metrics', 'INFO'):
+            res = await AsyncClient().get(
+                reverse('recipe:recipe-list-async'),
+                headers={'Authorization': f'Token {token.key}'})
+
+        self.assertEqual(res.status_code, 200)
+        timing = server_timing(res)
+        # the token lookup, the recipes and their tags and ingredients
+        self.assertEqual(timing['db']['desc'], '"4 queries"')
+        self.assertIn('render', timing)
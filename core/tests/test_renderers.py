@@ -0,0 +1,86 @@
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from io import BytesIO
+from unittest.mock import patch
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+
+SAMPLE = ReturnList([ReturnDict({
+    'id': 1,
+    'title': 'Crème brûlée \u2028\u2029 "quoted" \\ <tag>',
+    'price': '5.25',
+    'time_minute': 22,
+    'ratio': 0.1,
+    'link': None,
+    'tag': ['http://testserver/api/recipe/tags/1/'],
+    'image_variants': {'webp_320': 'http://testserver/media/a.webp'},
+    'created': datetime(2023, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc),
+    'day': date(2023, 5, 1),
+    'uuid': uuid.UUID(int=1),
+    'lazy': gettext_lazy('Not found.'),
+    'empty': {},
+    'flags': (True, False),
+    1: 'int key',
+}, serializer=None)], serializer=None)
+
+
+class FastJSONRendererTest(SimpleTestCase):
+    def test_same_bytes_as_json_renderer(self):
+        self.assertEqual(
+            FastJSONRenderer().render(SAMPLE), JSONRenderer().render(SAMPLE))
+
+    def test_decimal_rendered_as_string(self):
+        self.assertEqual(
+            FastJSONRenderer().render({'price': Decimal('0.10')}),
+            b'{"price":"0.10"}')
+
+    def test_indent_and_big_integers_use_stdlib(self):
+        renderer = FastJSONRenderer()
+        for data, media_type in (
+                (SAMPLE, 'application/json; indent=4'),
+                ({'big': 2 ** 70}, None)):
+            self.assertEqual(
+                renderer.render(data, media_type),
+                JSONRenderer().render(data, media_type))
+
+    def test_without_orjson(self):
+        with patch('core.renderers.orjson', None):
+            ret = FastJSONRenderer().render(SAMPLE)
+
+        self.assertEqual(ret, JSONRenderer().render(SAMPLE))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+
+class FastJSONParserTest(SimpleTestCase):
+    def parse(self, body):
+        return FastJSONParser().parse(BytesIO(body))
+
+    def test_same_data_as_json_parser(self):
+        body = JSONRenderer().render(SAMPLE)
+
+        self.assertEqual(
+            self.parse(body), JSONParser().parse(BytesIO(body)))
+
+    def test_big_integers(self):
+        self.assertEqual(self.parse(b'{"big": 1180591620717411303424}'),
+                         {'big': 2 ** 70})
+
+    def test_invalid_json(self):
+        for body in (b'{"title": ', b'{"ratio": NaN}'):
+            with self.assertRaisesMessage(ParseError, 'JSON parse error'):
+                self.parse(body)
+
+    def test_other_encodings_use_stdlib(self):
+        body = '{"title": "Crème"}'.encode('latin-1')
+
+        self.assertEqual(
+            FastJSONParser().parse(
+                BytesIO(body), parser_context={'encoding': 'latin-1'}),
+            {'title': 'Crème'})
@@ -0,0 +1,170 @@
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.pagination import _positive_int
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from core.authentication import CachedTokenAuthentication
+from core.renderers import FastJSONRenderer
+from core.models import Recipe, Tag, Ingredient
+from .fast import (
+    DETAIL_FIELDS, RecipeRowRenderer, group_related, related_rows)
+from .views import PageNumber, filter_recipes
+
+
+class AsyncReadView(View):
+    """GET-only views for ASGI. Django's async ORM methods (aget, acount,
+    aiterator) are sync_to_async wrappers, one trip to the thread each,
+    so query() runs every query of a request in one trip. Token
+    authentication stays on the event loop while the token cache answers.
+    The JSON matches the sync views'"""
+    authentication = CachedTokenAuthentication()
+    renderer = FastJSONRenderer()
+    http_method_names = ['get', 'options']
+
+    def render(self, data, status=200):
+        return HttpResponse(
+            self.renderer.render(data), status=status,
+            content_type=self.renderer.media_type)
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            credentials = await self.authentication.aauthenticate(request)
+            if credentials is None:
+                raise exceptions.NotAuthenticated()
+            request.user, request.auth = credentials
+            return await super().dispatch(request, *args, **kwargs)
+        except Http404:
+            return self.render(
+                {'detail': str(exceptions.NotFound.default_detail)}, 404)
+        except exceptions.APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (dict, list)) \
+                else {'detail': exc.detail}
+            response = self.render(data, exc.status_code)
+            if isinstance(exc, (exceptions.NotAuthenticated,
+                                exceptions.AuthenticationFailed)):
+                response.status_code = 401
+                response['WWW-Authenticate'] = \
+                    self.authentication.authenticate_header(request)
+            return response
+
+    def page_params(self, request):
+        """(page, size) of ?paginate=page, None to list everything"""
+        mode = request.GET.get('paginate')
+        if mode is None:
+            return None
+        if mode != 'page':
+            raise exceptions.ValidationError(
+                {'paginate': 'must be page on this endpoint'})
+        try:
+            size = _positive_int(
+                request.GET[PageNumber.page_size_query_param],
+                strict=True, cutoff=PageNumber.max_page_size)
+        except (KeyError, ValueError):
+            size = PageNumber.page_size
+        try:
+            page = _positive_int(
+                request.GET.get(PageNumber.page_query_param, 1), strict=True)
+        except ValueError:
+            raise exceptions.NotFound('Invalid page.')
+        return page, size
+
+    async def get(self, request, *args, **kwargs):
+        return self.render(
+            await sync_to_async(self.query)(request, *args, **kwargs))
+
+    def query(self, request, *args, **kwargs):
+        """the data of the response, run in a sync_to_async thread"""
+        raise NotImplementedError
+
+    def paginate(self, request, queryset, build):
+        """render build(rows) plainly or in the envelope of PageNumber"""
+        page_params = self.page_params(request)
+        if page_params is None:
+            return build(queryset)
+
+        page, size = page_params
+        count = queryset.count()
+        if page > 1 and (page - 1) * size >= count:
+            raise exceptions.NotFound('Invalid page.')
+        url = request.build_absolute_uri()
+        param = PageNumber.page_query_param
+        previous = None
+        if page == 2:
+            previous = remove_query_param(url, param)
+        elif page > 2:
+            previous = replace_query_param(url, param, page - 1)
+        return {
+            'count': count,
+            'next': replace_query_param(url, param, page + 1)
+            if page * size < count else None,
+            'previous': previous,
+            'results': build(queryset[(page - 1) * size:page * size]),
+        }
+
+
+def _related(renderer, rows):
+    """the related dicts RecipeRowRenderer.render() takes for rows"""
+    ids = [row['id'] for row in rows]
+    return {
+        name: group_related(
+            related_rows(name, ids, renderer.nested) if ids else ())
+        for name in renderer.related_fields}
+
+
+class AsyncRecipeListView(AsyncReadView):
+    """GET of RecipeListView: same filters, unpaginated or ?paginate=page"""
+
+    def build(self, queryset):
+        rows = list(queryset)
+        return self.row_renderer.render(
+            rows, _related(self.row_renderer, rows))
+
+    def query(self, request, *args, **kwargs):
+        self.row_renderer = RecipeRowRenderer(request)
+        queryset = filter_recipes(Recipe.objects.all(), request.GET).filter(
+            user=request.user).values(*self.row_renderer.columns)
+        return self.paginate(request, queryset, self.build)
+
+
+class AsyncRecipeDetailView(AsyncReadView):
+    """GET of RecipeDetailView"""
+
+    def query(self, request, *args, **kwargs):
+        renderer = RecipeRowRenderer(
+            request, DETAIL_FIELDS, nested=True, all_fields=DETAIL_FIELDS)
+        try:
+            row = Recipe.objects.values(*renderer.columns).get(
+                pk=kwargs['recipe_id'], user=request.user)
+        except Recipe.DoesNotExist:
+            raise Http404
+        return renderer.render([row], _related(renderer, [row]))[0]
+
+
+class AsyncNameListView(AsyncReadView):
+    """GET of TagListView and IngredientListView"""
+    model = None
+
+    def build(self, queryset):
+        return [{'id': pk, 'name': name, 'recipe_count': count}
+                for pk, name, count in
+                queryset.values_list('id', 'name', 'recipe_count')]
+
+    def query(self, request, *args, **kwargs):
+        queryset = self.model.objects.filter(user=request.user)
+        try:
+            assign_only = bool(int(request.GET.get('assign_only', 0)))
+        except ValueError:
+            raise exceptions.ValidationError(
+                {'assign_only': 'must be 0 or 1'})
+        if assign_only:
+            queryset = queryset.filter(recipe_count__gt=0)
+        return self.paginate(request, queryset, self.build)
+
+
+class AsyncTagListView(AsyncNameListView):
+    model = Tag
+
+
+class AsyncIngredientListView(AsyncNameListView):
+    model = Ingredient
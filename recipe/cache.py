@@ -0,0 +1,124 @@
+import hashlib
+from time import time_ns
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from rest_framework.response import Response
+
+DEFAULT_RESPONSE_CACHE = {
+    'ALIAS': 'default',
+    'TTL': 300,
+    # None caches only on a backend every worker process shares: with a
+    # process-local one a write bumps the generation of its own process
+    # and the others serve, and 304, the old lists until the TTL
+    'ENABLED': None,
+}
+
+# backends whose entries only the process holding them sees
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def _options():
+    return {**DEFAULT_RESPONSE_CACHE,
+            **getattr(settings, 'RESPONSE_CACHE', {})}
+
+
+def _cache():
+    return caches[_options()['ALIAS']]
+
+
+def is_shared():
+    return not isinstance(_cache(), PROCESS_LOCAL_BACKENDS)
+
+
+def is_enabled():
+    enabled = _options()['ENABLED']
+    return is_shared() if enabled is None else enabled
+
+
+def _generation_key(user_id):
+    return f'resp-gen:{user_id}'
+
+
+def get_generation(user_id):
+    """current generation of the user's cached responses, every cached entry
+    embeds it in its key so bumping it invalidates all of them at once"""
+    cache = _cache()
+    key = _generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        # a lost counter restarts from the clock so keys are never reused
+        cache.add(key, time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(user_id):
+    cache = _cache()
+    key = _generation_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time_ns(), None)
+
+
+def bump_generation_on_commit(user_id):
+    """bump once the write is committed; bumped inside the transaction, a
+    read running meanwhile could cache the old rows under the new
+    generation for the whole TTL"""
+    transaction.on_commit(lambda: bump_generation(user_id))
+
+
+def reset_generation(user_id):
+    """start a new user (whose id may have been used before) afresh"""
+    _cache().set(_generation_key(user_id), time_ns(), None)
+
+
+def make_etag(*parts):
+    digest = hashlib.sha1(
+        ':'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def response_cache_key(request):
+    query = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values)
+    url = f'{request.build_absolute_uri(request.path)}?{query}'
+    digest = hashlib.sha1(url.encode()).hexdigest()
+    user_id = request.user.pk
+    return f'resp:{user_id}:{get_generation(user_id)}:{digest}'
+
+
+class CachedListMixin:
+    """serve GET list responses from the cache, keyed by user, url and the
+    normalized query params; recipe.signals bumps the user's generation on
+    every write to Recipe, Tag or Ingredient. Lists are not cached when
+    the cache is off, see DEFAULT_RESPONSE_CACHE['ENABLED'].
+
+    The key doubles as a strong ETag, so If-None-Match is answered with a
+    304 before the cache or the database is touched."""
+
+    def list(self, request, *args, **kwargs):
+        if not is_enabled():
+            return super().list(request, *args, **kwargs)
+        cache = _cache()
+        key = response_cache_key(request)
+        etag = make_etag(key, request.accepted_renderer.format)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        data = cache.get(key)
+        if data is not None:
+            response = Response(data)
+        else:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, _options()['TTL'])
+        response['ETag'] = etag
+        return response
@@ -0,0 +1,15 @@
+from django.core import checks
+from .cache import _options, is_shared
+
+
+@checks.register(checks.Tags.caches)
+def check_response_cache(app_configs, **kwargs):
+    """caching lists on a process-local backend serves stale lists, and
+    304s, from every process but the one that made the write"""
+    if _options()['ENABLED'] and not is_shared():
+        return [checks.Warning(
+            'RESPONSE_CACHE is enabled on a process-local cache backend.',
+            hint='Use a cache all worker processes share (CACHE_BACKEND) '
+                 'or leave RESPONSE_CACHE["ENABLED"] at None.',
+            id='recipe.W001')]
+    return []
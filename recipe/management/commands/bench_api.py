@@ -0,0 +1,268 @@
+import json
+from collections import namedtuple
+from urllib.parse import urlencode
+from uuid import uuid4
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from core.bench import run_client, run_load, wait_until_up
+from core.metrics import options as metrics_options
+from core.models import Recipe, Tag, Ingredient
+from core.seed import distribution, seed
+from recipe import urls as recipe_urls
+from user import urls as user_urls
+
+# within the 5-8 characters UserSerializer accepts
+PASSWORD = 'bench123'
+
+# a request of view_name with body, a dict or a function of the request
+# number returning one, sent as JSON
+Case = namedtuple('Case', 'name view_name kwargs params method body',
+                  defaults=({}, {}, 'GET', None))
+
+# what the reports are compared on
+METRICS = ('rps', 'p50', 'p95', 'p99', 'queries', 'errors')
+
+
+def url_names():
+    """namespaced names of every endpoint the benchmark has to cover"""
+    return {f'{module.app_name}:{pattern.name}'
+            for module in (recipe_urls, user_urls)
+            for pattern in module.urlpatterns}
+
+
+class Command(BaseCommand):
+    help = ('Seed users with distribution() counts (see seed_data), send '
+            'requests to every endpoint of the recipe and user APIs and '
+            'report requests/sec, p50/p95/p99 latency in ms and database '
+            'queries per request; with --baseline report regressions. By '
+            'default the requests go through the test client one at a time '
+            'and everything is rolled back; with --url they go to a running '
+            'server sharing the database, and the rows are deleted '
+            'afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', metavar='BASE',
+                            help='a running server, e.g. '
+                                 'http://127.0.0.1:8000')
+        parser.add_argument('--requests', type=int, default=100,
+                            help='requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=10,
+                            help='connections, with --url only')
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--recipes', default='100',
+                            help='recipes per user')
+        parser.add_argument('--tags', default='30', help='tags per user')
+        parser.add_argument('--ingredients', default='40',
+                            help='ingredients per user')
+        parser.add_argument('--per-recipe', default='1-6',
+                            help='tags and ingredients per recipe')
+        parser.add_argument('--only', metavar='NAME', nargs='+',
+                            help='run only these cases')
+        parser.add_argument('--save', metavar='PATH',
+                            help='write the report as a baseline')
+        parser.add_argument('--baseline', metavar='PATH',
+                            help='compare against a saved baseline')
+        parser.add_argument('--slowdown', type=float, default=1.5,
+                            help='p95 and throughput factor that counts '
+                                 'as a regression')
+
+    def _cases(self, user, run):
+        recipe = Recipe.objects.filter(user=user).first()
+        tag = Tag.objects.filter(user=user).first()
+        ingredient = Ingredient.objects.filter(user=user).first()
+        if not (recipe and tag and ingredient):
+            raise CommandError(
+                'the bench user needs a recipe, a tag and an ingredient')
+        tag_ids = ','.join(str(pk) for pk in Tag.objects.filter(
+            user=user).values_list('pk', flat=True)[:2])
+        word = recipe.title.split()[0]
+
+        def new_recipe(ticket):
+            return {'title': f'Bench {ticket}', 'description': 'bench',
+                    'link': f'http://example.com/{run}/{ticket}.pdf',
+                    'price': '5.00', 'time_minute': 10,
+                    'tag': [{'name': tag.name}, {'name': f'bench {run}'}],
+                    'ingredient': [{'name': ingredient.name}]}
+
+        return [
+            Case('recipe-list', 'recipe:recipe-list'),
+            Case('recipe-list-page', 'recipe:recipe-list',
+                 params={'paginate': 'page', 'p': 2}),
+            Case('recipe-list-cursor', 'recipe:recipe-list',
+                 params={'paginate': 'cursor'}),
+            Case('recipe-list-tags', 'recipe:recipe-list',
+                 params={'tags': tag_ids}),
+            Case('recipe-list-search', 'recipe:recipe-list',
+                 params={'q': word}),
+            Case('recipe-create', 'recipe:recipe-list', method='POST',
+                 body=new_recipe),
+            Case('recipe-bulk', 'recipe:recipe-bulk', method='POST',
+                 body=lambda ticket: [new_recipe(f'{ticket}-{i}')
+                                      for i in range(10)]),
+            Case('recipe-detail', 'recipe:recipe-detail',
+                 {'recipe_id': recipe.pk}),
+            Case('tag-list', 'recipe:tag-list'),
+            Case('tag-list-assigned', 'recipe:tag-list',
+                 params={'assign_only': 1}),
+            Case('tag-suggest', 'recipe:tag-suggest',
+                 params={'q': tag.name[:3]}),
+            Case('tag-detail', 'recipe:tag-detail', {'tag_id': tag.pk}),
+            Case('ingredient-list', 'recipe:ingredient-list'),
+            Case('ingredient-suggest', 'recipe:ingredient-suggest',
+                 params={'q': ingredient.name[:3]}),
+            Case('ingredient-detail', 'recipe:ingredient-detail',
+                 {'ingredient_id': ingredient.pk}),
+            Case('recipe-list-async', 'recipe:recipe-list-async'),
+            Case('recipe-detail-async', 'recipe:recipe-detail-async',
+                 {'recipe_id': recipe.pk}),
+            Case('tag-list-async', 'recipe:tag-list-async'),
+            Case('ingredient-list-async', 'recipe:ingredient-list-async'),
+            Case('user-create', 'user:create', method='POST',
+                 body=lambda ticket: {
+                     'email': f'bench-{run}-{ticket}@example.com',
+                     'password': PASSWORD}),
+            Case('user-token', 'user:token', method='POST',
+                 body={'email': user.email, 'password': PASSWORD}),
+            Case('user-me', 'user:me'),
+        ]
+
+    def _check_coverage(self, cases):
+        missing = url_names() - {case.view_name for case in cases}
+        if missing:
+            raise CommandError(
+                f'no benchmark case for {", ".join(sorted(missing))}')
+
+    def _body(self, case):
+        if case.body is None:
+            return None
+        if callable(case.body):
+            return lambda ticket: json.dumps(case.body(ticket)).encode()
+        return json.dumps(case.body).encode()
+
+    def _run(self, case, token, options):
+        path = reverse(case.view_name, kwargs=case.kwargs)
+        if case.params:
+            path += '?' + urlencode(case.params)
+        headers = {'Authorization': f'Token {token}'}
+        if options['url']:
+            if case.body is not None:
+                headers['Content-Type'] = 'application/json'
+            return run_load(
+                options['url'].rstrip('/') + path, headers=headers,
+                concurrency=options['concurrency'],
+                requests=options['requests'], method=case.method,
+                body=self._body(case))
+        return run_client(
+            self.client, path, headers=headers, requests=options['requests'],
+            method=case.method, body=self._body(case))
+
+    def _seed(self, options, run):
+        counts = {}
+        for name in ('recipes', 'tags', 'ingredients', 'per_recipe'):
+            try:
+                counts[name] = distribution(options[name])
+            except ValueError as exc:
+                raise CommandError(f'--{name.replace("_", "-")}: {exc}')
+        users = seed(users=options['users'], **counts, password=PASSWORD)
+        user = users[0]
+        token = Token.objects.create(user=user).key
+        cases = self._cases(user, run)
+        self._check_coverage(cases)
+        if options['only']:
+            unknown = set(options['only']) - {case.name for case in cases}
+            if unknown:
+                raise CommandError(
+                    f'unknown cases {", ".join(sorted(unknown))}')
+            cases = [case for case in cases if case.name in options['only']]
+        return users, token, cases
+
+    def _in_process(self, options, run):
+        self.client = Client()
+        # the test client's host, and Server-Timing without a log line
+        # per request
+        with transaction.atomic(), override_settings(
+                ALLOWED_HOSTS=['testserver'],
+                REQUEST_METRICS={**metrics_options(), 'SERVER_TIMING': True,
+                                 'LOG': False}):
+            users, token, cases = self._seed(options, run)
+            reports = {case.name: self._run(case, token, options)
+                       for case in cases}
+            transaction.set_rollback(True)
+        return reports
+
+    def _live(self, options, run):
+        users, token, cases = self._seed(options, run)
+        try:
+            wait_until_up(
+                options['url'].rstrip('/') + reverse('user:me'),
+                headers={'Authorization': f'Token {token}'})
+            return {case.name: self._run(case, token, options)
+                    for case in cases}
+        finally:
+            get_user_model().objects.filter(
+                pk__in=[user.pk for user in users]).delete()
+            get_user_model().objects.filter(
+                email__regex=rf'^bench-{run}-[0-9]+@example\.com$').delete()
+
+    def _regressions(self, reports, baseline, slowdown):
+        for name, report in reports.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            if report['errors'] and not before['errors']:
+                yield f'{name}: {report["errors"]} errors'
+            if report['queries'] is not None and \
+                    before['queries'] is not None and \
+                    round(report['queries'], 2) > round(before['queries'], 2):
+                yield (f'{name}: {before["queries"]:.2f} -> '
+                       f'{report["queries"]:.2f} queries')
+            if report['p95'] is not None and before['p95'] is not None \
+                    and report['p95'] > before['p95'] * slowdown:
+                yield (f'{name}: p95 {before["p95"]:.1f} -> '
+                       f'{report["p95"]:.1f} ms')
+            if report['rps'] < before['rps'] / slowdown:
+                yield (f'{name}: {before["rps"]:.1f} -> '
+                       f'{report["rps"]:.1f} req/s')
+
+    def handle(self, *args, **options):
+        run = uuid4().hex[:8]
+        if options['url']:
+            reports = self._live(options, run)
+        else:
+            reports = self._in_process(options, run)
+
+        def ms(value):
+            return '-' if value is None else f'{value:.1f}'
+
+        self.stdout.write(
+            f'{"endpoint":<24} {"req/s":>8} {"p50":>7} {"p95":>7} '
+            f'{"p99":>7} {"queries":>7} {"errors":>6}')
+        for name, report in reports.items():
+            queries = '-' if report['queries'] is None else \
+                f'{report["queries"]:.1f}'
+            self.stdout.write(
+                f'{name:<24} {report["rps"]:>8.1f} {ms(report["p50"]):>7} '
+                f'{ms(report["p95"]):>7} {ms(report["p99"]):>7} '
+                f'{queries:>7} {report["errors"]:>6}')
+
+        if options['save']:
+            with open(options['save'], 'w') as file:
+                json.dump({name: {key: report[key] for key in METRICS}
+                           for name, report in reports.items()},
+                          file, indent=2)
+
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+            regressions = list(self._regressions(
+                reports, baseline, options['slowdown']))
+            for regression in regressions:
+                self.stderr.write(regression)
+            if regressions:
+                raise CommandError(
+                    f'{len(regressions)} benchmark regressions')
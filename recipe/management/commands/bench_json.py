@@ -0,0 +1,85 @@
+import timeit
+from io import BytesIO
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+from core import renderers
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+from core.seed import seed
+from recipe import views
+
+
+class Command(BaseCommand):
+    help = ('Render and parse representative recipe pages with DRF\'s '
+            'JSONRenderer/JSONParser and with core.renderers / core.parsers '
+            'and report the time per page. Everything is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=500,
+                            help='recipes of the seeded user')
+        parser.add_argument('--number', type=int, default=200,
+                            help='renders per measurement')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='measurements, the best one is reported')
+
+    def _pages(self, user):
+        """(name, response data) of the list and detail views"""
+        factory = APIRequestFactory()
+        recipe_list = views.RecipeListView.as_view()
+        detail = views.RecipeDetailView.as_view()
+        recipe = user.recipe_set.first()
+        cases = [
+            ('list-page', recipe_list, '/recipes/',
+             {'paginate': 'page'}, {}),
+            ('list-all', recipe_list, '/recipes/', {}, {}),
+            ('detail', detail, f'/recipes/{recipe.pk}/', {},
+             {'recipe_id': recipe.pk}),
+            ('tags', views.TagListView.as_view(), '/tags/', {}, {}),
+        ]
+        for name, view, path, params, kwargs in cases:
+            request = factory.get(path, params)
+            force_authenticate(request, user=user)
+            response = view(request, **kwargs)
+            if response.status_code != 200:
+                raise CommandError(f'{name} answered {response.status_code}')
+            yield name, response.data
+
+    def _best(self, func, options):
+        timer = timeit.Timer(func)
+        return min(timer.repeat(options['repeat'], options['number'])) \
+            / options['number'] * 1e6
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), override_settings(
+                ALLOWED_HOSTS=['testserver']):
+            user = seed(users=1, recipes=options['recipes'], tags=30,
+                        ingredients=30)[0]
+            pages = list(self._pages(user))
+            transaction.set_rollback(True)
+
+        fast = 'orjson' if renderers.orjson else 'stdlib'
+        self.stdout.write(
+            f'{"page":<10} {"KiB":>7} {"render µs":>10} {fast:>8} '
+            f'{"x":>5} {"parse µs":>9} {fast:>8} {"x":>5}')
+        drf_renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+        drf_parser, fast_parser = JSONParser(), FastJSONParser()
+        for name, data in pages:
+            body = drf_renderer.render(data)
+            if fast_renderer.render(data) != body:
+                raise CommandError(f'{name}: FastJSONRenderer output differs')
+            render = self._best(lambda: drf_renderer.render(data), options)
+            fast_render = self._best(
+                lambda: fast_renderer.render(data), options)
+            parse = self._best(
+                lambda: drf_parser.parse(BytesIO(body)), options)
+            fast_parse = self._best(
+                lambda: fast_parser.parse(BytesIO(body)), options)
+            self.stdout.write(
+                f'{name:<10} {len(body) / 1024:>7.1f} {render:>10.1f} '
+                f'{fast_render:>8.1f} {render / fast_render:>5.1f} '
+                f'{parse:>9.1f} {fast_parse:>8.1f} '
+                f'{parse / fast_parse:>5.1f}')
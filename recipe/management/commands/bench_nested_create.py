@@ -0,0 +1,70 @@
+from decimal import Decimal
+from types import SimpleNamespace
+from uuid import uuid4
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from core.models import Recipe, Tag, Ingredient
+from recipe.serializers import RecipeSerializer
+
+
+class Command(BaseCommand):
+    help = ('Count queries per recipe create with nested tags and '
+            'ingredients, per-item get_or_create vs bulk. '
+            'Everything is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('sizes', nargs='*', type=int, default=[1, 10, 50],
+                            help='nested tags and ingredients per recipe')
+
+    def _payload(self, size, prefix):
+        return {
+            'title': 'bench recipe',
+            'description': 'bench description',
+            'time_minute': 5,
+            'price': Decimal('5.00'),
+            'link': 'http://example.com/recipe.pdf',
+            'tag': [{'name': f'{prefix}-tag-{i}'} for i in range(size)],
+            'ingredient': [
+                {'name': f'{prefix}-ingredient-{i}'} for i in range(size)],
+        }
+
+    def _legacy_create(self, user, data):
+        """the per-item get_or_create + add strategy bulk creation replaced"""
+        tags = data.pop('tag')
+        ingredients = data.pop('ingredient')
+        recipe = Recipe.objects.create(user=user, **data)
+        for tag in tags:
+            obj, _ = Tag.objects.get_or_create(user=user, name=tag['name'])
+            recipe.tag.add(obj)
+        for ingredient in ingredients:
+            obj, _ = Ingredient.objects.get_or_create(
+                user=user, name=ingredient['name'])
+            recipe.ingredient.add(obj)
+
+    def _bulk_create(self, user, data):
+        serializer = RecipeSerializer(
+            data=data, context={'request': SimpleNamespace(user=user)})
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user=user)
+
+    def _count(self, func, *args):
+        with CaptureQueriesContext(connection) as ctx:
+            func(*args)
+        return len(ctx.captured_queries)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"items":>6} {"legacy":>8} {"bulk":>8}')
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                email=f'bench-{uuid4().hex}@example.com')
+            for size in options['sizes']:
+                legacy = self._count(
+                    self._legacy_create, user,
+                    self._payload(size, f'legacy-{size}'))
+                bulk = self._count(
+                    self._bulk_create, user,
+                    self._payload(size, f'bulk-{size}'))
+                self.stdout.write(f'{size:>6} {legacy:>8} {bulk:>8}')
+            transaction.set_rollback(True)
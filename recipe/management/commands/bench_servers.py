@@ -0,0 +1,98 @@
+import os
+import subprocess
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from core.bench import run_load, wait_until_up
+from core.seed import seed
+
+SERVERS = {
+    'gunicorn': ['-m', 'gunicorn', 'actions_drf.wsgi:application',
+                 '--bind', '127.0.0.1:{port}', '--workers', '{workers}',
+                 '--log-level', 'warning'],
+    'uvicorn': ['-m', 'uvicorn', 'actions_drf.asgi:application',
+                '--port', '{port}', '--workers', '{workers}',
+                '--log-level', 'warning', '--no-access-log'],
+}
+
+# (server, view name) pairs, gunicorn cannot run the async views natively
+CASES = (
+    ('gunicorn', 'recipe:recipe-list'),
+    ('uvicorn', 'recipe:recipe-list'),
+    ('uvicorn', 'recipe:recipe-list-async'),
+    ('gunicorn', 'recipe:tag-list'),
+    ('uvicorn', 'recipe:tag-list'),
+    ('uvicorn', 'recipe:tag-list-async'),
+)
+
+
+class Command(BaseCommand):
+    help = ('Seed a user, serve the project with gunicorn sync workers and '
+            'with uvicorn and compare requests/sec and tail latency of the '
+            'sync and async read views. Needs a database the servers can '
+            'reach, e.g. the Postgres of docker-compose; the seeded rows '
+            'are deleted afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--recipes', type=int, default=50,
+                            help='recipes of the seeded user')
+        parser.add_argument('--port', type=int, default=8765)
+
+    def _serve(self, name, options):
+        args = [arg.format(**options) for arg in SERVERS[name]]
+        # the pool is what uvicorn gets by default, the sync workers keep
+        # persistent connections; the response cache of the sync views
+        # would hide the views behind it, DEBUG would keep every query
+        env = dict(os.environ, DB_POOL='1' if name == 'uvicorn' else '0',
+                   RESPONSE_CACHE_TTL='0', DJANGO_DEBUG='0',
+                   DJANGO_ALLOWED_HOSTS='127.0.0.1')
+        return subprocess.Popen(
+            [sys.executable, *args], env=env, stdout=subprocess.DEVNULL)
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and \
+                connection.settings_dict['NAME'] == ':memory:':
+            raise CommandError('the servers cannot share an in-memory db')
+
+        user = seed(users=1, recipes=options['recipes'], tags=20,
+                    ingredients=20)[0]
+        headers = {
+            'Authorization': f'Token {Token.objects.create(user=user).key}'}
+        self.stdout.write(
+            f'{"server":<9} {"view":<26} {"req/s":>8} {"p50":>7} '
+            f'{"p95":>7} {"p99":>7} {"errors":>6}')
+        try:
+            for server in SERVERS:
+                process = self._serve(server, options)
+                try:
+                    base = f'http://127.0.0.1:{options["port"]}'
+                    wait_until_up(
+                        base + reverse(CASES[0][1]), headers=headers)
+                    for case_server, view_name in CASES:
+                        if case_server != server:
+                            continue
+                        result = run_load(
+                            base + reverse(view_name), headers=headers,
+                            concurrency=options['concurrency'],
+                            requests=options['requests'])
+                        self._report(server, view_name, result)
+                finally:
+                    process.terminate()
+                    process.wait()
+        finally:
+            user.delete()
+
+    def _report(self, server, view_name, result):
+        def ms(value):
+            return '-' if value is None else f'{value:.1f}'
+
+        self.stdout.write(
+            f'{server:<9} {view_name.split(":")[-1]:<26} '
+            f'{result["rps"]:>8.1f} {ms(result["p50"]):>7} '
+            f'{ms(result["p95"]):>7} {ms(result["p99"]):>7} '
+            f'{result["errors"]:>6}')
@@ -0,0 +1,184 @@
+import json
+import re
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from core.models import Recipe, Tag, Ingredient
+from core.seed import seed
+from recipe import views
+
+# a full table scan in a SQLite query plan
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+class Command(BaseCommand):
+    help = ('Seed a dataset, call every recipe view and EXPLAIN ANALYZE the '
+            'queries it runs; with --baseline report plan regressions. '
+            'Everything is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--recipes', type=int, default=500,
+                            help='recipes per user')
+        parser.add_argument('--tags', type=int, default=50,
+                            help='tags and ingredients per user')
+        parser.add_argument('--save', metavar='PATH',
+                            help='write the report as a baseline')
+        parser.add_argument('--baseline', metavar='PATH',
+                            help='compare against a saved baseline')
+        parser.add_argument('--slowdown', type=float, default=2.0,
+                            help='execution time factor that counts as a '
+                                 'regression (Postgres only)')
+        parser.add_argument('--plans', action='store_true',
+                            help='print every plan')
+
+    def _cases(self, user):
+        recipe = Recipe.objects.filter(user=user).first()
+        tag_ids = ','.join(str(pk) for pk in Tag.objects.filter(
+            user=user).values_list('pk', flat=True)[:2])
+        ingredient = Ingredient.objects.filter(user=user).first()
+        word = recipe.title.split()[0]
+        recipe_list = views.RecipeListView.as_view()
+        detail = views.RecipeDetailView.as_view()
+        return [
+            ('recipe-list', recipe_list, '/recipes/', {}, {}),
+            ('recipe-list-cursor', recipe_list,
+             '/recipes/', {'paginate': 'cursor'}, {}),
+            ('recipe-list-page', recipe_list,
+             '/recipes/', {'paginate': 'page', 'p': 2}, {}),
+            ('recipe-list-fields', recipe_list,
+             '/recipes/', {'fields': 'id,title'}, {}),
+            ('recipe-list-tags-any', recipe_list,
+             '/recipes/', {'tags': tag_ids}, {}),
+            ('recipe-list-tags-all', recipe_list,
+             '/recipes/', {'tags': tag_ids, 'tags_match': 'all'}, {}),
+            ('recipe-list-search', recipe_list, '/recipes/', {'q': word}, {}),
+            ('recipe-detail', detail, f'/recipes/{recipe.pk}/', {},
+             {'recipe_id': recipe.pk}),
+            ('recipe-detail-conditional', detail, f'/recipes/{recipe.pk}/',
+             {}, {'recipe_id': recipe.pk, 'HTTP_IF_NONE_MATCH': '"stale"'}),
+            ('tag-list', views.TagListView.as_view(), '/tags/', {}, {}),
+            ('tag-list-assigned', views.TagListView.as_view(),
+             '/tags/', {'assign_only': 1}, {}),
+            ('ingredient-list-assigned', views.IngredientListView.as_view(),
+             '/ingredients/', {'assign_only': 1}, {}),
+            ('tag-suggest', views.TagSuggestView.as_view(),
+             '/tags/suggest/', {'q': word[:3]}, {}),
+            ('ingredient-suggest', views.IngredientSuggestView.as_view(),
+             '/ingredients/suggest/', {'q': ingredient.name[:3]}, {}),
+        ]
+
+    def _explain(self, sql):
+        """(execution ms or None, plan lines, fully scanned tables)"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + sql)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                lines, scans = [], set()
+                self._walk(plan[0]['Plan'], 0, lines, scans)
+                return plan[0]['Execution Time'], lines, scans
+
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            lines = [row[-1] for row in cursor.fetchall()]
+            scans = {match.group(1) for match in map(
+                SQLITE_FULL_SCAN.match, lines) if match}
+            return None, lines, scans
+
+    def _walk(self, node, depth, lines, scans):
+        line = node['Node Type']
+        if 'Index Name' in node:
+            line += f' using {node["Index Name"]}'
+        if 'Relation Name' in node:
+            line += f' on {node["Relation Name"]}'
+            if node['Node Type'] == 'Seq Scan':
+                scans.add(node['Relation Name'])
+        lines.append('  ' * depth + line)
+        for child in node.get('Plans', ()):
+            self._walk(child, depth + 1, lines, scans)
+
+    def _run(self, name, view, path, params, kwargs):
+        headers = {k: v for k, v in kwargs.items() if k.startswith('HTTP_')}
+        kwargs = {k: v for k, v in kwargs.items() if k not in headers}
+        request = APIRequestFactory().get(path, params, **headers)
+        force_authenticate(request, user=self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = view(request, **kwargs)
+        if response.status_code >= 400:
+            raise CommandError(f'{name} answered {response.status_code}')
+
+        report = {'queries': 0, 'time': 0.0, 'seq_scans': [], 'plans': []}
+        for query in ctx.captured_queries:
+            if not query['sql'].lstrip().upper().startswith('SELECT'):
+                continue
+            time, lines, scans = self._explain(query['sql'])
+            report['queries'] += 1
+            report['time'] = None if time is None else report['time'] + time
+            report['seq_scans'] = sorted(set(report['seq_scans']) | scans)
+            report['plans'].append({'sql': query['sql'], 'plan': lines})
+        return report
+
+    def _regressions(self, reports, baseline, slowdown):
+        for name, report in reports.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            if report['queries'] > before['queries']:
+                yield (f'{name}: {before["queries"]} -> '
+                       f'{report["queries"]} queries')
+            scans = set(report['seq_scans']) - set(before['seq_scans'])
+            if scans:
+                yield f'{name}: new full scans of {", ".join(sorted(scans))}'
+            if report['time'] is not None and before['time'] is not None \
+                    and report['time'] > before['time'] * slowdown \
+                    and report['time'] - before['time'] > 1:
+                yield (f'{name}: {before["time"]:.2f} -> '
+                       f'{report["time"]:.2f} ms')
+
+    def handle(self, *args, **options):
+        # the requests are built in process for the factory's testserver
+        with transaction.atomic(), override_settings(
+                ALLOWED_HOSTS=['testserver']):
+            self.user = seed(
+                users=options['users'], recipes=options['recipes'],
+                tags=options['tags'], ingredients=options['tags'])[0]
+            if connection.vendor == 'postgresql':
+                # fresh statistics so the planner sees the seeded rows
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'ANALYZE core_recipe, core_tag, core_ingredient, '
+                        'core_recipe_tag, core_recipe_ingredient')
+            reports = {
+                case[0]: self._run(*case) for case in self._cases(self.user)}
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f'{"view":<28} {"queries":>7} {"ms":>8}  full scans')
+        for name, report in reports.items():
+            time = '-' if report['time'] is None else f'{report["time"]:.2f}'
+            self.stdout.write(
+                f'{name:<28} {report["queries"]:>7} {time:>8}  '
+                f'{", ".join(report["seq_scans"]) or "-"}')
+            if options['plans']:
+                for plan in report['plans']:
+                    self.stdout.write(f'  {plan["sql"]}')
+                    for line in plan['plan']:
+                        self.stdout.write(f'    {line}')
+
+        if options['save']:
+            with open(options['save'], 'w') as file:
+                json.dump({name: {key: report[key] for key in (
+                    'queries', 'time', 'seq_scans')}
+                    for name, report in reports.items()}, file, indent=2)
+
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+            regressions = list(self._regressions(
+                reports, baseline, options['slowdown']))
+            for regression in regressions:
+                self.stderr.write(regression)
+            if regressions:
+                raise CommandError(f'{len(regressions)} plan regressions')
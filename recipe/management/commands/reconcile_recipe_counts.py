@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.models import Tag, Ingredient
+
+
+class Command(BaseCommand):
+    help = ('Recount Tag and Ingredient recipe_count from the recipe links '
+            'and fix the ones that drifted, e.g. under concurrent writes to '
+            'the same link or through rows written with raw SQL. Works in '
+            'pk ranges, one short transaction each.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='pks per transaction')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='only report the drifted rows')
+
+    def _reconcile(self, model, batch_size, dry_run):
+        fixed = 0
+        last = model.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+        for start in range(0, last, batch_size):
+            batch = model.objects.filter(
+                pk__gt=start, pk__lte=start + batch_size)
+            with transaction.atomic():
+                fixed += batch.drifted().count() if dry_run \
+                    else batch.recount_recipes()
+        return fixed
+
+    def handle(self, *args, **options):
+        for model in (Tag, Ingredient):
+            fixed = self._reconcile(
+                model, options['batch_size'], options['dry_run'])
+            verb = 'drifted' if options['dry_run'] else 'fixed'
+            self.stdout.write(self.style.SUCCESS(
+                f'✔ {fixed} {model._meta.verbose_name} counts {verb}'))
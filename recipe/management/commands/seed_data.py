@@ -0,0 +1,86 @@
+from time import perf_counter
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Recipe, Tag, Ingredient
+from core.seed import distribution, seed
+
+# the emails core.seed gives its users
+SEEDED_EMAILS = r'^seed-[0-9a-f]{8}-[0-9]+@example\.com$'
+
+
+class Command(BaseCommand):
+    help = ('Bulk generate users with their tags, ingredients and recipes. '
+            'Every count is N, A-B (uniform) or pareto:MEAN[:MAX] (a long '
+            'tail) sampled per user, --per-recipe per recipe. Each chunk of '
+            'users is one transaction of batched bulk inserts.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', default='pareto:50',
+                            help='recipes per user')
+        parser.add_argument('--tags', default='10-40',
+                            help='tags per user')
+        parser.add_argument('--ingredients', default='20-60',
+                            help='ingredients per user')
+        parser.add_argument('--per-recipe', default='1-6',
+                            help='tags and ingredients per recipe')
+        parser.add_argument('--chunk', type=int, default=100,
+                            help='users per transaction')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0,
+                            help='random seed, the same one gives the same '
+                                 'data')
+        parser.add_argument('--password',
+                            help='a password every seeded user can log in '
+                                 'with, unusable by default')
+        parser.add_argument('--delete', action='store_true',
+                            help='delete all seeded users and their data '
+                                 'instead')
+
+    def _delete(self, chunk):
+        users = get_user_model().objects.filter(email__regex=SEEDED_EMAILS)
+        deleted = 0
+        while True:
+            ids = list(users.values_list('pk', flat=True)[:chunk])
+            if not ids:
+                break
+            get_user_model().objects.filter(pk__in=ids).delete()
+            deleted += len(ids)
+            self.stdout.write(f'{deleted} users deleted')
+        self.stdout.write(self.style.SUCCESS(f'✔ {deleted} users deleted'))
+
+    def handle(self, *args, **options):
+        if options['delete']:
+            return self._delete(options['chunk'])
+
+        counts = {}
+        for name in ('recipes', 'tags', 'ingredients', 'per_recipe'):
+            try:
+                counts[name] = distribution(options[name])
+            except ValueError as exc:
+                raise CommandError(f'--{name.replace("_", "-")}: {exc}')
+
+        started = perf_counter()
+        done = rows = 0
+        for index, offset in enumerate(
+                range(0, options['users'], options['chunk'])):
+            size = min(options['chunk'], options['users'] - offset)
+            users = seed(
+                users=size, **counts, random_seed=options['seed'] + index,
+                batch_size=options['batch_size'],
+                password=options['password'])
+
+            recipes = Recipe.objects.filter(user__in=users)
+            rows += size + recipes.count() + sum(
+                model.objects.filter(user__in=users).count()
+                for model in (Tag, Ingredient)) + sum(
+                through.objects.filter(recipe__in=recipes).count()
+                for through in (Recipe.tag.through,
+                                Recipe.ingredient.through))
+            done += size
+            elapsed = perf_counter() - started
+            self.stdout.write(
+                f'{done}/{options["users"]} users, {rows} rows, '
+                f'{rows / elapsed:.0f} rows/s')
+        self.stdout.write(self.style.SUCCESS(
+            f'✔ {rows} rows in {perf_counter() - started:.1f}s'))
@@ -1,36 +1,199 @@
+from django.db import transaction
+from django.utils.text import capfirst
+from PIL import Image
 from rest_framework import serializers
+from core.images import schedule_variants, upload_options
+from core.metrics import TimedRepresentationMixin
 from core.models import Recipe, Tag, Ingredient
+from .cache import bump_generation_on_commit
+from .signals import touching_once
 import magic
 
-class TagSerializer(serializers.ModelSerializer):
+
+class UniqueNameMixin:
+    """(user, name) is unique, reject duplicates with a 400 when the item is
+    created or renamed directly; nested items are resolved by name instead"""
+
+    def validate_name(self, value):
+        request = self.context.get('request')
+        if self.parent is not None or request is None:
+            return value
+
+        queryset = self.Meta.model.objects.filter(
+            user=request.user, name=value)
+        if self.instance is not None:
+            queryset = queryset.exclude(pk=self.instance.pk)
+        if queryset.exists():
+            raise serializers.ValidationError(
+                f'{capfirst(self.Meta.model._meta.verbose_name)} with this '
+                f'name already exists.')
+        return value
+
+
+class TagSerializer(UniqueNameMixin, TimedRepresentationMixin,
+                    serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ['id', 'name']
         read_only_fields = ['id']
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(UniqueNameMixin, TimedRepresentationMixin,
+                           serializers.ModelSerializer):
     class Meta:
         model = Ingredient
         fields = ['id', 'name']
         read_only_fields = ['id']
 
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+class TagCountSerializer(TagSerializer):
+    """a tag of the tag endpoints, with the number of recipes using it"""
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ['recipe_count']
+        read_only_fields = TagSerializer.Meta.read_only_fields + [
+            'recipe_count']
+
+
+class IngredientCountSerializer(IngredientSerializer):
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ['recipe_count']
+        read_only_fields = IngredientSerializer.Meta.read_only_fields + [
+            'recipe_count']
+
+
+def variant_urls(variants, request=None):
+    """{variant: url} for the stored names of recipe.image_variants"""
+    storage = Recipe._meta.get_field('image').storage
+    urls = {}
+    for variant, name in variants.items():
+        url = storage.url(name)
+        urls[variant] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+class ImageVariantsField(serializers.Field):
+    """{variant: url} of the thumbnails core.images generates after an
+    upload, empty until they are ready"""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return variant_urls(value, self.context.get('request'))
+
+
+class RecipeImageSerializer(TimedRepresentationMixin,
+                            serializers.ModelSerializer):
+    # a plain FileField, the ImageField would verify the whole image in
+    # memory before validate_image gets to look at its header
+    image = serializers.FileField()
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
-        fields = ['image']
-        extra_kwargs = {'image': {'required': True}}
+        fields = ['image', 'image_variants']
 
     def validate_image(self, value):
-        # print(value)
-        # file_type = magic.from_buffer(value.read(), mime=True)
-        # print(file_type)
-        # if not file_type.startswith('image/'):
-        #     raise serializers.ValidationError("Only image files are allowed.")
+        """check size, MIME type and dimensions from the leading bytes only,
+        the upload is never decoded here; uploads over
+        FILE_UPLOAD_MAX_MEMORY_SIZE are already spooled to disk in chunks
+        and storage moves or streams them from there"""
+        options = upload_options()
+        if value.size > options['MAX_BYTES']:
+            raise serializers.ValidationError(
+                f'Image files may not exceed {options["MAX_BYTES"]} bytes.')
+
+        value.seek(0)
+        file_type = magic.from_buffer(
+            value.read(options['SNIFF_BYTES']), mime=True)
+        if file_type not in options['ALLOWED_TYPES']:
+            raise serializers.ValidationError(
+                'Only image files are allowed.')
+
+        too_large = serializers.ValidationError(
+            f'Images may not have more than {options["MAX_PIXELS"]} pixels.')
+        value.seek(0)
+        try:
+            # Image.open only parses the header, pixels are not decoded
+            with Image.open(value) as image:
+                width, height = image.size
+        except Image.DecompressionBombError:
+            raise too_large
+        except (OSError, SyntaxError, ValueError):
+            raise serializers.ValidationError(
+                'Upload a valid image. The file you uploaded was either not '
+                'an image or a corrupted image.')
+        finally:
+            value.seek(0)
+
+        if width * height > options['MAX_PIXELS']:
+            raise too_large
         return value
 
-class RecipeSerializer(serializers.ModelSerializer):
+    def update(self, instance, validated_data):
+        """store the original right away and leave the resizing to the
+        image pipeline, the previous variants are dropped once it is done"""
+        stale_names = instance.image_variants.values()
+        instance.image_variants = {}
+        instance = super().update(instance, validated_data)
+        schedule_variants(instance, stale_names)
+        return instance
+
+
+class DynamicFieldsMixin:
+    """takes an extra fields argument that limits the rendered fields"""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """used for many=True writes, inserts the recipes of a batch and all of
+    their through rows with a handful of bulk queries"""
+
+    @transaction.atomic
+    def create(self, validated_data):
+        related = [
+            (item.pop('tag', []), item.pop('ingredient', []))
+            for item in validated_data]
+        recipes = Recipe.objects.bulk_create(
+            [Recipe(**item) for item in validated_data])
+
+        for position, model, field in ((0, Tag, 'tag'),
+                                       (1, Ingredient, 'ingredient')):
+            objs = {
+                obj.name: obj for obj in self.child._get_or_create(
+                    model, [i for items in related for i in items[position]])}
+            rows = {
+                (recipe.pk, objs[item['name']].pk)
+                for recipe, items in zip(recipes, related)
+                for item in items[position]}
+            through = getattr(Recipe, field).through
+            through.objects.bulk_create([
+                through(recipe_id=recipe_id, **{f'{field}_id': obj_id})
+                for recipe_id, obj_id in rows])
+            model.objects.add_recipes([recipe.pk for recipe in recipes])
+
+        # bulk inserts send no signals, index the new recipes, count them
+        # above and invalidate the cached lists here
+        created = Recipe.objects.filter(pk__in=[r.pk for r in recipes])
+        fields = created.search_vector_update()
+        if fields:
+            created.update(**fields)
+        for user_id in {recipe.user_id for recipe in recipes}:
+            bump_generation_on_commit(user_id)
+        return recipes
+
+
+class RecipeSerializer(DynamicFieldsMixin, TimedRepresentationMixin,
+                       serializers.ModelSerializer):
     tag = TagSerializer(many=True, required=False)
     ingredient = IngredientSerializer(many=True, required=False)
 
@@ -43,44 +206,69 @@ class RecipeSerializer(serializers.ModelSerializer):
                   'price', 'time_minute', 'link', 'tag', 'ingredient']
         read_only_fields = ['id']
         extra_kwargs = {'description': {'write_only': True}}
+        list_serializer_class = RecipeListSerializer
 
-    def _get_or_create_tag(self, tags, recipe):
+    def _get_or_create(self, model, items):
+        """resolve all names with one SELECT and bulk insert the missing
+        ones, the (user, name) constraint makes concurrent inserts safe"""
         user = self.context.get('request').user
-        for tag in tags:
-            obj, _ = Tag.objects.get_or_create(user=user, name=tag['name'])
-            recipe.tag.add(obj)
+        names = list(dict.fromkeys(item['name'] for item in items))
+        if not names:
+            return []
+
+        found = {
+            obj.name: obj
+            for obj in model.objects.filter(user=user, name__in=names)}
+        missing = [name for name in names if name not in found]
+        if missing:
+            model.objects.bulk_create(
+                [model(user=user, name=name) for name in missing],
+                ignore_conflicts=True)
+            # ignore_conflicts leaves the pks unset, read them back
+            found.update(
+                (obj.name, obj)
+                for obj in model.objects.filter(user=user, name__in=missing))
+        return [found[name] for name in names]
+
+    def _get_or_create_tag(self, tags, recipe):
+        objs = self._get_or_create(Tag, tags)
+        if objs:
+            recipe.tag.add(*objs)
 
     def _get_or_create_ingredient(self, ingredients, recipe):
-        user = self.context.get('request').user
-        for ingredient in ingredients:
-            obj, _ = Ingredient.objects.get_or_create(user=user, name=ingredient['name'])
-            recipe.ingredient.add(obj)
+        objs = self._get_or_create(Ingredient, ingredients)
+        if objs:
+            recipe.ingredient.add(*objs)
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tag', [])
         ingredients = validated_data.pop('ingredient', [])
-        recipe = Recipe.objects.create(**validated_data)
-        self._get_or_create_tag(tags, recipe)
-        self._get_or_create_ingredient(ingredients, recipe)
+        with touching_once():
+            recipe = Recipe.objects.create(**validated_data)
+            self._get_or_create_tag(tags, recipe)
+            self._get_or_create_ingredient(ingredients, recipe)
 
         return recipe
 
-
+    @transaction.atomic
     def update(self, instance, validated_data):
-        tags = validated_data.pop('tag', None)
-        if tags is not None:
-            instance.tag.clear()
-            self._get_or_create_tag(tags, instance)
+        with touching_once():
+            # set() diffs against the current rows and only
+            # deletes/inserts the through rows that actually changed
+            tags = validated_data.pop('tag', None)
+            if tags is not None:
+                instance.tag.set(self._get_or_create(Tag, tags))
 
-        ingredients = validated_data.pop('ingredient', None)
-        if ingredients is not None:
-            instance.ingredient.clear()
-            self._get_or_create_ingredient(ingredients, instance)
+            ingredients = validated_data.pop('ingredient', None)
+            if ingredients is not None:
+                instance.ingredient.set(
+                    self._get_or_create(Ingredient, ingredients))
 
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
 
-        instance.save()
+            instance.save()
         return instance
 
 
@@ -93,13 +281,16 @@ class RecipeLinkSerializer(RecipeSerializer):
         many=True, required=False, view_name='recipe:ingredient-detail',
         lookup_field='pk', lookup_url_kwarg='ingredient_id', queryset=Ingredient.objects.all()
     )
+    image_variants = ImageVariantsField()
 
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['image']
+        fields = RecipeSerializer.Meta.fields + ['image', 'image_variants']
 
 
 class RecipeDetailSerializer(RecipeSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['image']
+        fields = RecipeSerializer.Meta.fields + ['image', 'image_variants']
         read_only_fields = RecipeSerializer.Meta.read_only_fields + ['image']
         extra_kwargs = {'description': {'write_only': False}}
@@ -0,0 +1,180 @@
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete)
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils import timezone
+from core.models import Recipe, Tag, Ingredient
+from .cache import bump_generation_on_commit, reset_generation
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_user_responses(sender, instance, **kwargs):
+    bump_generation_on_commit(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tag.through)
+@receiver(m2m_changed, sender=Recipe.ingredient.through)
+def invalidate_user_responses_m2m(sender, instance, action, **kwargs):
+    if action.startswith('post_'):
+        bump_generation_on_commit(instance.user_id)
+
+
+# {recipe pk: whether updated_at still needs a bump} of the innermost
+# touching_once() block of the thread
+_pending = threading.local()
+
+
+@contextmanager
+def touching_once():
+    """touch and index each recipe the block writes once, when it ends,
+    instead of on every save() and link change: the set() of tags and
+    ingredients and the save() of a serializer cost one UPDATE"""
+    if getattr(_pending, 'recipes', None) is not None:
+        yield
+        return
+    _pending.recipes = {}
+    try:
+        yield
+        recipes = _pending.recipes
+    finally:
+        _pending.recipes = None
+    touched = [pk for pk, bump in recipes.items() if bump]
+    indexed = [pk for pk, bump in recipes.items() if not bump]
+    if touched:
+        touch_recipes(Recipe.objects.filter(pk__in=touched))
+    if indexed:
+        index_recipes(Recipe.objects.filter(pk__in=indexed))
+
+
+def touch_recipes(queryset):
+    """bump updated_at without save() so the recipe ETags change, and
+    recompute the search vectors from the current tags and ingredients"""
+    queryset.update(
+        updated_at=timezone.now(), **queryset.search_vector_update())
+
+
+def touch_recipe_ids(pks):
+    recipes = getattr(_pending, 'recipes', None)
+    if recipes is None:
+        touch_recipes(Recipe.objects.filter(pk__in=pks))
+        return
+    for pk in pks:
+        # a save() earlier in the block bumped updated_at already
+        recipes.setdefault(pk, True)
+
+
+def index_recipes(queryset):
+    fields = queryset.search_vector_update()
+    if fields:
+        queryset.update(**fields)
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, created, update_fields, **kwargs):
+    recipes = getattr(_pending, 'recipes', None)
+    if recipes is not None and (
+            update_fields is None or 'updated_at' in update_fields):
+        recipes[instance.pk] = False
+        return
+    if update_fields is not None and not {'title', 'description'} & set(
+            update_fields):
+        return
+    if recipes is not None:
+        recipes.setdefault(instance.pk, False)
+        return
+    index_recipes(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(m2m_changed, sender=Recipe.tag.through)
+@receiver(m2m_changed, sender=Recipe.ingredient.through)
+def touch_recipes_m2m(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+    if not reverse:
+        if action != 'pre_clear':
+            touch_recipe_ids([instance.pk])
+    elif action == 'pre_clear':
+        # the links are gone by post_clear, remember who had them
+        instance._cleared_recipe_ids = list(
+            instance.recipe_set.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        touch_recipe_ids(instance.__dict__.pop('_cleared_recipe_ids', []))
+    else:
+        touch_recipe_ids(pk_set)
+
+
+@receiver(m2m_changed, sender=Recipe.tag.through)
+@receiver(m2m_changed, sender=Recipe.ingredient.through)
+def count_recipes_m2m(sender, instance, action, reverse, model, pk_set,
+                      **kwargs):
+    """keep Tag/Ingredient.recipe_count with F() updates; removes are
+    counted before the links go so ids that were not linked do not count.
+    The pk_set of post_add only holds the links that were missing"""
+    if not reverse:
+        # recipe.tag.add(...) and the like, model is Tag or Ingredient
+        if action == 'post_add':
+            model.objects.filter(pk__in=pk_set).update(
+                recipe_count=F('recipe_count') + 1)
+        elif action in ('pre_remove', 'pre_clear'):
+            linked = model.objects.filter(recipe=instance)
+            if action == 'pre_remove':
+                linked = linked.filter(pk__in=pk_set)
+            linked.update(recipe_count=F('recipe_count') - 1)
+        return
+
+    # tag.recipe_set.add(...) and the like, instance is the tag
+    counted = type(instance).objects.filter(pk=instance.pk)
+    if action == 'post_add' and pk_set:
+        counted.update(recipe_count=F('recipe_count') + len(pk_set))
+    elif action == 'pre_remove':
+        removed = instance.recipe_set.filter(pk__in=pk_set).count()
+        if removed:
+            counted.update(recipe_count=F('recipe_count') - removed)
+    elif action == 'post_clear':
+        counted.update(recipe_count=0)
+
+
+@receiver(pre_delete, sender=Recipe)
+def release_recipe_counts(sender, instance, origin, **kwargs):
+    """through rows go with the recipe without m2m_changed; deletes of a
+    queryset release the counts in RecipeQuerySet.delete(), and when the
+    owner is deleted their tags and ingredients go too"""
+    if origin is instance:
+        for model in (Tag, Ingredient):
+            model.objects.filter(recipe=instance).update(
+                recipe_count=F('recipe_count') - 1)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def touch_recipes_related(sender, instance, created, **kwargs):
+    """recipes render and index the names of their tags and ingredients"""
+    if not created:
+        touch_recipes(instance.recipe_set.all())
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_related_recipes(sender, instance, **kwargs):
+    instance._linked_recipe_ids = list(
+        instance.recipe_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def touch_recipes_unlinked(sender, instance, **kwargs):
+    touch_recipe_ids(instance.__dict__.pop('_linked_recipe_ids', []))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def reset_user_responses(sender, instance, created, **kwargs):
+    if created:
+        reset_generation(instance.pk)
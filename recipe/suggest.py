@@ -0,0 +1,105 @@
+import threading
+from collections import OrderedDict
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections
+from django.db.models import BooleanField, Q, Value
+from django.db.models.functions import Upper
+from django.db.models.expressions import Case, When
+from .cache import get_generation, is_enabled
+
+# tries kept for the SQLite fallback, one per (model, user, generation)
+MAX_TRIES = 256
+
+
+class Trie:
+    """maps every word of a name, and the name itself, to the (id, name)
+    pairs it starts; lookups walk the prefix then collect the subtree"""
+
+    def __init__(self, items=()):
+        self.root = {}
+        for pk, name in items:
+            self.insert(pk, name)
+
+    def insert(self, pk, name):
+        key = name.casefold()
+        words = key.split()
+        for start in {key, *(' '.join(words[i:]) for i in range(len(words)))}:
+            node = self.root
+            for char in start:
+                node = node.setdefault(char, {})
+            node.setdefault(None, set()).add((pk, name))
+
+    def prefixed(self, prefix):
+        node = self.root
+        for char in prefix.casefold():
+            node = node.get(char)
+            if node is None:
+                return set()
+        found, stack = set(), [node]
+        while stack:
+            node = stack.pop()
+            for char, child in node.items():
+                if char is None:
+                    found |= child
+                else:
+                    stack.append(child)
+        return found
+
+
+_tries = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_trie(model, user_id):
+    """the user's names of model, rebuilt whenever recipe.signals bumps the
+    user's generation; built afresh every time when the response cache,
+    and so the generation, is not shared between the processes"""
+    def build():
+        return Trie(model.objects.filter(user_id=user_id).values_list(
+            'id', 'name').iterator())
+
+    if not is_enabled():
+        return build()
+    key = (model._meta.label, user_id, get_generation(user_id))
+    with _lock:
+        trie = _tries.get(key)
+        if trie is not None:
+            _tries.move_to_end(key)
+            return trie
+
+    trie = build()
+    with _lock:
+        _tries[key] = trie
+        while len(_tries) > MAX_TRIES:
+            _tries.popitem(last=False)
+    return trie
+
+
+def suggest(model, user_id, text, limit):
+    """up to limit (id, name) of the user's names best matching text; names
+    starting with text come first. Postgres also matches misspellings
+    through the pg_trgm index on UPPER(name), elsewhere only name and word
+    prefixes match"""
+    queryset = model.objects.filter(user_id=user_id)
+    if connections[queryset.db].vendor != 'postgresql':
+        key = text.casefold()
+        found = get_trie(model, user_id).prefixed(key)
+        return sorted(
+            found,
+            key=lambda item: (not item[1].casefold().startswith(key),
+                              item[1].casefold(), item[0]))[:limit]
+
+    upper = text.upper()
+    return list(queryset.alias(
+        upper_name=Upper('name'),
+    ).filter(
+        Q(upper_name__startswith=upper)
+        | Q(upper_name__trigram_word_similar=upper),
+    ).annotate(
+        prefix=Case(
+            When(upper_name__startswith=upper, then=Value(True)),
+            default=Value(False), output_field=BooleanField()),
+        similarity=TrigramWordSimilarity(upper, Upper('name')),
+    ).order_by(
+        '-prefix', '-similarity', 'name', 'id',
+    ).values_list('id', 'name')[:limit])
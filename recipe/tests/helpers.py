@@ -0,0 +1,14 @@
+from decimal import Decimal
+from core.models import Recipe
+
+
+def create_recipe(user, **params):
+    default = {
+        'title': 'Sample recipe title',
+        'time_minute': 22,
+        'price': Decimal('5.25'),
+        'description': 'Sample recipe description',
+        'link': 'http://example.com/recipe.pdf'
+    }
+    default.update(**params)
+    return Recipe.objects.create(user=user, **default)
@@ -0,0 +1,137 @@
+from decimal import Decimal
+from unittest.mock import patch
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, Client, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from core.models import Recipe, Tag, Ingredient
+from recipe.tests.helpers import create_recipe
+
+
+class AsyncReadViewTest(TestCase):
+    """the async views answer byte for byte like the sync ones"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='test123')
+        self.token = Token.objects.create(user=self.user)
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {self.token.key}'}
+        self.sync_client = APIClient()
+        self.sync_client.credentials(**self.auth)
+        self.client = Client(**self.auth)
+
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        quick = Tag.objects.create(user=self.user, name='Quick')
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        Tag.objects.create(user=self.user, name='Unused')
+        self.soup = create_recipe(
+            self.user, title='Lentil soup', price=Decimal('4.50'),
+            image='uploads/recipe/soup.jpg',
+            image_variants={'webp_320': 'uploads/recipe/variants/s.webp'})
+        self.soup.tag.add(vegan, quick)
+        self.soup.ingredient.add(salt)
+        self.stew = create_recipe(self.user, title='Stew')
+        self.stew.tag.add(quick)
+        create_recipe(get_user_model().objects.create_user(
+            email='other@example.com', password='test123'))
+
+    def assertSameResponse(self, sync_name, async_name, params=None,
+                           **kwargs):
+        sync = self.sync_client.get(
+            reverse(f'recipe:{sync_name}', kwargs=kwargs), params)
+        res = self.client.get(
+            reverse(f'recipe:{async_name}', kwargs=kwargs), params)
+
+        self.assertEqual(res.status_code, sync.status_code)
+        self.assertEqual(res['Content-Type'], sync['Content-Type'])
+        # page links point back at the endpoint that was called
+        self.assertEqual(
+            res.content.replace(b'/async/', b'/'), sync.content)
+        return res
+
+    def test_recipe_list(self):
+        res = self.assertSameResponse('recipe-list', 'recipe-list-async')
+
+        self.assertEqual(len(res.json()), 2)
+
+    def test_recipe_list_filters(self):
+        tag = self.soup.tag.get(name='Vegan')
+        for params in ({'tags': tag.id},
+                       {'tags': f'{tag.id},9999', 'tags_match': 'all'},
+                       {'q': 'lentil'},
+                       {'tags_match': 'some', 'tags': tag.id}):
+            self.assertSameResponse(
+                'recipe-list', 'recipe-list-async', params)
+
+    def test_recipe_list_pages(self):
+        for params in ({'paginate': 'page', 'ps': 1},
+                       {'paginate': 'page', 'ps': 1, 'p': 2},
+                       {'paginate': 'page', 'p': 3},
+                       {'paginate': 'page', 'p': 'x'}):
+            self.assertSameResponse(
+                'recipe-list', 'recipe-list-async', params)
+
+    def test_recipe_detail(self):
+        self.assertSameResponse(
+            'recipe-detail', 'recipe-detail-async', recipe_id=self.soup.id)
+
+    def test_recipe_detail_of_other_user(self):
+        other = Recipe.objects.exclude(user=self.user).get()
+
+        self.assertSameResponse(
+            'recipe-detail', 'recipe-detail-async', recipe_id=other.id)
+
+    def test_name_lists(self):
+        for sync_name, async_name in (
+                ('tag-list', 'tag-list-async'),
+                ('ingredient-list', 'ingredient-list-async')):
+            for params in ({}, {'assign_only': 1}):
+                self.assertSameResponse(sync_name, async_name, params)
+
+    def test_authentication_required(self):
+        for auth in ({}, {'HTTP_AUTHORIZATION': 'Token wrong'}):
+            sync = APIClient().get(reverse('recipe:recipe-list'), **auth)
+            res = Client().get(reverse('recipe:recipe-list-async'), **auth)
+
+            self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertEqual(res.content, sync.content)
+            self.assertEqual(
+                res['WWW-Authenticate'], sync['WWW-Authenticate'])
+
+    def test_read_only(self):
+        res = self.client.post(reverse('recipe:recipe-list-async'), {})
+
+        self.assertEqual(
+            res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    async def test_served_by_async_client(self):
+        res = await AsyncClient().get(
+            reverse('recipe:recipe-list-async'),
+            headers={'Authorization': f'Token {self.token.key}'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [recipe['title'] for recipe in res.json()],
+            ['Lentil soup', 'Stew'])
+
+    async def test_one_thread_trip_per_request(self):
+        """the count and the page query of a paginated list run in the
+        same sync_to_async call"""
+        trips = []
+
+        def counted(fn):
+            trips.append(fn)
+            return sync_to_async(fn)
+
+        with patch('recipe.async_views.sync_to_async', counted):
+            res = await AsyncClient().get(
+                reverse('recipe:recipe-list-async'),
+                {'paginate': 'page', 'page_size': 1},
+                headers={'Authorization': f'Token {self.token.key}'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['count'], 2)
+        self.assertEqual(len(trips), 1)
@@ -0,0 +1,164 @@
+import tempfile
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Tag
+from core.seed import seed
+from recipe.checks import check_response_cache
+from recipe.tests.helpers import create_recipe
+
+RECIPES_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk')
+TAGS_URL = reverse('recipe:tag-list')
+LOCAL_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+FILE_BACKEND = 'django.core.cache.backends.filebased.FileBasedCache'
+
+
+# one process, so a process-local backend does for the tests below
+@override_settings(RESPONSE_CACHE={'ENABLED': True})
+class ResponseCacheTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='test123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_second_read_served_from_cache(self):
+        create_recipe(user=self.user)
+        first = self.client.get(RECIPES_URL)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(RECIPES_URL)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data, second.data)
+
+    def test_query_params_normalized(self):
+        tag = Tag.objects.create(user=self.user, name='vegan')
+        self.client.get(RECIPES_URL, {'tags': tag.id, 'tags_match': 'all'})
+
+        with self.assertNumQueries(0):
+            self.client.get(
+                f'{RECIPES_URL}?tags_match=all&tags={tag.id}')
+        with self.assertNumQueries(1):
+            self.client.get(RECIPES_URL, {'tags': tag.id})
+
+    def test_save_invalidates(self):
+        self.client.get(TAGS_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(user=self.user, name='vegan')
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual([t['name'] for t in res.data], ['vegan'])
+
+    def test_invalidated_on_commit(self):
+        """until the write commits other requests can only see the old rows,
+        which must not be cached under the new generation"""
+        self.client.get(TAGS_URL)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            Tag.objects.create(user=self.user, name='vegan')
+            with self.assertNumQueries(0):
+                self.client.get(TAGS_URL)
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual([t['name'] for t in res.data], ['vegan'])
+
+    def test_m2m_change_invalidates(self):
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='vegan')
+        self.client.get(RECIPES_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.tag.add(tag)
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.data[0]['tag']), 1)
+
+    def test_bulk_create_invalidates(self):
+        self.client.get(RECIPES_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(BULK_URL, [{
+                'title': 'bulk', 'time_minute': 1, 'price': '1.00',
+                'description': 'bulk', 'link': 'http://example.com',
+            }], format='json')
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.data), 1)
+
+    def test_cache_is_per_user(self):
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='test123')
+        Tag.objects.create(user=other, name='meat')
+        self.client.get(TAGS_URL)
+
+        self.client.force_authenticate(other)
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual([t['name'] for t in res.data], ['meat'])
+
+    def test_seeded_users_start_afresh(self):
+        """seed() bulk inserts its users, no post_save resets them"""
+        with patch('core.seed.reset_generation') as patched_reset:
+            users = seed(users=2, recipes=1, tags=1, ingredients=1)
+
+        self.assertEqual(
+            [call.args[0] for call in patched_reset.call_args_list],
+            [user.pk for user in users])
+
+
+class WorkerProcessesTest(TestCase):
+    """two worker processes, each with its own locmem store or both on one
+    file-based cache"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='test123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_dir = cache_dir.name
+
+    def worker(self, name, shared):
+        return self.settings(CACHES={'default': {
+            'BACKEND': FILE_BACKEND if shared else LOCAL_BACKEND,
+            'LOCATION': self.cache_dir if shared else name}})
+
+    def read_write_read(self, shared):
+        with self.worker('worker-1', shared):
+            etag = self.client.get(TAGS_URL).get('ETag', '')
+        with self.worker('worker-2', shared), \
+                self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(user=self.user, name='vegan')
+        with self.worker('worker-1', shared):
+            return self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+    def test_process_local_backend_not_cached(self):
+        res = self.read_write_read(shared=False)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([t['name'] for t in res.data], ['vegan'])
+        self.assertNotIn('ETag', res)
+
+    def test_shared_backend_invalidated_everywhere(self):
+        res = self.read_write_read(shared=True)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([t['name'] for t in res.data], ['vegan'])
+        with self.worker('worker-2', True), self.assertNumQueries(0):
+            res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @override_settings(RESPONSE_CACHE={'ENABLED': True})
+    def test_forced_on_process_local_backend_warns(self):
+        self.assertEqual(
+            [warning.id for warning in check_response_cache(None)],
+            ['recipe.W001'])
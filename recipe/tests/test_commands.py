@@ -0,0 +1,155 @@
+import json
+import os
+import random
+import tempfile
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from core.models import Recipe, Tag
+from core.seed import distribution
+from recipe.management.commands.bench_api import url_names
+
+
+class BenchNestedCreateTest(TestCase):
+    def test_bench_nested_create_rolls_back(self):
+        out = StringIO()
+
+        call_command('bench_nested_create', '1', '5', stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[2].split()[0], '5')
+        self.assertFalse(Recipe.objects.exists())
+
+
+class BenchJsonTest(TestCase):
+    def test_bench_json_reports_every_page_and_rolls_back(self):
+        out = StringIO()
+
+        call_command('bench_json', '--recipes', '5', '--number', '1',
+                     '--repeat', '1', stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines[1:]],
+                         ['list-page', 'list-all', 'detail', 'tags'])
+        self.assertFalse(Recipe.objects.exists())
+
+
+class ExplainViewsTest(TestCase):
+    args = ['--users', '2', '--recipes', '10', '--tags', '5']
+
+    def test_explain_views_reports_every_view_and_rolls_back(self):
+        out = StringIO()
+
+        call_command('explain_views', *self.args, stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertIn('recipe-list-search', out.getvalue())
+        self.assertGreater(len(lines), 10)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_explain_views_against_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            call_command(
+                'explain_views', *self.args, '--save', path, stdout=StringIO())
+            call_command(
+                'explain_views', *self.args, '--baseline', path,
+                stdout=StringIO())
+
+            with open(path) as file:
+                baseline = json.load(file)
+            baseline['tag-list'].update(queries=0, seq_scans=[])
+            baseline['recipe-list']['queries'] -= 1
+            with open(path, 'w') as file:
+                json.dump(baseline, file)
+
+            err = StringIO()
+            with self.assertRaisesMessage(CommandError, '2 plan regressions'):
+                call_command(
+                    'explain_views', *self.args, '--baseline', path,
+                    stdout=StringIO(), stderr=err)
+        self.assertIn('recipe-list:', err.getvalue())
+        self.assertIn('tag-list: 0 -> 1 queries', err.getvalue())
+
+
+class SeedDataTest(TestCase):
+    def test_distribution(self):
+        rng = random.Random(0)
+
+        self.assertEqual(distribution('7')(rng), 7)
+        self.assertTrue(all(
+            2 <= distribution('2-4')(rng) <= 4 for _ in range(50)))
+        self.assertTrue(all(
+            distribution('pareto:10:30')(rng) <= 30 for _ in range(50)))
+        with self.assertRaises(ValueError):
+            distribution('lots')
+
+    def test_seed_data(self):
+        out = StringIO()
+
+        call_command('seed_data', '--users', '5', '--chunk', '2',
+                     '--recipes', '3', '--tags', '2-4', '--per-recipe', '2',
+                     stdout=out)
+
+        self.assertEqual(get_user_model().objects.count(), 5)
+        self.assertEqual(Recipe.objects.count(), 15)
+        self.assertEqual(Recipe.tag.through.objects.count(), 30)
+        self.assertIn('5/5 users', out.getvalue())
+
+        call_command('seed_data', '--delete', stdout=StringIO())
+
+        self.assertFalse(get_user_model().objects.exists())
+        self.assertFalse(Tag.objects.exists())
+
+    def test_bad_distribution(self):
+        with self.assertRaisesMessage(CommandError, '--per-recipe'):
+            call_command('seed_data', '--per-recipe', 'x', stdout=StringIO())
+
+
+class BenchApiTest(TestCase):
+    args = ['--requests', '2', '--users', '2', '--recipes', '8',
+            '--tags', '3', '--ingredients', '3']
+
+    def test_bench_api_covers_every_endpoint_and_rolls_back(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            call_command('bench_api', *self.args, '--save', path,
+                         stdout=StringIO())
+
+            with open(path) as file:
+                baseline = json.load(file)
+
+        self.assertEqual(len(baseline), 22)
+        self.assertEqual(
+            [name for name, report in baseline.items() if report['errors']],
+            [])
+        self.assertEqual(baseline['recipe-detail']['queries'], 3)
+        self.assertFalse(get_user_model().objects.exists())
+        self.assertIn('user:token', url_names())
+
+    def test_bench_api_against_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            call_command(
+                'bench_api', *self.args, '--only', 'tag-detail', 'user-me',
+                '--save', path, stdout=StringIO())
+
+            with open(path) as file:
+                baseline = json.load(file)
+            baseline['tag-detail']['queries'] -= 1
+            baseline['user-me']['rps'] *= 10 ** 6
+            with open(path, 'w') as file:
+                json.dump(baseline, file)
+
+            err = StringIO()
+            with self.assertRaisesMessage(
+                    CommandError, '2 benchmark regressions'):
+                # only the doctored numbers count, not timing noise
+                call_command(
+                    'bench_api', *self.args, '--only', 'tag-detail',
+                    'user-me', '--baseline', path, '--slowdown', '1000',
+                    stdout=StringIO(), stderr=err)
+        self.assertIn('tag-detail:', err.getvalue())
@@ -0,0 +1,132 @@
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Recipe, Tag
+from recipe.views import RecipeDetailView
+from recipe.tests.helpers import create_recipe
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class ConditionalRequestTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='test123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(user=self.user)
+
+    def test_detail_not_modified(self):
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertIn('ETag', res)
+        self.assertIn('Last-Modified', res)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                detail_url(self.recipe.id), HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_if_modified_since(self):
+        res = self.client.get(detail_url(self.recipe.id))
+
+        res = self.client.get(
+            detail_url(self.recipe.id),
+            HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_etag_changes_with_tags(self):
+        etag = self.client.get(detail_url(self.recipe.id))['ETag']
+        tag = Tag.objects.create(user=self.user, name='vegan')
+
+        self.recipe.tag.add(tag)
+        res = self.client.get(
+            detail_url(self.recipe.id), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        tag.name = 'vegetarian'
+        tag.save()
+        res = self.client.get(
+            detail_url(self.recipe.id), HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tag'][0]['name'], 'vegetarian')
+
+    def test_update_if_match(self):
+        etag = self.client.get(detail_url(self.recipe.id))['ETag']
+
+        res = self.client.patch(
+            detail_url(self.recipe.id), {'title': 'first'},
+            HTTP_IF_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+        res = self.client.patch(
+            detail_url(self.recipe.id), {'title': 'second'},
+            HTTP_IF_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.title, 'first')
+
+    def test_update_with_tags_touches_once(self):
+        """the links set() changes and the save() update the recipe row
+        once, and the ETag sent is the one the recipe is left at"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(
+                detail_url(self.recipe.id),
+                {'title': 'first', 'tag': [{'name': 'vegan'}]},
+                format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len([
+            query for query in queries
+            if query['sql'].startswith('UPDATE "core_recipe" ')]), 1)
+        res = self.client.get(
+            detail_url(self.recipe.id), HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_update_if_match_interleaved(self):
+        """a write committed after the precondition passed but before the
+        update is made still fails it"""
+        etag = self.client.get(detail_url(self.recipe.id))['ETag']
+        evaluate = RecipeDetailView._evaluate_preconditions
+
+        def evaluate_then_write(view, request):
+            response = evaluate(view, request)
+            Recipe.objects.filter(pk=self.recipe.pk).update(
+                title='other', updated_at=timezone.now())
+            return response
+
+        with patch.object(RecipeDetailView, '_evaluate_preconditions',
+                          evaluate_then_write):
+            res = self.client.patch(
+                detail_url(self.recipe.id), {'title': 'mine'},
+                HTTP_IF_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.title, 'other')
+
+    @override_settings(RESPONSE_CACHE={'ENABLED': True})
+    def test_list_not_modified(self):
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_recipe(user=self.user)
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 2)
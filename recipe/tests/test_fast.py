@@ -0,0 +1,150 @@
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse, set_script_prefix
+from rest_framework.test import APIClient, APIRequestFactory
+from core.models import Recipe, Tag, Ingredient
+from core.renderers import FastJSONRenderer
+from recipe.fast import DETAIL_FIELDS, LIST_FIELDS, RecipeRowRenderer
+from recipe.serializers import RecipeDetailSerializer, RecipeLinkSerializer
+from recipe.tests.helpers import create_recipe
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class RecipeRowRendererTest(TestCase):
+    """recipe.fast renders the bytes the serializers render"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='test123')
+        self.request = APIRequestFactory().get(RECIPES_URL)
+        tags = [Tag.objects.create(user=self.user, name=f'Tag {i}')
+                for i in range(3)]
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+
+        soup = create_recipe(
+            self.user, title='Crème brûlée  ', price=Decimal('0.5'),
+            link='', image='uploads/recipe/soup ü.jpg',
+            image_variants={'webp_320': 'uploads/recipe/variants/s.webp',
+                            'jpeg_640': 'uploads/recipe/variants/s.jpg'})
+        soup.tag.add(tags[2], tags[0])
+        soup.ingredient.add(salt)
+        create_recipe(self.user, title='No relations', price=Decimal('12'))
+        create_recipe(self.user, title='All tags').tag.add(*tags)
+
+    def assertSameBytes(self, rendered, serialized):
+        renderer = FastJSONRenderer()
+        self.assertEqual(
+            renderer.render(rendered), renderer.render(serialized))
+
+    def test_list_matches_serializer(self):
+        queryset = Recipe.objects.filter(user=self.user)
+        serializer = RecipeLinkSerializer(
+            queryset.with_related(), many=True,
+            context={'request': self.request})
+        renderer = RecipeRowRenderer(self.request)
+
+        self.assertSameBytes(
+            renderer.render_rows(queryset.values(*renderer.columns)),
+            serializer.data)
+
+    def test_sparse_fields_match_serializer(self):
+        queryset = Recipe.objects.filter(user=self.user)
+        for fields in (['tag', 'id'], ['image_variants', 'price'],
+                       ['title']):
+            serializer = RecipeLinkSerializer(
+                queryset.with_related(), many=True, fields=fields,
+                context={'request': self.request})
+            renderer = RecipeRowRenderer(self.request, fields)
+
+            self.assertSameBytes(
+                renderer.render_rows(queryset.values(*renderer.columns)),
+                serializer.data)
+
+    def test_nested_detail_matches_serializer(self):
+        for recipe in Recipe.objects.filter(user=self.user).with_related():
+            renderer = RecipeRowRenderer(
+                self.request, DETAIL_FIELDS, nested=True,
+                all_fields=DETAIL_FIELDS)
+            rows = Recipe.objects.filter(pk=recipe.pk).values(
+                *renderer.columns)
+
+            self.assertSameBytes(
+                renderer.render_rows(rows)[0],
+                RecipeDetailSerializer(
+                    recipe, context={'request': self.request}).data)
+
+    def test_script_prefix(self):
+        self.addCleanup(set_script_prefix, '/')
+        set_script_prefix('/mounted/')
+        queryset = Recipe.objects.filter(user=self.user)
+        serializer = RecipeLinkSerializer(
+            queryset.with_related(), many=True,
+            context={'request': self.request})
+        renderer = RecipeRowRenderer(self.request)
+
+        rendered = renderer.render_rows(queryset.values(*renderer.columns))
+
+        self.assertTrue(rendered[0]['tag'][0].startswith(
+            'http://testserver/mounted/'))
+        self.assertSameBytes(rendered, serializer.data)
+
+    def test_queries_do_not_grow_with_rows(self):
+        renderer = RecipeRowRenderer(self.request)
+        queryset = Recipe.objects.filter(user=self.user).values(
+            *renderer.columns)
+
+        with self.assertNumQueries(3):
+            renderer.render_rows(queryset)
+        with self.assertNumQueries(0):
+            renderer.render_rows([])
+
+    def test_fields_follow_the_serializer(self):
+        serializer = RecipeLinkSerializer(context={'request': self.request})
+
+        self.assertEqual(
+            [name for name, field in serializer.fields.items()
+             if not field.write_only], list(LIST_FIELDS))
+        self.assertEqual(
+            list(RecipeDetailSerializer().fields), list(DETAIL_FIELDS))
+
+
+class RecipeListViewParityTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='test123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        for i in range(8):
+            recipe = create_recipe(
+                self.user, title=f'Recipe {i}', price=Decimal(f'{i}.10'))
+            if i % 2:
+                recipe.tag.add(tag)
+
+    def serialized(self, request, recipes, fields=None):
+        return FastJSONRenderer().render(RecipeLinkSerializer(
+            recipes.with_related(), many=True, fields=fields,
+            context={'request': request}).data)
+
+    def test_list_view_matches_serializer(self):
+        recipes = Recipe.objects.filter(user=self.user)
+        for fields in (None, ['id', 'tag']):
+            params = {'fields': ','.join(fields)} if fields else {}
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(
+                res.content,
+                self.serialized(res.wsgi_request, recipes, fields))
+
+    def test_pages_match_serializer(self):
+        for params in ({'paginate': 'page', 'p': 2}, {'paginate': 'cursor'}):
+            res = self.client.get(RECIPES_URL, params)
+            results = res.json()['results']
+            recipes = Recipe.objects.filter(
+                pk__in=[recipe['id'] for recipe in results])
+
+            self.assertEqual(
+                FastJSONRenderer().render(results),
+                self.serialized(res.wsgi_request, recipes))
@@ -6,7 +6,7 @@ from rest_framework.test import APIClient
 from rest_framework import status
 from model_bakery import baker
 from core.models import Recipe, Ingredient
-from recipe.serializers import IngredientSerializer
+from recipe.serializers import IngredientCountSerializer
 
 INGREDIENTS_URL = reverse('recipe:ingredient-list')
 
@@ -36,7 +36,7 @@ class PrivateIngredientAPITest(TestCase):
         Ingredient.objects.create(user=self.user, name='salt')
 
         ingredients = Ingredient.objects.filter(user=self.user)
-        serializer = IngredientSerializer(ingredients, many=True)
+        serializer = IngredientCountSerializer(ingredients, many=True)
 
         res = self.client.get(INGREDIENTS_URL)
 
@@ -49,7 +49,7 @@ class PrivateIngredientAPITest(TestCase):
             user=self.user, name='pineapple')
 
         ingredients = Ingredient.objects.filter(user=self.user)
-        serializer = IngredientSerializer(ingredients, many=True)
+        serializer = IngredientCountSerializer(ingredients, many=True)
 
         self.assertEqual(ingredients.count(), 1)
         self.assertEqual(ingredients[0].name, ingredient.name)
@@ -84,8 +84,9 @@ class PrivateIngredientAPITest(TestCase):
 
         res = self.client.get(INGREDIENTS_URL, {'assign_only': 1})
 
-        s1 = IngredientSerializer(i1)
-        s2 = IngredientSerializer(i2)
+        i1.refresh_from_db()
+        s1 = IngredientCountSerializer(i1)
+        s2 = IngredientCountSerializer(i2)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertIn(s1.data, res.data)
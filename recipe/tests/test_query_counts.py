@@ -0,0 +1,452 @@
+import os
+from io import BytesIO
+from itertools import count
+from time import perf_counter
+from unittest import skipUnless
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, tag
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from core.models import Ingredient, Recipe, Tag
+from core.seed import seed
+from core.tests.helpers import QueryCountMixin
+from recipe.cache import reset_generation
+from recipe.tests.helpers import create_recipe
+
+# the most queries a request may run besides authentication, whatever the
+# size of its result; raise one only with the reason in the commit. Writes
+# include the UPDATE recipe.signals indexes recipes with on Postgres
+QUERY_BUDGETS = {
+    'recipe-list': 3,
+    'recipe-list-tags': 3,
+    'recipe-list-tags-all': 3,
+    'recipe-list-ingredients': 3,
+    'recipe-list-tags-ingredients': 3,
+    'recipe-list-search': 3,
+    'recipe-list-page': 4,
+    'recipe-list-cursor': 3,
+    'recipe-list-fields': 1,
+    'recipe-create': 18,
+    'recipe-bulk-create': 14,
+    'recipe-detail': 3,
+    'recipe-update': 27,
+    'recipe-delete': 8,
+    'recipe-image-upload': 5,
+    'recipe-bulk-update': 12,
+    'recipe-bulk-delete': 11,
+    'tag-list': 1,
+    'tag-list-assigned': 1,
+    'tag-suggest': 1,
+    'tag-detail': 1,
+    'tag-update': 4,
+    'tag-delete': 5,
+    'ingredient-list': 1,
+    'ingredient-list-assigned': 1,
+    'ingredient-suggest': 1,
+    'ingredient-detail': 1,
+    'ingredient-update': 4,
+    'ingredient-delete': 5,
+    'user-create': 2,
+    'user-token': 2,
+    'user-me': 0,
+    'user-me-update': 2,
+    'recipe-list-async': 3,
+    'recipe-list-async-tags-ingredients': 3,
+    'recipe-detail-async': 3,
+    'tag-list-async': 1,
+    'tag-list-async-assigned': 1,
+    'ingredient-list-async': 1,
+    'ingredient-list-async-assigned': 1,
+}
+
+# milliseconds the median of a few requests may take on the seeded dataset,
+# generous enough for a slow CI runner, meant to catch the order of
+# magnitude regressions a query count cannot (a missing index, python
+# loops over rows)
+TIME_BUDGETS = {
+    'recipe-list': 150,
+    'recipe-list-tags-ingredients': 150,
+    'recipe-list-search': 150,
+    'recipe-detail': 100,
+    'tag-list-assigned': 100,
+    'ingredient-list-assigned': 100,
+    'recipe-list-async': 150,
+}
+
+
+_names = count()
+
+
+def recipe_payload(size):
+    """a recipe with size tags and ingredients that do not exist yet"""
+    serial = next(_names)
+    return {
+        'title': 'New recipe', 'time_minute': 5, 'price': '5.00',
+        'description': 'New', 'link': 'http://example.com/new.pdf',
+        'tag': [{'name': f'new t{serial}-{i}'} for i in range(size)],
+        'ingredient': [{'name': f'new i{serial}-{i}'} for i in range(size)],
+    }
+
+
+def image_upload():
+    image = BytesIO()
+    Image.new(mode='RGB', size=(10, 10)).save(image, format='PNG')
+    return SimpleUploadedFile(
+        'image.png', image.getvalue(), content_type='image/png')
+
+
+class QueryBudgetTest(QueryCountMixin, TestCase):
+    """every endpoint and filter runs a bounded number of queries that
+    does not grow with the number of rows it returns"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='test123')
+        self.client = APIClient()
+        # token authentication like production, the async views have no
+        # forced authentication; the first request caches the token so
+        # it is not counted below
+        self.client.credentials(HTTP_AUTHORIZATION=(
+            f'Token {Token.objects.create(user=self.user).key}'))
+        self.client.get(reverse('user:me'))
+
+        # every recipe matches the filters below
+        self.tag = Tag.objects.create(user=self.user, name='common')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='common')
+        self.recipe = None
+
+    def populate(self, size):
+        """size recipes, each with the common and an own tag and
+        ingredient"""
+        for i in range(Recipe.objects.filter(user=self.user).count(), size):
+            recipe = create_recipe(user=self.user, title=f'Soup {i}')
+            recipe.tag.add(
+                self.tag, Tag.objects.create(user=self.user, name=f't{i}'))
+            recipe.ingredient.add(
+                self.ingredient,
+                Ingredient.objects.create(user=self.user, name=f'i{i}'))
+            self.recipe = self.recipe or recipe
+        self.size = size
+
+    def populate_linked(self, size):
+        """populate, with the first two recipes linked to every tag and
+        ingredient"""
+        self.populate(max(size, 2))
+        for recipe in Recipe.objects.filter(user=self.user)[:2]:
+            recipe.tag.set(Tag.objects.filter(user=self.user))
+            recipe.ingredient.set(Ingredient.objects.filter(user=self.user))
+
+    def populate_doomed(self, size):
+        """populate, plus a recipe, tag and ingredient linked to size rows
+        and size more recipes for the delete endpoints to remove"""
+        self.populate(size)
+        recipes = list(Recipe.objects.filter(user=self.user))
+        serial = next(_names)
+        self.doomed = create_recipe(user=self.user, title='Doomed')
+        self.doomed.tag.add(*(
+            Tag.objects.create(user=self.user, name=f'doomed t{serial}-{i}')
+            for i in range(size)))
+        self.doomed.ingredient.add(*(
+            Ingredient.objects.create(
+                user=self.user, name=f'doomed i{serial}-{i}')
+            for i in range(size)))
+        self.doomed_tag = Tag.objects.create(
+            user=self.user, name=f'doomed {serial}')
+        self.doomed_tag.recipe_set.add(*recipes)
+        self.doomed_ingredient = Ingredient.objects.create(
+            user=self.user, name=f'doomed {serial}')
+        self.doomed_ingredient.recipe_set.add(*recipes)
+        self.doomed_ids = [self.doomed.pk] + [
+            create_recipe(user=self.user, title=f'Doomed {i}').pk
+            for i in range(size - 1)]
+
+    def assertQueryBudget(self, name, view_name, kwargs=dict, params=None,
+                          method='get', data=None, format='json',
+                          populate=None):
+        """view_name is looked up in the recipe namespace unless it names
+        its own"""
+        if ':' not in view_name:
+            view_name = f'recipe:{view_name}'
+
+        def request():
+            res = getattr(self.client, method)(
+                reverse(view_name, kwargs=kwargs()),
+                params if data is None else data(self.size), format=(
+                    None if data is None else format))
+            self.assertLess(res.status_code, 300, res.content)
+
+        queries = self.assertConstantQueries(
+            populate or self.populate, request)
+
+        self.assertLessEqual(queries, QUERY_BUDGETS[name])
+
+    def _recipe(self):
+        return {'recipe_id': self.recipe.pk}
+
+    def _tag(self):
+        return {'tag_id': self.tag.pk}
+
+    def _ingredient(self):
+        return {'ingredient_id': self.ingredient.pk}
+
+    def _both(self):
+        return {'tags': self.tag.pk, 'ingredients': self.ingredient.pk}
+
+    def test_recipe_list(self):
+        self.assertQueryBudget('recipe-list', 'recipe-list', dict)
+
+    def test_recipe_list_tags(self):
+        self.assertQueryBudget(
+            'recipe-list-tags', 'recipe-list', dict,
+            params={'tags': f'{self.tag.pk}'})
+
+    def test_recipe_list_all_tags(self):
+        self.assertQueryBudget(
+            'recipe-list-tags-all', 'recipe-list', dict,
+            params={'tags': f'{self.tag.pk},{self.tag.pk}',
+                    'tags_match': 'all'})
+
+    def test_recipe_list_ingredients(self):
+        self.assertQueryBudget(
+            'recipe-list-ingredients', 'recipe-list', dict,
+            params={'ingredients': f'{self.ingredient.pk}'})
+
+    def test_recipe_list_tags_and_ingredients(self):
+        self.assertQueryBudget(
+            'recipe-list-tags-ingredients', 'recipe-list', dict,
+            params=self._both())
+
+    def test_recipe_list_search(self):
+        self.assertQueryBudget(
+            'recipe-list-search', 'recipe-list', dict, params={'q': 'soup'})
+
+    def test_recipe_list_page(self):
+        self.assertQueryBudget(
+            'recipe-list-page', 'recipe-list', dict,
+            params={'paginate': 'page', **self._both()})
+
+    def test_recipe_list_cursor(self):
+        self.assertQueryBudget(
+            'recipe-list-cursor', 'recipe-list', dict,
+            params={'paginate': 'cursor', **self._both()})
+
+    def test_recipe_list_fields(self):
+        self.assertQueryBudget(
+            'recipe-list-fields', 'recipe-list', dict,
+            params={'fields': 'id,title'})
+
+    def test_recipe_create(self):
+        # as many new tags and ingredients as there are recipes
+        self.assertQueryBudget(
+            'recipe-create', 'recipe-list', dict, method='post',
+            data=recipe_payload)
+
+    def test_recipe_bulk_create(self):
+        self.assertQueryBudget(
+            'recipe-bulk-create', 'recipe-bulk', dict, method='post',
+            data=lambda size: [recipe_payload(2) for _ in range(size)])
+
+    def test_recipe_detail(self):
+        self.assertQueryBudget('recipe-detail', 'recipe-detail', self._recipe)
+
+    def test_recipe_update(self):
+        self.assertQueryBudget(
+            'recipe-update', 'recipe-detail', self._recipe, method='patch',
+            data=recipe_payload)
+
+    def test_recipe_delete(self):
+        self.assertQueryBudget(
+            'recipe-delete', 'recipe-detail',
+            lambda: {'recipe_id': self.doomed.pk}, method='delete',
+            populate=self.populate_doomed)
+
+    def test_recipe_image_upload(self):
+        self.assertQueryBudget(
+            'recipe-image-upload', 'recipe-detail', self._recipe,
+            method='post', data=lambda size: {'image': image_upload()},
+            format='multipart')
+
+    def test_recipe_bulk_update(self):
+        # items are saved one by one, the budget is for two of them with
+        # ever more tags and ingredients
+        self.assertQueryBudget(
+            'recipe-bulk-update', 'recipe-bulk', dict, method='patch',
+            data=lambda size: [
+                {'id': recipe.pk, 'title': 'Renamed'}
+                for recipe in Recipe.objects.filter(user=self.user)[:2]],
+            populate=self.populate_linked)
+
+    def test_recipe_bulk_delete(self):
+        self.assertQueryBudget(
+            'recipe-bulk-delete', 'recipe-bulk', dict, method='delete',
+            data=lambda size: self.doomed_ids,
+            populate=self.populate_doomed)
+
+    def test_tag_list(self):
+        self.assertQueryBudget('tag-list', 'tag-list', dict)
+
+    def test_tag_list_assigned(self):
+        self.assertQueryBudget(
+            'tag-list-assigned', 'tag-list', dict,
+            params={'assign_only': 1})
+
+    def test_tag_suggest(self):
+        self.assertQueryBudget(
+            'tag-suggest', 'tag-suggest', dict, params={'q': 't'})
+
+    def test_tag_detail(self):
+        self.assertQueryBudget('tag-detail', 'tag-detail', self._tag)
+
+    def test_tag_update(self):
+        self.assertQueryBudget(
+            'tag-update', 'tag-detail', self._tag, method='patch',
+            data=lambda size: {'name': f'common {size}'})
+
+    def test_tag_delete(self):
+        self.assertQueryBudget(
+            'tag-delete', 'tag-detail',
+            lambda: {'tag_id': self.doomed_tag.pk}, method='delete',
+            populate=self.populate_doomed)
+
+    def test_ingredient_list(self):
+        self.assertQueryBudget('ingredient-list', 'ingredient-list', dict)
+
+    def test_ingredient_list_assigned(self):
+        self.assertQueryBudget(
+            'ingredient-list-assigned', 'ingredient-list', dict,
+            params={'assign_only': 1})
+
+    def test_ingredient_suggest(self):
+        self.assertQueryBudget(
+            'ingredient-suggest', 'ingredient-suggest', dict,
+            params={'q': 'i'})
+
+    def test_ingredient_detail(self):
+        self.assertQueryBudget(
+            'ingredient-detail', 'ingredient-detail', self._ingredient)
+
+    def test_ingredient_update(self):
+        self.assertQueryBudget(
+            'ingredient-update', 'ingredient-detail', self._ingredient,
+            method='patch', data=lambda size: {'name': f'common {size}'})
+
+    def test_ingredient_delete(self):
+        self.assertQueryBudget(
+            'ingredient-delete', 'ingredient-detail',
+            lambda: {'ingredient_id': self.doomed_ingredient.pk},
+            method='delete', populate=self.populate_doomed)
+
+    def test_user_create(self):
+        self.assertQueryBudget(
+            'user-create', 'user:create', dict, method='post',
+            data=lambda size: {
+                'email': f'new{next(_names)}@example.com',
+                'password': 'test123'})
+
+    def test_user_token(self):
+        self.assertQueryBudget(
+            'user-token', 'user:token', dict, method='post',
+            data=lambda size: {
+                'email': 'test@example.com', 'password': 'test123'})
+
+    def test_user_me(self):
+        self.assertQueryBudget('user-me', 'user:me', dict)
+
+    def test_user_me_update(self):
+        def populate(size):
+            # saving the user drops its cached token, take it again
+            self.populate(size)
+            self.client.get(reverse('user:me'))
+
+        self.assertQueryBudget(
+            'user-me-update', 'user:me', dict, method='patch',
+            data=lambda size: {'password': f'new{size}123'[:8]},
+            populate=populate)
+
+    def test_recipe_list_async(self):
+        self.assertQueryBudget(
+            'recipe-list-async', 'recipe-list-async', dict)
+
+    def test_recipe_list_async_tags_and_ingredients(self):
+        self.assertQueryBudget(
+            'recipe-list-async-tags-ingredients', 'recipe-list-async', dict,
+            params=self._both())
+
+    def test_recipe_detail_async(self):
+        self.assertQueryBudget(
+            'recipe-detail-async', 'recipe-detail-async', self._recipe)
+
+    def test_tag_list_async(self):
+        self.assertQueryBudget('tag-list-async', 'tag-list-async', dict)
+
+    def test_tag_list_async_assigned(self):
+        self.assertQueryBudget(
+            'tag-list-async-assigned', 'tag-list-async', dict,
+            params={'assign_only': 1})
+
+    def test_ingredient_list_async(self):
+        self.assertQueryBudget(
+            'ingredient-list-async', 'ingredient-list-async', dict)
+
+    def test_ingredient_list_async_assigned(self):
+        self.assertQueryBudget(
+            'ingredient-list-async-assigned', 'ingredient-list-async', dict,
+            params={'assign_only': 1})
+
+
+@tag('performance')
+@skipUnless(os.environ.get('PERFORMANCE_TESTS'),
+            'wall-clock budgets, set PERFORMANCE_TESTS=1 to run them')
+class TimeBudgetTest(TestCase):
+    """wall-clock budgets on a seeded dataset, the response cache is
+    bypassed by changing the user's generation before every request.
+    Timings depend on the machine, so they only run on request:
+    PERFORMANCE_TESTS=1 python manage.py test --tag performance"""
+    runs = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed(users=5, recipes=200, tags=40, ingredients=40,
+                        per_recipe=4)[0]
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        recipe = Recipe.objects.filter(user=self.user).first()
+        self.cases = {
+            'recipe-list': ('recipe-list', {}, {}),
+            'recipe-list-tags-ingredients': ('recipe-list', {}, {
+                'tags': recipe.tag.first().pk,
+                'ingredients': recipe.ingredient.first().pk}),
+            'recipe-list-search': (
+                'recipe-list', {}, {'q': recipe.title.split()[0]}),
+            'recipe-detail': (
+                'recipe-detail', {'recipe_id': recipe.pk}, {}),
+            'tag-list-assigned': ('tag-list', {}, {'assign_only': 1}),
+            'ingredient-list-assigned': (
+                'ingredient-list', {}, {'assign_only': 1}),
+            'recipe-list-async': ('recipe-list-async', {}, {}),
+        }
+
+    def test_time_budgets(self):
+        self.assertEqual(set(self.cases), set(TIME_BUDGETS))
+        for name, (view_name, kwargs, params) in self.cases.items():
+            url = reverse(f'recipe:{view_name}', kwargs=kwargs)
+            timings = []
+            for _ in range(self.runs):
+                reset_generation(self.user.pk)
+                started = perf_counter()
+                res = self.client.get(url, params)
+                timings.append((perf_counter() - started) * 1000)
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+            median = sorted(timings)[self.runs // 2]
+            with self.subTest(name):
+                self.assertLess(median, TIME_BUDGETS[name])
@@ -1,15 +1,19 @@
 from decimal import Decimal
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient, APIRequestFactory
 from rest_framework import status
 from model_bakery import baker
 from core.models import Ingredient, Recipe, Tag
+from core.tests.helpers import QueryCountMixin
 from recipe.serializers import RecipeLinkSerializer, RecipeSerializer, RecipeDetailSerializer
 from PIL import Image
 import tempfile
 import os
+from unittest.mock import patch
 
 RECIPES_URL = reverse('recipe:recipe-list')
 
@@ -42,7 +46,7 @@ class PublicRecipeAPITest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateRecipeAPITest(TestCase):
+class PrivateRecipeAPITest(QueryCountMixin, TestCase):
     def setUp(self):
         self.user = get_user_model().objects.create_user(
             email='test@example.com', password='test123')
@@ -158,6 +162,46 @@ class PrivateRecipeAPITest(TestCase):
             self.assertTrue(exists)
 
 
+    def test_create_recipe_nested_query_count_constant(self):
+        def payload(size):
+            return {
+                'title': 'simple title',
+                'description': 'sample description',
+                'time_minute': 6,
+                'price': Decimal('5.8'),
+                'link': 'http://test.com/recipe.pdf',
+                'tag': [{'name': f'tag {size} {i}'} for i in range(size)],
+                'ingredient': [
+                    {'name': f'ingredient {size} {i}'} for i in range(size)],
+            }
+
+        counts = []
+        for size in (1, 10, 50):
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.post(
+                    RECIPES_URL, payload(size), format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            counts.append(len(ctx.captured_queries))
+
+        self.assertEqual(len(set(counts)), 1, counts)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 61)
+
+    def test_create_recipe_with_duplicate_nested_names(self):
+        payload = {
+            'title': 'simple title',
+            'description': 'sample description',
+            'time_minute': 6,
+            'price': Decimal('5.8'),
+            'link': 'http://test.com/recipe.pdf',
+            'ingredient': [{'name': 'salt'}, {'name': 'salt'}]
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(recipe.ingredient.count(), 1)
+
     def test_create_tag_on_update(self):
         recipe = create_recipe(user=self.user)
         payload = {'tag': [{'name': 'first'}]}
@@ -185,6 +229,43 @@ class PrivateRecipeAPITest(TestCase):
         self.assertIn(second_tag, recipe.tag.all())
 
 
+    def test_update_unchanged_tags_keeps_through_rows(self):
+        first = Tag.objects.create(user=self.user, name='first')
+        second = Tag.objects.create(user=self.user, name='second')
+        recipe = create_recipe(user=self.user)
+        recipe.tag.add(first, second)
+        through_ids = set(
+            Recipe.tag.through.objects.values_list('id', flat=True))
+
+        payload = {'tag': [{'name': 'second'}, {'name': 'first'}]}
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.patch(
+                detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(Recipe.tag.through.objects.values_list('id', flat=True)),
+            through_ids)
+        for query in ctx.captured_queries:
+            self.assertFalse(query['sql'].startswith('DELETE'))
+
+    def test_update_tags_only_changes_diff(self):
+        first = Tag.objects.create(user=self.user, name='first')
+        second = Tag.objects.create(user=self.user, name='second')
+        recipe = create_recipe(user=self.user)
+        recipe.tag.add(first, second)
+        kept = Recipe.tag.through.objects.get(tag=second)
+
+        payload = {'tag': [{'name': 'second'}, {'name': 'third'}]}
+        res = self.client.patch(detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(recipe.tag.values_list('name', flat=True)),
+            {'second', 'third'})
+        self.assertTrue(
+            Recipe.tag.through.objects.filter(id=kept.id).exists())
+
     def test_clear_recipe_tags(self):
         tag = Tag.objects.create(user=self.user, name='first')
         recipe = create_recipe(user=self.user)
@@ -247,6 +328,134 @@ class PrivateRecipeAPITest(TestCase):
         self.assertNotIn(s3.data, res.data)
 
 
+    def test_filter_by_all_tags(self):
+        t1 = Tag.objects.create(user=self.user, name='vegan')
+        t2 = Tag.objects.create(user=self.user, name='quick')
+        r1 = create_recipe(user=self.user, title='salad')
+        r1.tag.add(t1, t2)
+        r2 = create_recipe(user=self.user, title='soup')
+        r2.tag.add(t1)
+
+        query_params = {'tags': f'{t1.id},{t2.id}', 'tags_match': 'all'}
+        res = self.client.get(RECIPES_URL, query_params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data], [r1.id])
+
+    def test_filter_by_any_tags_returns_recipe_once(self):
+        t1 = Tag.objects.create(user=self.user, name='vegan')
+        t2 = Tag.objects.create(user=self.user, name='quick')
+        r1 = create_recipe(user=self.user, title='salad')
+        r1.tag.add(t1, t2)
+
+        res = self.client.get(RECIPES_URL, {'tags': f'{t1.id},{t2.id}'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data], [r1.id])
+
+    def test_filter_invalid_match_mode(self):
+        res = self.client.get(
+            RECIPES_URL, {'ingredients': '1', 'ingredients_match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_page_number_pagination(self):
+        recipes = [create_recipe(user=self.user) for _ in range(3)]
+
+        res = self.client.get(
+            RECIPES_URL, {'paginate': 'page', 'p': 2, 'ps': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 3)
+        self.assertEqual(
+            [r['id'] for r in res.data['results']], [recipes[2].id])
+
+    def test_cursor_pagination_skips_count(self):
+        recipes = [create_recipe(user=self.user) for _ in range(3)]
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(
+                RECIPES_URL, {'paginate': 'cursor', 'ps': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', res.data)
+        self.assertEqual(
+            [r['id'] for r in res.data['results']],
+            [recipes[0].id, recipes[1].id])
+        for query in ctx.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual(
+            [r['id'] for r in res.data['results']], [recipes[2].id])
+        self.assertIsNone(res.data['next'])
+
+    def test_invalid_pagination_mode(self):
+        res = self.client.get(RECIPES_URL, {'paginate': 'offset'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_sparse_fields(self):
+        recipe = create_recipe(user=self.user)
+        recipe.tag.add(Tag.objects.create(user=self.user, name='vegan'))
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPES_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [{'id': recipe.id, 'title': recipe.title}])
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn('"link"', ctx.captured_queries[0]['sql'])
+
+    def test_list_does_not_load_write_only_fields(self):
+        create_recipe(user=self.user)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(RECIPES_URL)
+
+        self.assertNotIn('"description"', ctx.captured_queries[0]['sql'])
+
+    def test_detail_sparse_fields(self):
+        recipe = create_recipe(user=self.user)
+
+        res = self.client.get(
+            detail_url(recipe.id), {'fields': 'title,description'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {
+            'title': recipe.title, 'description': recipe.description})
+
+    def test_unknown_sparse_field(self):
+        res = self.client.get(RECIPES_URL, {'fields': 'id,description'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def _populate_recipes(self, size):
+        for i in range(Recipe.objects.filter(user=self.user).count(), size):
+            recipe = create_recipe(user=self.user, title=f'recipe {i}')
+            recipe.tag.add(Tag.objects.create(user=self.user, name=f't{i}'))
+            recipe.ingredient.add(
+                Ingredient.objects.create(user=self.user, name=f'i{i}'))
+
+    def test_list_recipes_query_count_constant(self):
+        def request():
+            res = self.client.get(RECIPES_URL)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertConstantQueries(self._populate_recipes, request)
+
+    def test_get_recipe_detail_query_count(self):
+        self._populate_recipes(1)
+        recipe = Recipe.objects.get(user=self.user)
+        recipe.tag.add(Tag.objects.create(user=self.user, name='extra'))
+
+        with self.assertNumQueries(3):
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(len(res.data['tag']), 2)
+
+
 class ImageUploadTest(TestCase):
     def setUp(self):
         self.user = get_user_model().objects.create_user(
@@ -256,14 +465,67 @@ class ImageUploadTest(TestCase):
         self.client.force_authenticate(self.user)
 
     def tearDown(self):
+        self.recipe.refresh_from_db()
+        storage = self.recipe.image.storage
+        for name in self.recipe.image_variants.values():
+            storage.delete(name)
         self.recipe.image.delete()
 
-    # def test_upload_image_bad_request(self):
-    #     payload = {'image': 'not an image'}
-    #     res = self.client.post(detail_url(self.recipe.id),
-    #                            payload)
+    def _upload(self, size=(10, 10)):
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            img = Image.new(mode='RGB', size=size)
+            img.save(fp=image_file, format='JPEG')
+            image_file.seek(0)
+
+            return self.client.post(
+                detail_url(self.recipe.id), {'image': image_file},
+                'multipart')
+
+    def test_upload_image_bad_request(self):
+        payload = {'image': 'not an image'}
+        res = self.client.post(detail_url(self.recipe.id),
+                               payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_non_image_file(self):
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as text_file:
+            text_file.write(b'plain text pretending to be a jpeg')
+            text_file.seek(0)
+
+            res = self.client.post(
+                detail_url(self.recipe.id), {'image': text_file},
+                'multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(IMAGE_UPLOAD={'MAX_PIXELS': 10 * 10})
+    def test_upload_image_too_many_pixels(self):
+        res = self._upload(size=(20, 10))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    @override_settings(IMAGE_UPLOAD={'MAX_BYTES': 100})
+    def test_upload_image_too_large(self):
+        res = self._upload(size=(50, 50))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
-    #     self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+    def test_upload_image_validation_reads_header_only(self):
+        with tempfile.NamedTemporaryFile(suffix='.png') as image_file:
+            Image.new(mode='RGB', size=(1000, 1000)).save(
+                fp=image_file, format='PNG')
+            image_file.seek(0)
+
+            with patch('PIL.ImageFile.ImageFile.load') as load:
+                res = self.client.post(
+                    detail_url(self.recipe.id), {'image': image_file},
+                    'multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        load.assert_not_called()
 
     def test_upload_image(self):
         with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
@@ -280,3 +542,43 @@ class ImageUploadTest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertIn('image', res.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
+
+    @override_settings(IMAGE_PIPELINE={
+        'BACKEND': 'core.images.SyncBackend', 'SIZES': [8, 400]})
+    def test_upload_image_generates_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self._upload(size=(800, 600))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_variants'], {})
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            set(self.recipe.image_variants),
+            {'webp_8', 'jpeg_8', 'webp_400', 'jpeg_400'})
+        storage = self.recipe.image.storage
+        with storage.open(self.recipe.image_variants['webp_400']) as f:
+            img = Image.open(f)
+            self.assertEqual(img.format, 'WEBP')
+            self.assertEqual(img.size, (400, 300))
+
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertTrue(
+            res.data['image_variants']['jpeg_8'].startswith('http://'))
+
+    @override_settings(IMAGE_PIPELINE={
+        'BACKEND': 'core.images.SyncBackend', 'SIZES': [8]})
+    def test_new_upload_replaces_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._upload()
+        self.recipe.refresh_from_db()
+        first = list(self.recipe.image_variants.values())
+        first_image = self.recipe.image
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._upload()
+
+        storage = self.recipe.image.storage
+        for name in first:
+            self.assertFalse(storage.exists(name))
+        first_image.delete(save=False)
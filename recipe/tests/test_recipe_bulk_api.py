@@ -0,0 +1,176 @@
+import json
+from unittest.mock import patch
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+from core.models import Recipe, Tag
+from recipe.views import RecipeBulkView
+
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def recipe_payload(**params):
+    default = {
+        'title': 'Sample recipe title',
+        'time_minute': 22,
+        'price': '5.25',
+        'description': 'Sample recipe description',
+        'link': 'http://example.com/recipe.pdf',
+    }
+    default.update(**params)
+    return default
+
+
+class PublicRecipeBulkAPITest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        res = self.client.post(BULK_URL, [], format='json')
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateRecipeBulkAPITest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='test123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_create(self):
+        payload = [
+            recipe_payload(title='first', tag=[{'name': 'vegan'}]),
+            recipe_payload(
+                title='second', tag=[{'name': 'vegan'}, {'name': 'quick'}],
+                ingredient=[{'name': 'salt'}]),
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['status'] for r in res.data], [201, 201])
+        first = Recipe.objects.get(id=res.data[0]['id'])
+        second = Recipe.objects.get(id=res.data[1]['id'])
+        self.assertEqual(first.user, self.user)
+        self.assertEqual(first.price, Decimal('5.25'))
+        self.assertEqual(
+            set(first.tag.values_list('name', flat=True)), {'vegan'})
+        self.assertEqual(
+            set(second.tag.values_list('name', flat=True)),
+            {'vegan', 'quick'})
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(second.ingredient.get().name, 'salt')
+
+    def test_bulk_create_reports_invalid_items(self):
+        payload = [
+            recipe_payload(title='first'),
+            recipe_payload(price='not a price'),
+            recipe_payload(title='third'),
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([r['index'] for r in res.data], [0, 1, 2])
+        self.assertEqual([r['status'] for r in res.data], [201, 400, 201])
+        self.assertIn('price', res.data[1]['errors'])
+        self.assertEqual(
+            set(Recipe.objects.values_list('title', flat=True)),
+            {'first', 'third'})
+
+    def test_bulk_create_query_count_constant(self):
+        def payload(size):
+            return [
+                recipe_payload(
+                    tag=[{'name': f'tag {i % 3}'}],
+                    ingredient=[{'name': f'ingredient {i}'}])
+                for i in range(size)]
+
+        counts = []
+        for size in (1, 20):
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.post(BULK_URL, payload(size), format='json')
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            counts.append(len(ctx.captured_queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_bulk_create_ndjson(self):
+        body = '\n'.join(json.dumps(recipe_payload(title=f'r{i}'))
+                         for i in range(3))
+
+        res = self.client.post(
+            BULK_URL, body, content_type='application/x-ndjson')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 3)
+
+    @patch('recipe.views.RecipeBulkView.batch_size', 2)
+    def test_bulk_create_ndjson_parse_error(self):
+        """the batches before the bad line are committed and reported"""
+        body = '\n'.join(
+            [json.dumps(recipe_payload(title=f'r{i}')) for i in range(3)]
+            + ['not json', json.dumps(recipe_payload(title='after'))])
+
+        res = self.client.post(
+            BULK_URL, body, content_type='application/x-ndjson')
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        created = Recipe.objects.filter(user=self.user).order_by('id')
+        self.assertEqual([r.title for r in created], ['r0', 'r1', 'r2'])
+        self.assertEqual(
+            [(r['index'], r['status']) for r in res.data],
+            [(0, 201), (1, 201), (2, 201), (3, 400)])
+        self.assertEqual(
+            [r['id'] for r in res.data[:3]], [r.id for r in created])
+        self.assertIn('line 4', str(res.data[3]['errors']))
+
+    def test_bulk_parses_json_like_the_api(self):
+        self.assertEqual(
+            RecipeBulkView.parser_classes[:-1],
+            api_settings.DEFAULT_PARSER_CLASSES)
+
+    def test_bulk_requires_list(self):
+        res = self.client.post(BULK_URL, recipe_payload(), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update(self):
+        recipe = Recipe.objects.create(user=self.user, **recipe_payload())
+        other_user = get_user_model().objects.create_user(
+            email='other@example.com', password='test123')
+        other = Recipe.objects.create(user=other_user, **recipe_payload())
+
+        payload = [
+            {'id': recipe.id, 'title': 'new title',
+             'ingredient': [{'name': 'salt'}]},
+            {'id': other.id, 'title': 'stolen'},
+        ]
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([r['status'] for r in res.data], [200, 404])
+        recipe.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(recipe.title, 'new title')
+        self.assertEqual(recipe.ingredient.get().name, 'salt')
+        self.assertNotEqual(other.title, 'stolen')
+
+    def test_bulk_delete(self):
+        recipes = [
+            Recipe.objects.create(user=self.user, **recipe_payload())
+            for _ in range(2)]
+
+        res = self.client.delete(
+            BULK_URL, [recipes[0].id, {'id': recipes[1].id}, 0],
+            format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([r['status'] for r in res.data], [204, 204, 404])
+        self.assertFalse(Recipe.objects.exists())
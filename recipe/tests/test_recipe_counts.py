@@ -0,0 +1,165 @@
+from io import StringIO
+from unittest.mock import patch
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Recipe, Tag, Ingredient
+from core.seed import seed
+from recipe.tests.helpers import create_recipe
+
+
+class RecipeCountTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='test123')
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.quick = Tag.objects.create(user=self.user, name='Quick')
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+        self.soup = create_recipe(self.user, title='Soup')
+        self.stew = create_recipe(self.user, title='Stew')
+
+    def assertCounts(self, vegan, quick, salt=None):
+        self.assertEqual(
+            [tag.recipe_count for tag in Tag.objects.filter(
+                name__in=['Quick', 'Vegan']).order_by('name')],
+            [quick, vegan])
+        if salt is not None:
+            self.salt.refresh_from_db()
+            self.assertEqual(self.salt.recipe_count, salt)
+        self.assertFalse(Tag.objects.drifted().exists())
+        self.assertFalse(Ingredient.objects.drifted().exists())
+
+    def test_add_remove_clear(self):
+        self.soup.tag.add(self.vegan, self.quick)
+        self.stew.tag.add(self.vegan)
+        # already linked, not counted twice
+        self.stew.tag.add(self.vegan)
+        self.assertCounts(vegan=2, quick=1)
+
+        # not linked to the stew, not taken off
+        self.stew.tag.remove(self.quick)
+        self.soup.tag.remove(self.quick)
+        self.assertCounts(vegan=2, quick=0)
+
+        self.soup.tag.set([self.quick])
+        self.assertCounts(vegan=1, quick=1)
+
+        self.stew.tag.clear()
+        self.assertCounts(vegan=0, quick=1)
+
+    def test_reverse_add_remove_clear(self):
+        self.vegan.recipe_set.add(self.soup, self.stew)
+        self.quick.recipe_set.add(self.soup)
+        self.assertCounts(vegan=2, quick=1)
+
+        self.quick.recipe_set.remove(self.soup, self.stew)
+        self.assertCounts(vegan=2, quick=0)
+
+        self.vegan.recipe_set.clear()
+        self.assertCounts(vegan=0, quick=0)
+
+    def test_stale_save_keeps_count(self):
+        stale = Tag.objects.get(pk=self.vegan.pk)
+        self.soup.tag.add(self.vegan)
+
+        stale.name = 'Plant based'
+        stale.save()
+
+        self.vegan.refresh_from_db()
+        self.assertEqual(self.vegan.name, 'Plant based')
+        self.assertEqual(self.vegan.recipe_count, 1)
+
+    def test_stale_patch_keeps_count(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        salt = Ingredient.objects.get(pk=self.salt.pk)
+        self.stew.ingredient.add(self.salt)
+
+        with patch('recipe.views.get_object_or_404', return_value=salt):
+            res = client.patch(
+                reverse('recipe:ingredient-detail', args=[salt.pk]),
+                {'name': 'Sea salt'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertCounts(vegan=0, quick=0, salt=1)
+
+    def test_recipe_deletes(self):
+        for recipe in (self.soup, self.stew):
+            recipe.tag.add(self.vegan)
+            recipe.ingredient.add(self.salt)
+
+        self.soup.delete()
+        self.assertCounts(vegan=1, quick=0, salt=1)
+
+        Recipe.objects.filter(user=self.user).delete()
+        self.assertCounts(vegan=0, quick=0, salt=0)
+
+    def test_owner_delete(self):
+        self.soup.tag.add(self.vegan)
+
+        self.user.delete()
+
+        self.assertFalse(Tag.objects.exists())
+
+    def test_bulk_api(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        item = {
+            'title': 'Bulk', 'time_minute': 5, 'price': '5.00',
+            'description': 'Bulk', 'link': 'http://example.com/bulk.pdf',
+            'tag': [{'name': 'Vegan'}, {'name': 'New'}],
+            'ingredient': [{'name': 'Salt'}]}
+
+        res = client.post(
+            reverse('recipe:recipe-bulk'), [item] * 3, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(Tag.objects.get(name='New').recipe_count, 3)
+        self.assertCounts(vegan=3, quick=0, salt=3)
+
+        res = client.delete(
+            reverse('recipe:recipe-bulk'),
+            [result['id'] for result in res.data[:2]], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertCounts(vegan=1, quick=0, salt=1)
+
+    def test_seeded_counts(self):
+        seed(users=2, recipes=10, tags=4, ingredients=4, per_recipe=2)
+
+        self.assertTrue(Tag.objects.filter(recipe_count__gt=0).exists())
+        self.assertFalse(Tag.objects.drifted().exists())
+        self.assertFalse(Ingredient.objects.drifted().exists())
+
+    def test_reconcile(self):
+        self.soup.tag.add(self.vegan)
+        self.soup.ingredient.add(self.salt)
+        Tag.objects.update(recipe_count=7)
+        out = StringIO()
+
+        call_command('reconcile_recipe_counts', '--dry-run', '--batch-size',
+                     '1', stdout=out)
+
+        self.assertIn('2 tag counts drifted', out.getvalue())
+        self.assertEqual(Tag.objects.get(name='Vegan').recipe_count, 7)
+
+        call_command('reconcile_recipe_counts', stdout=out)
+
+        self.assertIn('2 tag counts fixed', out.getvalue())
+        self.assertIn('0 ingredient counts fixed', out.getvalue())
+        self.assertCounts(vegan=1, quick=0, salt=1)
+
+    def test_assign_only_lists_counts(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.soup.tag.add(self.vegan)
+        self.stew.tag.add(self.vegan)
+
+        res = client.get(reverse('recipe:tag-list'), {'assign_only': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'id': self.vegan.pk, 'name': 'Vegan', 'recipe_count': 2}])
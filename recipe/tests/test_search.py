@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Tag, Ingredient
+from recipe.tests.helpers import create_recipe
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class RecipeSearchTest(TestCase):
+    """runs the substring fallback, the tests use SQLite"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='test123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, text):
+        res = self.client.get(RECIPES_URL, {'q': text})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['title'] for recipe in res.data]
+
+    def test_search_title_and_description(self):
+        create_recipe(self.user, title='Lentil soup')
+        create_recipe(self.user, title='Stew', description='With lentils')
+        create_recipe(self.user, title='Pancakes')
+
+        self.assertEqual(self.search('lentil'), ['Lentil soup', 'Stew'])
+
+    def test_search_tag_and_ingredient_names(self):
+        tagged = create_recipe(self.user, title='Tagged')
+        tagged.tag.add(Tag.objects.create(user=self.user, name='Vegan'))
+        with_ingredient = create_recipe(self.user, title='With ingredient')
+        with_ingredient.ingredient.add(
+            Ingredient.objects.create(user=self.user, name='Vegan cheese'))
+        create_recipe(self.user, title='Other')
+
+        self.assertEqual(self.search('vegan'), ['Tagged', 'With ingredient'])
+
+    def test_search_every_word_must_match(self):
+        create_recipe(self.user, title='Tomato soup')
+        create_recipe(self.user, title='Tomato salad')
+
+        self.assertEqual(self.search('tomato soup'), ['Tomato soup'])
+
+    def test_search_ranks_title_matches_first(self):
+        create_recipe(self.user, title='Stew', description='Curry flavour')
+        create_recipe(self.user, title='Curry')
+
+        self.assertEqual(self.search('curry'), ['Curry', 'Stew'])
+
+    def test_search_limited_to_user(self):
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='test123')
+        create_recipe(other, title='Curry')
+
+        self.assertEqual(self.search('curry'), [])
+
+    def test_search_sees_renamed_tag(self):
+        recipe = create_recipe(self.user, title='Tagged')
+        tag = Tag.objects.create(user=self.user, name='Spicy')
+        recipe.tag.add(tag)
+        self.assertEqual(self.search('spicy'), ['Tagged'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.name = 'Mild'
+            tag.save()
+
+        self.assertEqual(self.search('spicy'), [])
+        self.assertEqual(self.search('mild'), ['Tagged'])
+
+    def test_blank_query_lists_everything(self):
+        create_recipe(self.user, title='First')
+        create_recipe(self.user, title='Second')
+
+        self.assertEqual(len(self.search(' ')), 2)
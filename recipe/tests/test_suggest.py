@@ -0,0 +1,86 @@
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Tag, Ingredient
+from recipe.suggest import Trie
+
+TAG_SUGGEST_URL = reverse('recipe:tag-suggest')
+INGREDIENT_SUGGEST_URL = reverse('recipe:ingredient-suggest')
+
+
+class TrieTest(SimpleTestCase):
+    def test_matches_name_and_word_prefixes(self):
+        trie = Trie([(1, 'Vegan cheese'), (2, 'Cheddar'), (3, 'Tomato')])
+
+        self.assertEqual(
+            trie.prefixed('che'), {(1, 'Vegan cheese'), (2, 'Cheddar')})
+        self.assertEqual(trie.prefixed('VEG'), {(1, 'Vegan cheese')})
+        self.assertEqual(trie.prefixed('x'), set())
+
+
+class SuggestApiTest(TestCase):
+    """runs the trie fallback, the tests use SQLite"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='test123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def suggest(self, url=TAG_SUGGEST_URL, **params):
+        res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [item['name'] for item in res.data]
+
+    def test_login_required(self):
+        res = APIClient().get(TAG_SUGGEST_URL, {'q': 'a'})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_name_prefixes_before_word_prefixes(self):
+        for name in ('Sweet tomato', 'Tomato', 'Potato', 'Tofu'):
+            Tag.objects.create(user=self.user, name=name)
+
+        self.assertEqual(self.suggest(q='tom'), ['Tomato', 'Sweet tomato'])
+        self.assertEqual(
+            self.suggest(q='to'), ['Tofu', 'Tomato', 'Sweet tomato'])
+
+    def test_limit(self):
+        for i in range(5):
+            Ingredient.objects.create(user=self.user, name=f'Salt {i}')
+
+        names = self.suggest(INGREDIENT_SUGGEST_URL, q='salt', limit=3)
+
+        self.assertEqual(names, ['Salt 0', 'Salt 1', 'Salt 2'])
+
+    def test_invalid_limit(self):
+        for limit in ('x', 0, 51):
+            res = self.client.get(TAG_SUGGEST_URL, {'q': 'a', 'limit': limit})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_limited_to_user(self):
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='test123')
+        Tag.objects.create(user=other, name='Vegan')
+
+        self.assertEqual(self.suggest(q='veg'), [])
+
+    def test_sees_writes(self):
+        self.assertEqual(self.suggest(q='veg'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.assertEqual(self.suggest(q='veg'), ['Vegan'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.name = 'Vegetarian'
+            tag.save()
+        res = self.client.get(TAG_SUGGEST_URL, {'q': 'veg'})
+
+        self.assertEqual(res.data, [{'id': tag.id, 'name': 'Vegetarian'}])
+
+    def test_blank_query(self):
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        self.assertEqual(self.suggest(q=' '), [])
@@ -5,7 +5,7 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 from core.models import Recipe, Tag
-from recipe.serializers import TagSerializer
+from recipe.serializers import TagCountSerializer
 
 TAGS_URL = reverse('recipe:tag-list')
 
@@ -38,7 +38,7 @@ class PrivateTagsAPITest(TestCase):
         Tag.objects.create(user=self.user, name='second')
 
         tags = Tag.objects.filter(user=self.user)
-        serializer = TagSerializer(tags, many=True)
+        serializer = TagCountSerializer(tags, many=True)
 
         res = self.client.get(TAGS_URL)
 
@@ -56,6 +56,13 @@ class PrivateTagsAPITest(TestCase):
         self.assertEqual(len(res.data), 1)
         self.assertEqual(res.data[0]['id'], tag.id)
 
+    def test_create_duplicate_tag(self):
+        Tag.objects.create(user=self.user, name='first')
+
+        res = self.client.post(TAGS_URL, {'name': 'first'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_update_tag(self):
         tag = Tag.objects.create(user=self.user, name='first')
 
@@ -90,8 +97,9 @@ class PrivateTagsAPITest(TestCase):
 
         res = self.client.get(TAGS_URL, {'assign_only': 1})
 
-        s1 = TagSerializer(t1)
-        s2 = TagSerializer(t2)
+        t1.refresh_from_db()
+        s1 = TagCountSerializer(t1)
+        s2 = TagCountSerializer(t2)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertIn(s1.data, res.data)
@@ -126,5 +134,13 @@ class PrivateTagsAPITest(TestCase):
 
         self.assertEqual(len(res.data), 1)
 
+    def test_cursor_pagination(self):
+        tags = [Tag.objects.create(user=self.user, name=f't{i}')
+                for i in range(3)]
 
+        res = self.client.get(TAGS_URL, {'paginate': 'cursor', 'ps': 2})
 
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [t['id'] for t in res.data['results']], [tags[0].id, tags[1].id])
+        self.assertIsNotNone(res.data['next'])
@@ -1,13 +1,28 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 app_name = 'recipe'
 
 urlpatterns = [
     path('recipes/', views.RecipeListView.as_view(), name='recipe-list'),
+    path('recipes/bulk/', views.RecipeBulkView.as_view(), name='recipe-bulk'),
     path('recipes/<int:recipe_id>/', views.RecipeDetailView.as_view(), name='recipe-detail'),
     path('tags/', views.TagListView.as_view(), name='tag-list'),
+    path('tags/suggest/', views.TagSuggestView.as_view(),
+         name='tag-suggest'),
     path('tags/<int:tag_id>/', views.TagDetailView.as_view(), name='tag-detail'),
     path('ingredients/', views.IngredientListView.as_view(), name='ingredient-list'),
+    path('ingredients/suggest/', views.IngredientSuggestView.as_view(),
+         name='ingredient-suggest'),
     path('ingredients/<int:ingredient_id>/', views.IngredientDetailView.as_view(), name='ingredient-detail'),
+    # ASGI-native read paths, same responses as the GETs above
+    path('async/recipes/', async_views.AsyncRecipeListView.as_view(),
+         name='recipe-list-async'),
+    path('async/recipes/<int:recipe_id>/',
+         async_views.AsyncRecipeDetailView.as_view(),
+         name='recipe-detail-async'),
+    path('async/tags/', async_views.AsyncTagListView.as_view(),
+         name='tag-list-async'),
+    path('async/ingredients/', async_views.AsyncIngredientListView.as_view(),
+         name='ingredient-list-async'),
 ]
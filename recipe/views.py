@@ -1,16 +1,35 @@
+from contextlib import nullcontext
+from itertools import count, islice
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils.cache import get_conditional_response
+from django.utils import timezone
+from django.utils.http import http_date
 from rest_framework import generics
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import (
+    PageNumberPagination, CursorPagination)
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import ParseError, ValidationError
+from rest_framework.settings import api_settings
 from drf_spectacular.utils import (
     extend_schema, extend_schema_view, OpenApiParameter, OpenApiTypes)
 from core.models import Recipe, Tag, Ingredient
 from .serializers import (
     RecipeSerializer, RecipeLinkSerializer, RecipeDetailSerializer,
-    TagSerializer, IngredientSerializer, RecipeImageSerializer)
+    TagSerializer, IngredientSerializer, TagCountSerializer,
+    IngredientCountSerializer, RecipeImageSerializer)
+from .parsers import NDJSONParser
+from .cache import CachedListMixin, make_etag
+from .fast import LIST_FIELDS, RecipeRowRenderer
+from .suggest import suggest
+
+
+CONDITIONAL_HEADERS = (
+    'HTTP_IF_MATCH', 'HTTP_IF_NONE_MATCH',
+    'HTTP_IF_MODIFIED_SINCE', 'HTTP_IF_UNMODIFIED_SINCE')
 
 
 class PageNumber(PageNumberPagination):
@@ -18,6 +37,177 @@ class PageNumber(PageNumberPagination):
     max_page_size = 24
     page_query_param = 'p'
     page_size_query_param = 'ps'
+    ordering = 'id'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not queryset.ordered:
+            queryset = queryset.order_by(self.ordering)
+        return super().paginate_queryset(queryset, request, view)
+
+
+class Cursor(CursorPagination):
+    """keyset pagination, the querysets are already filtered by user so
+    ordering on id walks the (user_id, id) index and no COUNT is run"""
+    page_size = 6
+    max_page_size = 24
+    cursor_query_param = 'c'
+    page_size_query_param = 'ps'
+    ordering = 'id'
+
+
+class SelectablePaginationMixin:
+    """?paginate=page|cursor picks the paginator per request, without it the
+    whole list is returned"""
+    pagination_classes = {'page': PageNumber, 'cursor': Cursor}
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            mode = self.request.query_params.get('paginate')
+            if mode is not None and mode not in self.pagination_classes:
+                raise ValidationError(
+                    {'paginate': f'must be one of '
+                                 f'{", ".join(self.pagination_classes)}'})
+            pagination_class = self.pagination_classes.get(mode)
+            self._paginator = pagination_class() if pagination_class else None
+        return self._paginator
+
+
+class SparseFieldsetMixin:
+    """?fields=a,b on GET renders only the named fields and loads only their
+    columns; without it write-only fields are still left out of the SQL"""
+    related_fields = ('tag', 'ingredient')
+    # columns needed besides the rendered ones
+    extra_columns = ()
+
+    def _readable_fields(self):
+        serializer = self.get_serializer_class()()
+        return {name: field for name, field in serializer.fields.items()
+                if not field.write_only}
+
+    def get_requested_fields(self):
+        """fields named by ?fields=, None for the full representation"""
+        fields = self.request.query_params.get('fields')
+        if self.request.method != 'GET' or not fields:
+            return None
+
+        requested = [name.strip() for name in fields.split(',')]
+        unknown = set(requested) - set(self._readable_fields())
+        if unknown:
+            raise ValidationError(
+                {'fields': f'unknown fields: {", ".join(sorted(unknown))}'})
+        return requested
+
+    def project(self, queryset):
+        if self.request.method != 'GET':
+            return queryset.with_related()
+
+        readable = self._readable_fields()
+        fields = self.get_requested_fields() or list(readable)
+        columns = [
+            readable[name].source for name in fields
+            if name not in self.related_fields]
+        return queryset.only(*columns, *self.extra_columns).with_related(
+            [name for name in fields if name in self.related_fields])
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_requested_fields()
+        if fields is not None:
+            kwargs.setdefault('fields', fields)
+        return super().get_serializer(*args, **kwargs)
+
+
+class RowRenderedListMixin:
+    """GET lists rendered from values() rows by recipe.fast, the JSON of
+    RecipeLinkSerializer without its per-field and reverse() cost; the
+    queryset is left unprojected for GET"""
+
+    def list(self, request, *args, **kwargs):
+        renderer = RecipeRowRenderer(
+            request, self.get_requested_fields() or LIST_FIELDS)
+        queryset = self.filter_queryset(
+            self.get_queryset()).values(*renderer.columns)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(renderer.render_rows(page))
+        return Response(renderer.render_rows(queryset))
+
+
+FIELDS_PARAMETER = OpenApiParameter(
+    name='fields',
+    type=OpenApiTypes.STR,
+    required=False,
+    description='Comma separated fields to render, e.g. id,title',
+)
+
+
+PAGINATION_PARAMETERS = [
+    OpenApiParameter(
+        name='paginate',
+        type=OpenApiTypes.STR, enum=['page', 'cursor'],
+        required=False,
+        description='Paginate by page number (p, ps) or by cursor (c, ps)',
+    ),
+    OpenApiParameter(
+        name='p', type=OpenApiTypes.INT, required=False,
+        description='Page number in page mode',
+    ),
+    OpenApiParameter(
+        name='c', type=OpenApiTypes.STR, required=False,
+        description='Cursor in cursor mode',
+    ),
+    OpenApiParameter(
+        name='ps', type=OpenApiTypes.INT, required=False,
+        description='Page size',
+    ),
+]
+
+
+def _split_query_params(qp):
+    return [int(i) for i in qp.split(',')]
+
+
+def _match_mode(params, name):
+    match = params.get(name, 'any')
+    if match not in ('any', 'all'):
+        raise ValidationError({name: 'must be "any" or "all"'})
+    return match
+
+
+def _filter_related(queryset, through, field, ids, match):
+    """filter with EXISTS over the M2M through table instead of a join,
+    so a recipe matching several ids is returned once without DISTINCT"""
+    related = through.objects.filter(recipe_id=OuterRef('pk'))
+    if match == 'all':
+        for pk in set(ids):
+            queryset = queryset.filter(
+                Exists(related.filter(**{field: pk})))
+        return queryset
+    return queryset.filter(
+        Exists(related.filter(**{f'{field}__in': ids})))
+
+
+def filter_recipes(queryset, params):
+    """apply the tags, ingredients, *_match and q filters of the recipe
+    list, shared by the sync and the async view"""
+    tags = params.get('tags')
+    ingredients = params.get('ingredients')
+
+    if tags:
+        list_tag_ids = _split_query_params(tags)
+        queryset = _filter_related(
+            queryset, Recipe.tag.through, 'tag_id', list_tag_ids,
+            _match_mode(params, 'tags_match'))
+    if ingredients:
+        list_ingredients_id = _split_query_params(ingredients)
+        queryset = _filter_related(
+            queryset, Recipe.ingredient.through, 'ingredient_id',
+            list_ingredients_id, _match_mode(params, 'ingredients_match'))
+
+    text = params.get('q', '').strip()
+    if text:
+        queryset = queryset.search(text)
+    return queryset
 
 
 @extend_schema_view(
@@ -37,32 +227,45 @@ class PageNumber(PageNumberPagination):
                 required=False,
                 description='Filtered of ingredients item',
             ),
-        ]
+            OpenApiParameter(
+                name='tags_match',
+                type=OpenApiTypes.STR, enum=['any', 'all'],
+                required=False,
+                description='Match recipes with any (default) or all tags',
+            ),
+            OpenApiParameter(
+                name='ingredients_match',
+                type=OpenApiTypes.STR, enum=['any', 'all'],
+                required=False,
+                description='Match recipes with any (default) '
+                            'or all ingredients',
+            ),
+            OpenApiParameter(
+                name='q',
+                type=OpenApiTypes.STR,
+                required=False,
+                description='Full-text search over title, description, tags '
+                            'and ingredients, best matches first (cursor '
+                            'pagination keeps ordering by id)',
+            ),
+            FIELDS_PARAMETER,
+        ] + PAGINATION_PARAMETERS
     )
 )
-class RecipeListView(generics.ListCreateAPIView):
+class RecipeListView(CachedListMixin, RowRenderedListMixin,
+                     SelectablePaginationMixin, SparseFieldsetMixin,
+                     generics.ListCreateAPIView):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
-
-    def _split_query_params(self, qp):
-        return [int(i) for i in qp.split(',')]
 
     def get_queryset(self):
-        queryset = self.queryset
-
-        tags = self.request.query_params.get('tags')
-        ingredients = self.request.query_params.get('ingredients')
-
-        if tags:
-            list_tag_ids = self._split_query_params(tags)
-            queryset = queryset.filter(tag__id__in=list_tag_ids)
-        if ingredients:
-            list_ingredients_id = self._split_query_params(ingredients)
-            queryset = queryset.filter(ingredient__id__in=list_ingredients_id)
-
-        return queryset.filter(user=self.request.user).distinct()
+        queryset = filter_recipes(
+            self.queryset, self.request.query_params).filter(
+            user=self.request.user)
+        if self.request.method == 'GET':
+            return queryset
+        return self.project(queryset)
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
@@ -73,16 +276,84 @@ class RecipeListView(generics.ListCreateAPIView):
         serializer.save(user=self.request.user)
 
 
-class RecipeDetailView(generics.RetrieveUpdateDestroyAPIView):
+@extend_schema_view(get=extend_schema(parameters=[FIELDS_PARAMETER]))
+class RecipeDetailView(SparseFieldsetMixin,
+                       generics.RetrieveUpdateDestroyAPIView):
     queryset = Recipe.objects.all()
     serializer_class = RecipeDetailSerializer
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
     lookup_field = 'pk'
     lookup_url_kwarg = 'recipe_id'
+    extra_columns = ('updated_at',)
+
+    def get_queryset(self):
+        return self.project(self.queryset)
 
     def get_object(self):
-        return get_object_or_404(Recipe, pk=self.kwargs.get('recipe_id'), user=self.request.user)
+        self.object = get_object_or_404(
+            self.get_queryset(),
+            pk=self.kwargs.get('recipe_id'), user=self.request.user)
+        return self.object
+
+    def _validators(self, updated_at):
+        etag = make_etag(
+            self.kwargs.get('recipe_id'), updated_at.isoformat(),
+            self.request.accepted_renderer.format,
+            self.request.query_params.urlencode())
+        return etag, int(updated_at.timestamp())
+
+    def _evaluate_preconditions(self, request):
+        """answer If-None-Match/If-Modified-Since with a 304 and
+        If-Match/If-Unmodified-Since with a 412 from updated_at alone,
+        before the recipe is loaded and serialized; the updated_at checked
+        is kept in self.checked_updated_at"""
+        self.checked_updated_at = None
+        if not any(header in request.META for header in CONDITIONAL_HEADERS):
+            return None
+        updated_at = self.checked_updated_at = Recipe.objects.filter(
+            pk=self.kwargs.get('recipe_id'), user=request.user,
+        ).values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            return None
+        etag, last_modified = self._validators(updated_at)
+        return get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+
+    def _set_validators(self, response):
+        if response.status_code == 200:
+            etag, last_modified = self._validators(self.object.updated_at)
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        response = self._evaluate_preconditions(request)
+        if response is not None:
+            return response
+        return self._set_validators(
+            super().retrieve(request, *args, **kwargs))
+
+    def _claim(self, updated_at):
+        """take the row if it is still at the updated_at the preconditions
+        were checked against; the UPDATE holds the row lock until commit,
+        so a write racing with the same ETag matches no row afterwards"""
+        return Recipe.objects.filter(
+            pk=self.kwargs.get('recipe_id'), updated_at=updated_at,
+        ).update(updated_at=timezone.now())
+
+    def update(self, request, *args, **kwargs):
+        # only a checked precondition needs the write in its transaction
+        conditional = any(
+            header in request.META for header in CONDITIONAL_HEADERS)
+        with transaction.atomic() if conditional else nullcontext():
+            response = self._evaluate_preconditions(request)
+            if response is not None:
+                return response
+            updated_at = self.checked_updated_at
+            if updated_at is not None and not self._claim(updated_at):
+                return Response(status=status.HTTP_412_PRECONDITION_FAILED)
+            return self._set_validators(
+                super().update(request, *args, **kwargs))
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -95,7 +366,173 @@ class RecipeDetailView(generics.RetrieveUpdateDestroyAPIView):
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response(serializer.error, status=status.HTTP_400_BAD_REQUEST)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@extend_schema_view(
+    post=extend_schema(
+        request=RecipeSerializer(many=True), responses=OpenApiTypes.OBJECT),
+    patch=extend_schema(
+        request=RecipeSerializer(many=True), responses=OpenApiTypes.OBJECT),
+    delete=extend_schema(
+        request=OpenApiTypes.OBJECT, responses=OpenApiTypes.OBJECT),
+)
+class RecipeBulkView(generics.GenericAPIView):
+    """create (POST), update (PATCH, items carry their id) or delete (DELETE,
+    a list of ids) many recipes at once; the body is a JSON array or an
+    NDJSON stream, it is processed in batches of batch_size with one
+    transaction per batch and every item gets its own result.
+
+    An NDJSON line that does not parse ends the stream: the items before
+    it are processed and committed as usual, the line gets a 400 result
+    at its index and nothing after it is read, so a client resumes from
+    there"""
+    queryset = Recipe.objects.all()
+    serializer_class = RecipeSerializer
+    permission_classes = [IsAuthenticated]
+    parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, NDJSONParser]
+    batch_size = 500
+
+    def get_queryset(self):
+        return self.queryset.filter(user=self.request.user)
+
+    def _batches(self):
+        data = self.request.data
+        if isinstance(data, (dict, str)) or not hasattr(data, '__iter__'):
+            raise ValidationError('Expected a list of items.')
+        items = iter(data)
+        self.stream_error = None
+        for offset in count(0, self.batch_size):
+            batch = []
+            try:
+                for item in islice(items, self.batch_size):
+                    batch.append(item)
+            except ParseError as exc:
+                self.stream_error = {
+                    'index': offset + len(batch), 'status': 400,
+                    'errors': {api_settings.NON_FIELD_ERRORS_KEY: [
+                        exc.detail]}}
+            if batch:
+                yield offset, batch
+            if not batch or self.stream_error:
+                return
+
+    def _item_id(self, item):
+        if isinstance(item, dict):
+            item = item.get('id')
+        try:
+            return int(item)
+        except (TypeError, ValueError):
+            return None
+
+    def _response(self, results):
+        if self.stream_error:
+            results.append(self.stream_error)
+        results.sort(key=lambda result: result['index'])
+        if any(result['status'] >= 400 for result in results):
+            return Response(results, status=status.HTTP_207_MULTI_STATUS)
+        return Response(results, status=status.HTTP_200_OK)
+
+    def post(self, request, *args, **kwargs):
+        results = []
+        for offset, batch in self._batches():
+            serializer = self.get_serializer(data=batch, many=True)
+            valid = range(len(batch))
+            if not serializer.is_valid():
+                valid = [i for i, error in enumerate(serializer.errors)
+                         if not error]
+                results += [
+                    {'index': offset + i, 'status': 400, 'errors': error}
+                    for i, error in enumerate(serializer.errors) if error]
+                serializer = self.get_serializer(
+                    data=[batch[i] for i in valid], many=True)
+                serializer.is_valid(raise_exception=True)
+            recipes = serializer.save(user=request.user) if valid else []
+            results += [
+                {'index': offset + i, 'status': 201, 'id': recipe.id}
+                for i, recipe in zip(valid, recipes)]
+        return self._response(results)
+
+    def patch(self, request, *args, **kwargs):
+        results = []
+        for offset, batch in self._batches():
+            instances = self.get_queryset().in_bulk(
+                {self._item_id(item) for item in batch} - {None})
+            with transaction.atomic():
+                for index, item in enumerate(batch, offset):
+                    instance = instances.get(self._item_id(item))
+                    if instance is None:
+                        results.append({
+                            'index': index, 'status': 404,
+                            'errors': {'id': 'Not found.'}})
+                        continue
+                    serializer = self.get_serializer(
+                        instance, data=item, partial=True)
+                    if not serializer.is_valid():
+                        results.append({
+                            'index': index, 'status': 400,
+                            'errors': serializer.errors})
+                        continue
+                    serializer.save()
+                    results.append(
+                        {'index': index, 'status': 200, 'id': instance.id})
+        return self._response(results)
+
+    def delete(self, request, *args, **kwargs):
+        results = []
+        for offset, batch in self._batches():
+            ids = [self._item_id(item) for item in batch]
+            with transaction.atomic():
+                found = set(self.get_queryset().filter(
+                    id__in=set(ids) - {None}).values_list('id', flat=True))
+                self.get_queryset().filter(id__in=found).delete()
+            results += [
+                {'index': index, 'status': 204 if pk in found else 404,
+                 'id': pk}
+                for index, pk in enumerate(ids, offset)]
+        return self._response(results)
+
+
+SUGGEST_PARAMETERS = [
+    OpenApiParameter(
+        name='q', type=OpenApiTypes.STR, required=False,
+        description='Typed text, matched as a prefix of the name or of '
+                    'one of its words (and fuzzily on Postgres)',
+    ),
+    OpenApiParameter(
+        name='limit', type=OpenApiTypes.INT, required=False,
+        description='Maximum number of suggestions, 10 by default',
+    ),
+]
+
+
+class SuggestView(generics.GenericAPIView):
+    """typeahead over the user's names, answered from the trigram index
+    instead of listing every item"""
+    permission_classes = [IsAuthenticated]
+    pagination_class = None
+    default_limit = 10
+    max_limit = 50
+
+    def _limit(self):
+        try:
+            limit = int(self.request.query_params.get(
+                'limit', self.default_limit))
+        except ValueError:
+            raise ValidationError({'limit': 'must be an integer'})
+        if not 1 <= limit <= self.max_limit:
+            raise ValidationError(
+                {'limit': f'must be between 1 and {self.max_limit}'})
+        return limit
+
+    def get(self, request, *args, **kwargs):
+        text = request.query_params.get('q', '').strip()
+        limit = self._limit()
+        items = suggest(
+            self.queryset.model, request.user.pk, text, limit) if text else []
+        serializer = self.get_serializer(
+            [{'id': pk, 'name': name} for pk, name in items], many=True)
+        return Response(serializer.data)
 
 
 @extend_schema_view(
@@ -107,14 +544,14 @@ class RecipeDetailView(generics.RetrieveUpdateDestroyAPIView):
                 required=False,
                 description='Filter by assign item to recipes',
             )
-        ]
+        ] + PAGINATION_PARAMETERS
     )
 )
-class TagListView(generics.ListCreateAPIView):
+class TagListView(CachedListMixin, SelectablePaginationMixin,
+                  generics.ListCreateAPIView):
     queryset = Tag.objects.all()
-    serializer_class = TagSerializer
+    serializer_class = TagCountSerializer
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
 
     def get_queryset(self):
         queryset = self.queryset
@@ -122,19 +559,24 @@ class TagListView(generics.ListCreateAPIView):
             int(self.request.query_params.get('assign_only', 0)))
 
         if assign_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = queryset.filter(recipe_count__gt=0)
 
-        return queryset.filter(user=self.request.user).distinct()
+        return queryset.filter(user=self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 
-class TagDetailView(generics.RetrieveUpdateDestroyAPIView):
+@extend_schema_view(get=extend_schema(parameters=SUGGEST_PARAMETERS))
+class TagSuggestView(SuggestView):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+
+
+class TagDetailView(generics.RetrieveUpdateDestroyAPIView):
+    queryset = Tag.objects.all()
+    serializer_class = TagCountSerializer
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
     lookup_field = 'pk'
     lookup_url_kwarg = 'tag_id'
 
@@ -146,19 +588,19 @@ class TagDetailView(generics.RetrieveUpdateDestroyAPIView):
     get=extend_schema(
         parameters=[
             OpenApiParameter(
-                name='assi_only',
+                name='assign_only',
                 type=OpenApiTypes.INT, enum=[0, 1],
                 required=False,
                 description='Filter by assign item to recipes'
             )
-        ]
+        ] + PAGINATION_PARAMETERS
     )
 )
-class IngredientListView(generics.ListCreateAPIView):
+class IngredientListView(CachedListMixin, SelectablePaginationMixin,
+                         generics.ListCreateAPIView):
     queryset = Ingredient.objects.all()
-    serializer_class = IngredientSerializer
+    serializer_class = IngredientCountSerializer
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
 
     def get_queryset(self):
         queryset = self.queryset
@@ -166,19 +608,24 @@ class IngredientListView(generics.ListCreateAPIView):
             int(self.request.query_params.get('assign_only', 0)))
 
         if assign_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = queryset.filter(recipe_count__gt=0)
 
-        return queryset.filter(user=self.request.user).distinct()
+        return queryset.filter(user=self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 
-class IngredientDetailView(generics.RetrieveUpdateDestroyAPIView):
+@extend_schema_view(get=extend_schema(parameters=SUGGEST_PARAMETERS))
+class IngredientSuggestView(SuggestView):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+
+
+class IngredientDetailView(generics.RetrieveUpdateDestroyAPIView):
+    queryset = Ingredient.objects.all()
+    serializer_class = IngredientCountSerializer
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
     lookup_field = 'pk'
     lookup_url_kwarg = 'ingredient_id'
 
@@ -1,7 +1,6 @@
 from rest_framework import generics
 from rest_framework.settings import api_settings
 from rest_framework.authtoken.views import ObtainAuthToken
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from .serializers import UserSerializer, AuthTokenSerializer
 from rest_framework import serializers
@@ -25,7 +24,6 @@ class CreateAuthTokenView(ObtainAuthToken):
 
 class UserProfileView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
-    authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_object(self):